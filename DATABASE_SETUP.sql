@@ -29,6 +29,11 @@ ALTER TABLE query_history ADD COLUMN IF NOT EXISTS response_time_ms FLOAT;
 CREATE INDEX IF NOT EXISTS idx_query_history_dosha ON query_history(dosha_used);
 CREATE INDEX IF NOT EXISTS idx_query_history_score ON query_history(ranking_score);
 
+-- History pages: keyset on (created_at, id) per user, covering the /api/history columns
+CREATE INDEX IF NOT EXISTS idx_query_history_user_created
+    ON query_history(user_id, created_at DESC, id DESC)
+    INCLUDE (symptom, remedy_name, source, language, ranking_score, dosha_used);
+
 -- ============================================
 -- 3. SAVED_REMEDIES TABLE (NEW)
 -- ============================================
@@ -47,6 +52,25 @@ CREATE TABLE IF NOT EXISTS saved_remedies (
 CREATE INDEX IF NOT EXISTS idx_saved_remedies_user ON saved_remedies(user_id);
 CREATE INDEX IF NOT EXISTS idx_saved_remedies_remedy ON saved_remedies(remedy_id);
 
+-- One saved row per (user, remedy): saves upsert on this constraint.
+-- Tables created before it existed are de-duplicated first.
+DELETE FROM saved_remedies a
+    USING saved_remedies b
+    WHERE a.user_id = b.user_id
+      AND a.remedy_id = b.remedy_id
+      AND a.ctid > b.ctid;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'saved_remedies_user_id_remedy_id_key'
+    ) THEN
+        ALTER TABLE saved_remedies
+            ADD CONSTRAINT saved_remedies_user_id_remedy_id_key UNIQUE (user_id, remedy_id);
+    END IF;
+END $$;
+
 -- Enable RLS
 ALTER TABLE saved_remedies ENABLE ROW LEVEL SECURITY;
 
@@ -68,7 +92,57 @@ CREATE POLICY "Users can update their own saved remedies"
     USING (auth.uid() = user_id);
 
 -- ============================================
--- 4. VERIFY SETUP
+-- 4. REMEDIES CHANGE TRACKING (catalog delta sync)
+-- ============================================
+
+-- Remedies carry updated_at (stamped on every INSERT and UPDATE), and deletions
+-- leave a tombstone, so "what changed since T" is answerable from the database:
+--   SELECT * FROM remedies WHERE updated_at > T;
+--   SELECT remedy_id FROM remedy_tombstones WHERE deleted_at > T;
+-- The backend uses the newest of the two as the catalog version and as the
+-- /api/remedies/sync cursor. Stamps use clock_timestamp() rather than NOW() (the
+-- transaction start), so a long transaction cannot stamp rows far in the past.
+ALTER TABLE remedies ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT clock_timestamp();
+CREATE INDEX IF NOT EXISTS idx_remedies_updated_at ON remedies(updated_at);
+
+CREATE OR REPLACE FUNCTION touch_remedy_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_remedies_updated_at ON remedies;
+CREATE TRIGGER trg_remedies_updated_at
+    BEFORE INSERT OR UPDATE ON remedies
+    FOR EACH ROW EXECUTE FUNCTION touch_remedy_updated_at();
+
+CREATE TABLE IF NOT EXISTS remedy_tombstones (
+    remedy_id UUID PRIMARY KEY,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+CREATE INDEX IF NOT EXISTS idx_remedy_tombstones_deleted_at ON remedy_tombstones(deleted_at);
+
+CREATE OR REPLACE FUNCTION record_remedy_tombstone() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO remedy_tombstones (remedy_id, deleted_at) VALUES (OLD.id, clock_timestamp())
+        ON CONFLICT (remedy_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+        RETURN OLD;
+    END IF;
+    -- A re-inserted remedy is live again
+    DELETE FROM remedy_tombstones WHERE remedy_id = NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_remedies_tombstone ON remedies;
+CREATE TRIGGER trg_remedies_tombstone
+    AFTER INSERT OR DELETE ON remedies
+    FOR EACH ROW EXECUTE FUNCTION record_remedy_tombstone();
+
+-- ============================================
+-- 5. VERIFY SETUP
 -- ============================================
 
 -- Check profiles table structure
@@ -90,7 +164,7 @@ WHERE table_name = 'saved_remedies'
 ORDER BY ordinal_position;
 
 -- ============================================
--- 5. SAMPLE QUERIES (for testing)
+-- 6. SAMPLE QUERIES (for testing)
 -- ============================================
 
 -- Get user's dosha profile
@@ -102,9 +176,17 @@ ORDER BY ordinal_position;
 -- SELECT symptom, remedy_name, matched_keywords, dosha_used, ranking_score, response_time_ms
 -- FROM query_history 
 -- WHERE user_id = 'user_id_here'
--- ORDER BY created_at DESC
+-- ORDER BY created_at DESC, id DESC
 -- LIMIT 10;
 
+-- Next page of history (keyset: created_at and id of the last row seen)
+-- SELECT id, symptom, remedy_name, created_at
+-- FROM query_history
+-- WHERE user_id = 'user_id_here'
+--   AND (created_at, id) < ('last_created_at_here', 'last_id_here')
+-- ORDER BY created_at DESC, id DESC
+-- LIMIT 20;
+
 -- Get user's saved remedies
 -- SELECT sr.*, r.name, r.herb, r.category
 -- FROM saved_remedies sr
@@ -0,0 +1,49 @@
+"""
+Concurrency load test: throughput of DB-bound endpoints against a slow fake supabase
+With blocking calls on the event loop throughput stays flat; with run_db it scales
+with concurrency up to SUPABASE_MAX_CONCURRENCY
+Run from backend/: python benchmarks/bench_concurrency.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+os.environ.setdefault("AUTH_TRUST_USER_HEADER", "true")  # the benchmarks identify users by X-User-ID
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import httpx  # noqa: E402
+import main  # noqa: E402
+from fakes import BENCH_USER_ID, FakeSupabase  # noqa: E402
+
+DB_LATENCY = 0.05  # seconds per round-trip
+REQUESTS = 64
+
+async def run(concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get("/api/history", headers={"X-User-ID": BENCH_USER_ID})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(REQUESTS)))
+        return REQUESTS / (time.perf_counter() - start)
+
+def main_bench():
+    main.supabase = FakeSupabase({'query_history': []}, latency=DB_LATENCY)
+    print(f"DB latency {DB_LATENCY * 1000:.0f}ms, executor size {main.SUPABASE_MAX_CONCURRENCY}")
+    print(f"{'concurrency':>12} {'req/s':>10}")
+    for concurrency in (1, 4, 16, 32):
+        throughput = asyncio.run(run(concurrency))
+        print(f"{concurrency:>12} {throughput:>10.1f}")
+
+if __name__ == "__main__":
+    main_bench()
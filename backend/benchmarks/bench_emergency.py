@@ -0,0 +1,50 @@
+"""
+Emergency detector benchmark: compiled PhraseMatcher vs the old linear scan
+Run from backend/: python benchmarks/bench_emergency.py
+"""
+import os
+import sys
+import logging
+import random
+import string
+import timeit
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+
+SAMPLE_INPUTS = [
+    "i have had a mild headache and some stress since yesterday evening",
+    "my child has a high fever and is coughing a lot at night",
+    "feeling bloated after meals with acidity and gas",
+    "sudden chest pain spreading to my left arm",
+]
+
+def synthetic_phrases(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    phrases = list(main.EMERGENCY_KEYWORDS)
+    while len(phrases) < count:
+        words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(rng.randint(1, 3))]
+        phrases.append(' '.join(words))
+    return phrases
+
+def linear_scan(phrases, text):
+    text = text.lower()
+    return [phrase for phrase in phrases if phrase in text]
+
+def main_bench():
+    print(f"{'phrases':>8} {'linear µs':>12} {'automaton µs':>14}")
+    for count in (32, 300, 3_000, 10_000):
+        phrases = synthetic_phrases(count)
+        matcher = main.PhraseMatcher(phrases, normalize=main.normalize_phrase)
+        runs = 2_000
+        linear = timeit.timeit(lambda: [linear_scan(phrases, t) for t in SAMPLE_INPUTS], number=runs)
+        compiled = timeit.timeit(lambda: [matcher.find_all(t) for t in SAMPLE_INPUTS], number=runs)
+        per_call = runs * len(SAMPLE_INPUTS)
+        print(f"{count:>8} {linear / per_call * 1e6:>12.2f} {compiled / per_call * 1e6:>14.2f}")
+
+if __name__ == "__main__":
+    main_bench()
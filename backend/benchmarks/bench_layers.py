@@ -0,0 +1,117 @@
+"""
+Per-layer microbenchmarks for the /api/ask pipeline (pytest-benchmark)
+Run from backend/: python -m pytest benchmarks
+Catalog sizes come from BENCH_CATALOG_SIZES (default 100,10000)
+"""
+import asyncio
+import copy
+import random
+
+import httpx
+import pytest
+
+import main
+from fakes import BENCH_USER_ID, synthetic_word
+
+SAMPLE_INPUT = "I have had a mild headache and some stress since yesterday evening"
+EMERGENCY_INPUT = "sudden chest pain spreading to my left arm"
+BENCH_USER = {"X-User-ID": BENCH_USER_ID}
+
+def catalog_keywords(catalog) -> list:
+    """Keywords that hit a handful of remedies in the synthetic catalog"""
+    remedies = catalog['remedies']
+    return remedies[0]['symptoms'][0].split() + remedies[len(remedies) // 2]['symptoms'][1].split()[:1]
+
+# LAYER 0
+def bench_normalize_input(benchmark):
+    benchmark(main.normalize_input, SAMPLE_INPUT)
+
+# LAYER 1
+@pytest.mark.parametrize("text", [SAMPLE_INPUT, EMERGENCY_INPUT], ids=["no_emergency", "emergency"])
+def bench_check_emergency(benchmark, text):
+    benchmark(main.check_emergency, text)
+
+# LAYER 2
+def bench_rank_remedies_scan(benchmark, catalog):
+    keywords = catalog_keywords(catalog)
+    benchmark(main.rank_remedies, keywords, catalog['remedies'])
+
+def bench_rank_remedies_indexed(benchmark, catalog):
+    keywords = catalog_keywords(catalog)
+    benchmark(main.rank_remedies, keywords, catalog['remedies'], catalog['index'])
+
+def bench_rank_remedies_matrix(benchmark, catalog):
+    if main.np is None:
+        pytest.skip("numpy is not installed")
+    matrix = main.SymptomMatrix(catalog['index'])
+    keywords = catalog_keywords(catalog)
+    benchmark(main.rank_remedies, keywords, catalog['remedies'], catalog['index'], matrix)
+
+# LAYER 2a
+def bench_correct_keywords(benchmark, catalog):
+    speller = catalog['speller']
+    word = catalog_keywords(catalog)[0]
+    normalized = main.normalize_input(f"{word[:2]}{word[3:]} since yesterday")
+
+    # Corrections are memoized per word, so every round starts from an empty memo
+    def correct():
+        speller._cache.clear()
+        return main.correct_keywords(normalized, catalog)
+
+    # The synthetic vocabulary is dense, so the typo may land on a neighbour of `word`
+    assert 'corrections' in benchmark(correct)
+
+# Fallback table (dataset miss path)
+@pytest.mark.parametrize("entries", [0, 5000], ids=["builtin_table", "builtin_plus_5000"])
+def bench_get_fallback_remedy(benchmark, entries):
+    rng = random.Random(5)
+    table = dict(main.FALLBACK_REMEDIES)
+    for i in range(entries):
+        table[f"synthetic {i}"] = {
+            **main.FALLBACK_REMEDIES['stress'],
+            'symptoms': [f"{synthetic_word(rng)} {synthetic_word(rng)}" for _ in range(5)]
+        }
+    matcher = main.FallbackMatcher(table)
+    result = benchmark(matcher.best, "feeling tiredness and low energy after meals with bloating")
+    assert result is not None
+
+# LAYER 3
+def bench_adjust_by_dosha(benchmark, catalog):
+    keywords = catalog_keywords(catalog)
+    ranked = main.search_remedies_ranked(keywords, "en", catalog)
+    profile = {'primary': 'Vata', 'secondary': 'Kapha'}
+
+    # adjust_by_dosha rescores in place, so every round gets a fresh copy
+    benchmark.pedantic(
+        main.adjust_by_dosha,
+        setup=lambda: ((BENCH_USER_ID, copy.deepcopy(ranked), keywords, profile), {}),
+        rounds=2000
+    )
+
+# End to end
+# Every round clears the response cache, so dataset_hit and fallback_hit run the whole
+# pipeline; dataset_cached is the repeat-question path that the cache answers
+@pytest.mark.parametrize("scenario", ["dataset_hit", "dataset_cached", "fallback_hit", "emergency"])
+def bench_ask_endpoint(benchmark, catalog, scenario):
+    symptom = {
+        "dataset_hit": " ".join(catalog_keywords(catalog)),
+        "dataset_cached": " ".join(catalog_keywords(catalog)),
+        "fallback_hit": "fatigue and low energy all day",
+        "emergency": EMERGENCY_INPUT,
+    }[scenario]
+    cached = scenario == "dataset_cached"
+
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+    def ask():
+        if not cached:
+            main.response_cache.clear()
+        response = loop.run_until_complete(client.post("/api/ask", json={"symptom": symptom}, headers=BENCH_USER))
+        response.raise_for_status()
+
+    try:
+        benchmark(ask)
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
@@ -0,0 +1,85 @@
+"""
+normalize_input benchmark: keyword recall and throughput on a fixture corpus
+(English, Devanagari Hindi and romanized Hindi), old implementation vs current
+Run from backend/: python benchmarks/bench_normalize.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "symptom_corpus.json")
+ROUNDS = 200
+
+OLD_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+def old_normalize_input(symptom: str, language: str = "en") -> dict:
+    """normalize_input before the Hindi-aware pipeline (language was ignored)"""
+    normalized = ' '.join(OLD_PUNCTUATION_RE.sub(' ', symptom.strip().lower()).split())
+    keywords = [word for word in normalized.split() if len(word) > 2]
+    stop_words = {'the', 'and', 'have', 'with', 'for', 'from', 'that', 'this', 'are', 'was', 'been'}
+    return {'normalized': normalized, 'keywords': [word for word in keywords if word not in stop_words]}
+
+def recalled(keywords: list, expect: str) -> bool:
+    """Would a catalog symptom `expect` match, under calculate_match_score's rule?"""
+    return any(keyword in expect or expect in keyword for keyword in keywords)
+
+def recall(normalize, corpus: list) -> dict:
+    hits = {}
+    for item in corpus:
+        keywords = normalize(item['text'], item['language'])['keywords']
+        total, found = hits.get(item['group'], (0, 0))
+        hits[item['group']] = (total + 1, found + recalled(keywords, item['expect']))
+    return hits
+
+def throughput(normalize, corpus: list, clear=None) -> float:
+    """Normalizations per second; clear() runs before every pass to measure cold calls"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        if clear:
+            clear()
+        for item in corpus:
+            normalize(item['text'], item['language'])
+    return ROUNDS * len(corpus) / (time.perf_counter() - start)
+
+def set_stemming(enabled: bool):
+    main.NORMALIZE_STEMMING = enabled
+    main._normalize_cached.cache_clear()
+
+def main_bench():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    variants = [
+        ("old", old_normalize_input, False),
+        ("current", main.normalize_input, False),
+        ("current+stem", main.normalize_input, True),
+    ]
+
+    groups = ['en', 'hi-devanagari', 'hi-romanized']
+    print(f"{len(corpus)} queries")
+    print(f"{'variant':>13} " + " ".join(f"{group:>14}" for group in groups)
+          + f" {'cold/s':>10} {'memo/s':>10}")
+    for name, normalize, stemming in variants:
+        set_stemming(stemming)
+        hits = recall(normalize, corpus)
+        cells = [f"{found}/{total}" for total, found in (hits.get(group, (0, 0)) for group in groups)]
+        if normalize is main.normalize_input:
+            cold = throughput(normalize, corpus, clear=main._normalize_cached.cache_clear)
+            warm = throughput(normalize, corpus)
+        else:
+            cold = warm = throughput(normalize, corpus)
+        print(f"{name:>13} " + " ".join(f"{cell:>14}" for cell in cells) + f" {cold:>10.0f} {warm:>10.0f}")
+    set_stemming(False)
+
+if __name__ == "__main__":
+    main_bench()
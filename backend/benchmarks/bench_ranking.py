@@ -0,0 +1,78 @@
+"""
+Ranking benchmark: per-remedy scan vs SymptomIndex vs the numpy SymptomMatrix
+Needs numpy for the matrix column
+Run from backend/: python benchmarks/bench_ranking.py
+"""
+import os
+import sys
+import logging
+import random
+import string
+import time
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+
+QUERIES = 50
+
+def synthetic_catalog(count: int, seed: int = 11) -> tuple:
+    """Remedies with 4-10 symptoms drawn from a vocabulary that grows with the catalog"""
+    rng = random.Random(seed)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 8))) for _ in range(max(200, count // 20))]
+    vocabulary = list(dict.fromkeys(
+        ' '.join(rng.sample(words, rng.randint(1, 2))) for _ in range(max(500, count // 5))
+    ))
+    remedies = [
+        {'id': f'r{i}', 'name': f'Remedy {i}', 'symptoms': rng.sample(vocabulary, rng.randint(4, 10))}
+        for i in range(count)
+    ]
+    queries = [rng.sample(words, rng.randint(1, 3)) for _ in range(QUERIES)]
+    return remedies, queries
+
+def per_query_ms(fn, queries, budget: float = 5.0) -> float:
+    """Average ms per query; slow engines stop after `budget` seconds"""
+    start = time.perf_counter()
+    done = 0
+    for keywords in queries:
+        fn(keywords)
+        done += 1
+        if time.perf_counter() - start > budget:
+            break
+    return (time.perf_counter() - start) / done * 1000
+
+def main_bench():
+    if main.np is None:
+        print("numpy is not installed; the matrix column needs it (pip install numpy)")
+        return
+
+    print(f"{'remedies':>9} {'scan ms':>10} {'index ms':>10} {'matrix ms':>10} {'batch ms':>10} {'build s':>9}")
+    for count in (100, 10_000, 100_000):
+        remedies, queries = synthetic_catalog(count)
+
+        start = time.perf_counter()
+        index = main.SymptomIndex()
+        index.update(remedies)
+        matrix = main.SymptomMatrix(index)
+        build = time.perf_counter() - start
+
+        # Warm the per-keyword caches so every engine is measured in steady state
+        for keywords in queries:
+            main.rank_remedies_indexed(keywords, index)
+            matrix.rank(keywords)
+
+        scan = per_query_ms(lambda keywords: main.rank_remedies(keywords, remedies), queries)
+        indexed = per_query_ms(lambda keywords: main.rank_remedies_indexed(keywords, index), queries)
+        vectorized = per_query_ms(matrix.rank, queries)
+
+        start = time.perf_counter()
+        matrix.rank_many(queries)
+        batch = (time.perf_counter() - start) / len(queries) * 1000
+
+        print(f"{count:>9} {scan:>10.3f} {indexed:>10.3f} {vectorized:>10.3f} {batch:>10.3f} {build:>9.2f}")
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,110 @@
+"""
+Serialization benchmark: how much of a dataset-hit /api/ask goes into shaping
+and encoding the response, before (per-request projection, validated model,
+jsonable_encoder + JSONResponse) and after (catalog projections, model_construct,
+pre-encoded body prefix)
+Run from backend/: python benchmarks/bench_serialize.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import httpx  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import main  # noqa: E402
+from fakes import install_fakes, synthetic_remedies  # noqa: E402
+
+CATALOG_SIZE = 1000
+ROUNDS = 20000
+REQUESTS = 2000
+
+LOOP = asyncio.new_event_loop()
+
+def per_call_us(fn, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+def old_path(ranked: dict, language: str) -> bytes:
+    """
+    format_ranked_remedy -> RemedyResponse(...) -> jsonable_encoder + JSONResponse,
+    which is what FastAPI's serialize_response does for an endpoint without response_model
+    """
+    top = main.format_ranked_remedy(ranked, language)
+    response = main.RemedyResponse(
+        success=True,
+        remedy_id=top['id'],
+        remedy_name=top['name'],
+        herb=top['herb'],
+        herb_scientific=top.get('herb_scientific'),
+        dosage=top['dosage'],
+        yoga=top['yoga'],
+        diet=top['diet'],
+        dosha=top['dosha'],
+        warning=top['warning'],
+        explanation=top['explanation'],
+        source='dataset',
+        category=top.get('category'),
+        match_score=top['match_score'],
+        matched_symptoms=top['matched_symptoms'],
+        dosha_adjusted=False
+    )
+    return JSONResponse(content=jsonable_encoder(response)).body
+
+def new_path(ranked: dict, language: str, projections: dict) -> bytes:
+    top = main.format_ranked_remedy(ranked, language, projections)
+    response = main.RemedyResponse.model_construct(
+        **main.remedy_response_fields(top),
+        match_score=top['match_score'],
+        matched_symptoms=top['matched_symptoms'],
+        dosha_adjusted=False
+    )
+    response._body_prefix = top.get('body_prefix')
+    return main.pipeline_json_response(response).body
+
+async def ask_latency_us(symptom: str, language: str) -> float:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payload = {"symptom": symptom, "language": language}
+        await client.post("/api/ask", json=payload)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            (await client.post("/api/ask", json=payload)).raise_for_status()
+        return (time.perf_counter() - start) / REQUESTS * 1e6
+
+def main_bench():
+    remedies = synthetic_remedies(CATALOG_SIZE)
+    install_fakes(main, remedies)
+    catalog = main.get_remedy_catalog()
+    remedy = remedies[0]
+    keywords = remedy['symptoms'][0].split()
+    ranked = main.rank_remedies(keywords, catalog['remedies'], catalog['index'])[0]
+
+    print(f"orjson {'installed' if main.orjson else 'not installed'}, catalog {CATALOG_SIZE}")
+    print(f"{'language':>8} {'old us':>9} {'new us':>9} {'ask us':>9} {'old share':>10} {'new share':>10}")
+    for language in ('en', 'hi'):
+        assert old_path(ranked, language) == new_path(ranked, language, catalog['projections'])
+        old = per_call_us(lambda: old_path(ranked, language))
+        new = per_call_us(lambda: new_path(ranked, language, catalog['projections']))
+
+        # /api/ask answers repeat queries from the response cache, so time it with the cache off
+        main.response_cache.maxsize = 0
+        ask = LOOP.run_until_complete(ask_latency_us(' '.join(keywords), language))
+        main.response_cache.maxsize = main.RESPONSE_CACHE_SIZE
+
+        # The measured request already contains the new path; the old one would add the difference
+        print(f"{language:>8} {old:>9.1f} {new:>9.1f} {ask:>9.1f} "
+              f"{old / (ask - new + old):>10.1%} {new / ask:>10.1%}")
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,33 @@
+"""
+Shared setup for the pytest-benchmark suite: main is imported against the
+in-process fakes, so no Supabase project or API key is needed
+"""
+import os
+import sys
+import logging
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+os.environ.setdefault("AUTH_TRUST_USER_HEADER", "true")  # the benchmarks identify users by X-User-ID
+os.environ.pop("ANTHROPIC_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+import main  # noqa: E402
+from fakes import install_fakes, synthetic_remedies  # noqa: E402
+
+CATALOG_SIZES = [int(size) for size in os.getenv("BENCH_CATALOG_SIZES", "100,10000").split(",")]
+
+@pytest.fixture(scope="session")
+def app_main():
+    return main
+
+@pytest.fixture(scope="session", params=CATALOG_SIZES, ids=lambda size: f"{size}_remedies")
+def catalog(request):
+    """A synthetic catalog installed as main's current snapshot"""
+    remedies = synthetic_remedies(request.param)
+    install_fakes(main, remedies)
+    return main.get_remedy_catalog()
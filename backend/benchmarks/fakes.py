@@ -0,0 +1,292 @@
+"""
+In-process stand-ins for the supabase client, used by the benchmark scripts
+Only the query-builder surface that main.py uses is implemented
+"""
+import copy
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, data, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Chainable query builder; execute() sleeps for the table latency, then filters in memory"""
+
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = table
+        self.op = 'select'
+        self.payload = None
+        self.options: Dict = {}
+        self.filters = []
+        self.ordering = []
+        self.row_limit = None
+        self.single_row = False
+        self.count_rows = False
+
+    # --- filters / modifiers ---
+    def select(self, columns: str = '*', count: Optional[str] = None, **kwargs):
+        self.op = 'select'
+        self.count_rows = count is not None
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def order(self, column, desc: bool = False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    # --- writes ---
+    def insert(self, payload):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, **options):
+        self.op, self.payload, self.options = 'upsert', payload, options
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    def execute(self) -> FakeResponse:
+        latency = self.client.latency.get(self.table, self.client.default_latency)
+        if latency:
+            time.sleep(latency)
+        self.client.calls.append((self.table, self.op))
+
+        rows = self.client.tables.setdefault(self.table, [])
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+
+        if self.op == 'select':
+            for column, desc in reversed(self.ordering):
+                matched.sort(key=lambda row: row.get(column) or '', reverse=desc)
+            count = len(matched) if self.count_rows else None
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            if self.single_row:
+                return FakeResponse(copy.deepcopy(matched[0]) if matched else None)
+            return FakeResponse(copy.deepcopy(matched), count=count)
+
+        if self.op in ('insert', 'upsert'):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            conflict_keys = self.options.get('on_conflict', 'id').split(',')
+            written = []
+            for row in payload:
+                row = dict(row)
+                row.setdefault('id', str(uuid.uuid4()))
+                row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+                if self.op == 'upsert':
+                    existing = [r for r in rows if all(r.get(k) == row.get(k) for k in conflict_keys)]
+                    if existing:
+                        if not self.options.get('ignore_duplicates'):
+                            existing[0].update(row)
+                            written.append(existing[0])
+                        continue
+                rows.append(row)
+                written.append(row)
+            return FakeResponse(copy.deepcopy(written))
+
+        if self.op == 'update':
+            for row in matched:
+                row.update(self.payload)
+            return FakeResponse(copy.deepcopy(matched))
+
+        for row in matched:
+            rows.remove(row)
+        return FakeResponse(copy.deepcopy(matched))
+
+
+class FakeSupabase:
+    """
+    Minimal supabase.Client replacement
+    latency: seconds per execute(), either one number or {table: seconds}
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[dict]]] = None, latency=0.0):
+        self.tables = tables or {}
+        self.calls = []
+        if isinstance(latency, dict):
+            self.latency, self.default_latency = latency, 0.0
+        else:
+            self.latency, self.default_latency = {}, latency
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+
+class _FakeContent:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeMessage:
+    def __init__(self, text: str):
+        self.content = [_FakeContent(text)]
+
+
+FAKE_AI_TEXT = """REMEDY_NAME: Synthetic Herbal Support
+HERB: Tulsi
+HERB_SCIENTIFIC: Ocimum tenuiflorum
+DOSAGE: 1 cup of tea twice daily
+YOGA: Anulom Vilom
+DIET: Warm, light meals
+DOSHA: Balances Kapha
+WARNING: Consult a practitioner if symptoms persist
+EXPLANATION: Tulsi supports respiratory and immune balance
+CATEGORY: respiratory"""
+
+
+class _FakeStream:
+    def __init__(self, client: 'FakeAsyncAnthropic'):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        import asyncio
+        text = self.client.text
+        step = max(1, len(text) // self.client.chunks)
+        for start in range(0, len(text), step):
+            if self.client.latency:
+                await asyncio.sleep(self.client.latency / self.client.chunks)
+            yield text[start:start + step]
+
+
+class FakeAsyncMessages:
+    def __init__(self, client: 'FakeAsyncAnthropic'):
+        self.client = client
+
+    async def create(self, **kwargs) -> _FakeMessage:
+        import asyncio
+        self.client.calls.append(kwargs)
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+        if self.client.errors:
+            raise self.client.errors.pop(0)
+        return _FakeMessage(self.client.text)
+
+    def stream(self, **kwargs) -> _FakeStream:
+        self.client.calls.append(kwargs)
+        return _FakeStream(self.client)
+
+
+class FakeAsyncAnthropic:
+    """
+    Offline stand-in for anthropic.AsyncAnthropic (create and stream)
+    errors: exceptions raised by successive create() calls before it starts succeeding
+    """
+
+    def __init__(self, text: str = FAKE_AI_TEXT, latency: float = 0.0, chunks: int = 20, errors: Optional[list] = None):
+        self.text = text
+        self.errors = list(errors or [])
+        self.latency = latency
+        self.chunks = chunks
+        self.calls = []
+        self.messages = FakeAsyncMessages(self)
+
+
+# Synthetic symptom words use a restricted alphabet, and every synthetic symptom
+# has two words. Words that use other letters (fatigue, energy, wobble, ...) can
+# therefore never match the catalog, which keeps the load scenarios on their
+# intended layer.
+def bench_user_id(number: int = 0) -> str:
+    """Stable uuid user ids (query_history.user_id is a uuid column)"""
+    return str(uuid.UUID(int=number + 1))
+
+BENCH_USER_ID = bench_user_id()
+
+_CONSONANTS = 'bdkmnprstv'
+_VOWELS = 'aeiu'
+DOSHA_LABELS = ['Balances Vata', 'Balances Pitta', 'Balances Kapha', 'Balances Vata and Kapha', 'Tridoshic']
+
+def synthetic_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(rng.randint(2, 4)))
+
+def synthetic_remedies(count: int, symptoms_per_remedy=(4, 8), seed: int = 3) -> List[dict]:
+    """Remedy rows shaped like the remedies table (en + hi columns)"""
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(
+        f'{synthetic_word(rng)} {synthetic_word(rng)}' for _ in range(max(300, count // 4))
+    ))
+    remedies = []
+    for i in range(count):
+        remedies.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'name': f'Synthetic Remedy {i}',
+            'name_hi': f'कृत्रिम उपाय {i}',
+            'herb': 'Tulsi',
+            'herb_hi': 'तुलसी',
+            'herb_scientific': 'Ocimum tenuiflorum',
+            'dosage': '1 cup twice daily',
+            'dosage_hi': 'दिन में दो बार 1 कप',
+            'yoga': 'Anulom Vilom',
+            'yoga_hi': 'अनुलोम विलोम',
+            'diet': 'Warm, light meals',
+            'diet_hi': 'गर्म, हल्का भोजन',
+            'dosha': rng.choice(DOSHA_LABELS),
+            'dosha_hi': 'वात संतुलन',
+            'warning': 'Consult a practitioner if symptoms persist',
+            'warning_hi': 'लक्षण बने रहें तो चिकित्सक से सलाह लें',
+            'explanation': 'Synthetic remedy for benchmarking',
+            'explanation_hi': 'बेंचमार्क के लिए कृत्रिम उपाय',
+            'category': rng.choice(['digestive', 'respiratory', 'mental', 'skin']),
+            'symptoms': rng.sample(vocabulary, rng.randint(*symptoms_per_remedy)),
+        })
+    return remedies
+
+def install_fakes(main, remedies: List[dict], db_latency=0.0, ai_latency: float = 0.0, profiles: Optional[List[dict]] = None):
+    """
+    Point main at in-process fakes and load `remedies` as the catalog
+    Returns (FakeSupabase, FakeAsyncAnthropic)
+    """
+    db = FakeSupabase({
+        'remedies': remedies,
+        'profiles': profiles if profiles is not None else [{'id': BENCH_USER_ID, 'dosha_primary': 'Vata', 'dosha_secondary': 'Kapha'}],
+        'query_history': [],
+        'saved_remedies': [],
+    }, latency=db_latency)
+    ai = FakeAsyncAnthropic(latency=ai_latency)
+    main.supabase = db
+    main.anthropic_client = ai
+    main.install_remedy_catalog(remedies)
+    return db, ai
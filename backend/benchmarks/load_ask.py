@@ -0,0 +1,236 @@
+"""
+Load scenario for /api/ask against in-process fakes (no Supabase project or API key)
+Mixes dataset hits, fallback hits, AI misses and emergencies (with the dataset
+response cache off unless --response-cache), then reports
+p50/p95/p99 latency and throughput overall and per scenario as JSON,
+so runs can be compared across commits
+
+Run from backend/:
+  python benchmarks/load_ask.py --output load-$(git rev-parse --short HEAD).json
+  python benchmarks/load_ask.py --compare load-abc1234.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.service.key")
+os.environ.setdefault("AUTH_TRUST_USER_HEADER", "true")  # the benchmarks identify users by X-User-ID
+os.environ.pop("ANTHROPIC_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import httpx  # noqa: E402
+import main  # noqa: E402
+from fakes import bench_user_id, install_fakes, synthetic_remedies  # noqa: E402
+
+FALLBACK_INPUTS = [
+    "fatigue and low energy all day",
+    "feeling tiredness and weakness",
+    "cannot sleep, insomnia every night",
+    "bloating after every meal",
+]
+EMERGENCY_INPUTS = [
+    "sudden chest pain spreading to my left arm",
+    "severe bleeding from a deep cut",
+    "my father is unconscious",
+]
+USERS = 50
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"dataset", "fallback", "ai", "emergency"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return mix
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: list, errors: int, mismatched: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'wrong_layer': mismatched,
+        'throughput_rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(values, 50), 2),
+        'p95_ms': round(percentile(values, 95), 2),
+        'p99_ms': round(percentile(values, 99), 2),
+        'max_ms': round(values[-1], 2) if values else 0.0,
+    }
+
+def answered_by(scenario: str, body: dict) -> bool:
+    """Did the response come from the layer the scenario targets?"""
+    if scenario == "emergency":
+        return body.get('type') == 'emergency'
+    if scenario == "ai":
+        return body.get('source') == 'ai'
+    if scenario == "fallback":
+        return body.get('source') == 'dataset' and body.get('remedy_id') is None
+    return body.get('source') == 'dataset' and body.get('remedy_id') is not None
+
+async def run_load(args) -> dict:
+    rng = random.Random(args.seed)
+    remedies = synthetic_remedies(args.catalog_size)
+    profiles = [
+        {'id': bench_user_id(i), 'dosha_primary': rng.choice(['Vata', 'Pitta', 'Kapha']), 'dosha_secondary': None}
+        for i in range(USERS)
+    ]
+    install_fakes(main, remedies, db_latency=args.db_latency, ai_latency=args.ai_latency, profiles=profiles)
+    if not args.response_cache:
+        main.response_cache.maxsize = 0
+
+    scenarios, weights = zip(*args.mix.items())
+    counter = iter(range(10 ** 9))
+
+    def next_request():
+        scenario = rng.choices(scenarios, weights)[0]
+        if scenario == "dataset":
+            remedy = rng.choice(remedies)
+            symptom = f"I have {rng.choice(remedy['symptoms'])}"
+        elif scenario == "fallback":
+            symptom = rng.choice(FALLBACK_INPUTS)
+        elif scenario == "ai":
+            # Unique nonsense so every request misses the AI response cache
+            symptom = f"zzqx wobble {next(counter):09d}"
+        else:
+            symptom = rng.choice(EMERGENCY_INPUTS)
+        return scenario, symptom, bench_user_id(rng.randrange(USERS))
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    mismatched = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one():
+                scenario, symptom, user_id = next_request()
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/api/ask", json={"symptom": symptom}, headers={"X-User-ID": user_id})
+                    except Exception:
+                        errors[scenario] += 1
+                        return
+                    latencies[scenario].append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors[scenario] += 1
+                elif not answered_by(scenario, response.json()):
+                    mismatched[scenario] += 1
+
+            # Warm-up: profile cache, symptom index keyword cache
+            for _ in range(min(args.warmup, args.requests)):
+                await one()
+            latencies.clear()
+            errors.clear()
+            mismatched.clear()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await main.app.router.shutdown()
+        main.response_cache.maxsize = main.RESPONSE_CACHE_SIZE
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'python': platform.python_version(),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'catalog_size': args.catalog_size,
+            'db_latency_ms': args.db_latency * 1000,
+            'ai_latency_ms': args.ai_latency * 1000,
+            'mix': args.mix,
+            'ranking_engine': main.RANKING_ENGINE,
+            'response_cache': args.response_cache,
+        },
+        'overall': summarize(everything, sum(errors.values()), sum(mismatched.values()), elapsed),
+        'scenarios': {
+            scenario: summarize(latencies[scenario], errors[scenario], mismatched[scenario], elapsed)
+            for scenario in scenarios
+        },
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+def print_report(report: dict, baseline: dict = None):
+    config = report['config']
+    print(f"commit {report['commit']}  catalog {config['catalog_size']}  concurrency {config['concurrency']}  "
+          f"db {config['db_latency_ms']:.0f}ms  ai {config['ai_latency_ms']:.0f}ms")
+    print(f"{'scenario':>10} {'req':>6} {'err':>4} {'wrong':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+    rows = [('overall', report['overall'])] + list(report['scenarios'].items())
+    for name, stats in rows:
+        print(f"{name:>10} {stats['requests']:>6} {stats['errors']:>4} {stats['wrong_layer']:>6} "
+              f"{stats['throughput_rps']:>9.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        if baseline:
+            before = baseline['overall'] if name == 'overall' else baseline['scenarios'].get(name)
+            if before:
+                print(f"{'':>10} {'':>6} {'':>4} {'':>6} "
+                      + " ".join(f"{delta(before[key], stats[key]):>9}" for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')))
+
+def delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per supabase round-trip")
+    parser.add_argument("--ai-latency", type=float, default=0.5, help="seconds per Anthropic call")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("dataset=60,fallback=20,ai=10,emergency=10"))
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--response-cache", action="store_true",
+                        help="keep the dataset response cache on (off by default: repeat symptoms would only measure cache hits)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"baseline: commit {baseline.get('commit')} ({baseline.get('timestamp')})")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+if __name__ == "__main__":
+    main_bench()
@@ -1,15 +1,53 @@
-from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.datastructures import Headers, MutableHeaders
+from pydantic import BaseModel, PrivateAttr, ValidationError
 from supabase import create_client, Client
-from anthropic import Anthropic
+from postgrest.exceptions import APIError
+import anthropic
+import httpx
+import jwt
+from anthropic import AsyncAnthropic
 import os
 from dotenv import load_dotenv
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import logging
 import re
 import time
-from collections import Counter
+import json
+import hashlib
+import gzip
+import base64
+import asyncio
+import functools
+import sqlite3
+import threading
+import random
+import uuid
+import sys
+import bisect
+import heapq
+import contextvars
+from contextlib import contextmanager, AsyncExitStack
+from datetime import datetime, timedelta, timezone
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed for RANKING_ENGINE=numpy
+    np = None
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON encoding for /api/ask responses
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: br content-coding, gzip is used otherwise
+    brotli = None
 
 # Load environment variables
 load_dotenv()
@@ -25,10 +63,17 @@ supabase: Client = create_client(
 )
 
 # Initialize Anthropic (optional - for AI fallback)
+# Retries are handled by call_anthropic, so the SDK's own retries are disabled
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "20"))
+
 anthropic_client = None
 try:
     if os.getenv("ANTHROPIC_API_KEY"):
-        anthropic_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        anthropic_client = AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            timeout=AI_TIMEOUT_SECONDS,
+            max_retries=0
+        )
         logger.info("✅ Anthropic AI enabled")
     else:
         logger.warning("⚠️  Anthropic API key not set - AI fallback disabled")
@@ -49,21 +94,356 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ============================================
-# RESPONSE TIME TRACKING MIDDLEWARE
+# HTTP COMPRESSION
+# ============================================
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Best content-coding we can produce for an Accept-Encoding header: 'br', 'gzip' or None"""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        params = params.strip()
+        try:
+            weight = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            weight = 0.0
+        weights[name.strip()] = weight
+    
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if weights.get(encoding, weights.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+class CompressionMiddleware:
+    """
+    gzip/brotli for complete responses of at least COMPRESS_MIN_BYTES
+    Streaming responses (NDJSON) and bodies that already carry a
+    Content-Encoding (pre-compressed catalog pages) pass through untouched
+    """
+    
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope['type'] == 'http':
+            encoding = accepted_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        
+        async def send_compressed(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                start_message = message  # held until the first body chunk decides the headers
+                return
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message['headers'])
+                body = message.get('body', b'')
+                if (
+                    'content-encoding' not in headers
+                    and not message.get('more_body', False)
+                    and len(body) >= self.minimum_size
+                ):
+                    body = compress_body(body, encoding)
+                    headers['Content-Encoding'] = encoding
+                    headers['Content-Length'] = str(len(body))
+                    headers.add_vary_header('Accept-Encoding')
+                    message = {**message, 'body': body}
+                await send(start_message)
+                start_message = None
+            await send(message)
+        
+        await self.app(scope, receive, send_compressed)
+
+# Registered before the timing middleware so it sees whole bodies, not re-chunked streams
+app.add_middleware(CompressionMiddleware)
+
+# ============================================
+# METRICS & RESPONSE TIME TRACKING
 # ============================================
 
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for value in values
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+def metric_lines(name: str, help_text: str, metric_type: str, samples: List[Tuple[Dict, float]]) -> List[str]:
+    """Prometheus text exposition for a gauge or counter computed at scrape time"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+class Histogram:
+    """
+    Prometheus-style latency histogram (seconds) with fixed label names
+    Thread-safe; rendered in the text exposition format by render()
+    """
+    
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, seconds)] += 1
+            series[-1] += seconds
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = format_labels(self.labelnames + ('le',), labels + (bound,))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {values[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+http_request_seconds = Histogram(
+    'ayush_http_request_duration_seconds', 'HTTP request latency', ('method', 'route', 'status')
+)
+pipeline_layer_seconds = Histogram(
+    'ayush_pipeline_layer_duration_seconds', 'Time spent in each /api/ask pipeline layer', ('layer',)
+)
+supabase_call_seconds = Histogram(
+    'ayush_supabase_call_duration_seconds', 'Supabase round-trips (executor queueing included)', ('operation', 'outcome')
+)
+anthropic_call_seconds = Histogram(
+    'ayush_anthropic_call_duration_seconds', 'Anthropic API calls (each retry attempt separately)', ('operation', 'outcome')
+)
+
+in_flight = Counter()  # 'http' / 'supabase' / 'anthropic' -> calls currently running
+
+# Per-request {span name: seconds}, read by the middleware into Server-Timing
+request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar('request_timings', default=None)
+
+def record_timing(name: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def layer_span(layer: str):
+    """Time one pipeline layer into the layer histogram and the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        pipeline_layer_seconds.observe(elapsed, layer)
+        record_timing(layer, elapsed)
+
+@contextmanager
+def external_call(histogram: Histogram, kind: str, operation: str):
+    """Time a Supabase/Anthropic call: histogram by outcome, in-flight gauge, Server-Timing"""
+    start = time.perf_counter()
+    in_flight[kind] += 1
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        in_flight[kind] -= 1
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, operation, outcome)
+        record_timing(kind, elapsed)
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    """Track response time for all requests"""
+    """Track response time for all requests, with a per-layer Server-Timing breakdown"""
     start_time = time.time()
-    response = await call_next(request)
+    timings: Dict[str, float] = {}
+    token = request_timings.set(timings)
+    in_flight['http'] += 1
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        in_flight['http'] -= 1
+        request_timings.reset(token)
+        route = request.scope.get('route')
+        http_request_seconds.observe(
+            time.time() - start_time, request.method, route.path if route else 'unmatched', str(status)
+        )
+    
     process_time = (time.time() - start_time) * 1000  # Convert to milliseconds
     response.headers["X-Process-Time"] = f"{process_time:.2f}ms"
+    response.headers["Server-Timing"] = server_timing_header(timings, process_time / 1000)
+    response.headers["Timing-Allow-Origin"] = "*"
     return response
 
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler for hot-path analysis
+    A background thread samples one thread's stack (the event loop's) at a fixed
+    interval and counts collapsed stacks, the input format of flamegraph.pl and speedscope
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+    
+    @staticmethod
+    def collapse(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+    
+    def sample(self, thread_id: int, seconds: float, interval: float) -> Counter:
+        """Blocking: run in a worker thread, never on the thread being sampled"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("profiler already running")
+            self.running = True
+        
+        stacks = Counter()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[self.collapse(frame)] += 1
+                time.sleep(interval)
+        finally:
+            self.running = False
+        return stacks
+
+sampling_profiler = SamplingProfiler()
+
+# ============================================
+# ASYNC DATA ACCESS
+# ============================================
+
+# The supabase client is synchronous; every call goes through this bounded
+# pool so a slow round-trip never blocks the event loop.
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "16"))
+db_executor = ThreadPoolExecutor(max_workers=SUPABASE_MAX_CONCURRENCY, thread_name_prefix="supabase")
+
+def db_operation_name(fn) -> str:
+    """Metric label for a run_db call: 'GET remedies' for query builders, else the function name"""
+    builder = getattr(fn, '__self__', None)
+    path = getattr(builder, 'path', None)
+    if isinstance(path, str):
+        return f"{getattr(builder, 'http_method', '')} {path.lstrip('/')}".strip()
+    return getattr(fn, '__qualname__', None) or type(fn).__name__
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking supabase call on the DB executor and await its result"""
+    loop = asyncio.get_running_loop()
+    with external_call(supabase_call_seconds, 'supabase', db_operation_name(fn)):
+        return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+# ============================================
+# IN-MEMORY CACHES
+# ============================================
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Size-bounded LRU cache with per-entry TTL
+    Tracks hits, misses, evictions and expirations for /api/health
+    """
+    
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.stats['misses'] += 1
+            return default
+        
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.stats['hits'] += 1
+        return value
+    
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def invalidate(self, key):
+        self._data.pop(key, None)
+    
+    def clear(self):
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def snapshot_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+        }
+
 # ============================================
 # EMERGENCY KEYWORDS & DOSHA DATA
 # ============================================
@@ -100,62 +480,301 @@ DOSHA_CHARACTERISTICS = {
 # LAYER 0: INPUT NORMALIZATION
 # ============================================
 
-def normalize_input(symptom: str) -> Dict:
+# Punctuation, except Devanagari: vowel signs and the virama are combining marks,
+# which \w does not cover, so a plain [^\w\s] shreds Hindi words.
+# The danda (।, ॥) is punctuation and is still stripped.
+PUNCTUATION_RE = re.compile(r'[^\w\s\u0900-\u0963\u0966-\u097F]')
+DEVANAGARI_RE = re.compile(r'[\u0900-\u097F]')
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "10000"))
+NORMALIZE_STEMMING = os.getenv("NORMALIZE_STEMMING", "false").lower() == "true"
+
+ENGLISH_STOP_WORDS = frozenset({'the', 'and', 'have', 'with', 'for', 'from', 'that', 'this', 'are', 'was', 'been'})
+
+# Hindi stop words in Devanagari and romanized (Hinglish) spelling
+HINDI_STOP_WORDS = frozenset({
+    'है', 'हैं', 'था', 'थी', 'थे', 'और', 'का', 'की', 'के', 'में', 'से', 'को', 'पर', 'भी',
+    'मुझे', 'मेरा', 'मेरी', 'मेरे', 'हो', 'रहा', 'रही', 'रहे', 'बहुत', 'कुछ', 'एक', 'यह', 'वह',
+    'तो', 'जी', 'कर', 'गया', 'गई', 'लगता', 'लगती', 'होता', 'होती',
+    'hai', 'hain', 'tha', 'thi', 'aur', 'mein', 'mujhe', 'mera', 'meri', 'mere', 'raha', 'rahi',
+    'rahe', 'bahut', 'kuch', 'kuchh', 'yeh', 'woh', 'gaya', 'gayi', 'lagta', 'lagti', 'hota', 'hoti',
+})
+
+STOP_WORDS: Dict[str, frozenset] = {
+    'en': ENGLISH_STOP_WORDS,
+    'hi': ENGLISH_STOP_WORDS | HINDI_STOP_WORDS,
+}
+
+# Hindi symptom terms (Devanagari and romanized) -> the English terms the catalog uses.
+# Multi-word entries are matched before single words; romanized words that are also
+# English words ('pet', 'sir') only appear inside phrases.
+HINDI_SYMPTOM_TERMS = {
+    'सिर दर्द': 'headache', 'सिरदर्द': 'headache', 'सर दर्द': 'headache',
+    'sir dard': 'headache', 'sar dard': 'headache', 'sirdard': 'headache', 'sardard': 'headache',
+    'पेट दर्द': 'stomach pain', 'pet dard': 'stomach pain',
+    'कमर दर्द': 'back pain', 'kamar dard': 'back pain',
+    'जोड़ों का दर्द': 'joint pain', 'jodon ka dard': 'joint pain', 'jodo ka dard': 'joint pain',
+    'गले में खराश': 'sore throat', 'gale mein kharash': 'sore throat', 'gale me kharash': 'sore throat',
+    'नींद नहीं': 'insomnia', 'neend nahi': 'insomnia', 'neend nahin': 'insomnia',
+    'पेट फूलना': 'bloating', 'pet phoolna': 'bloating', 'pet fulna': 'bloating',
+    'बाल झड़ना': 'hair loss', 'baal jhadna': 'hair loss', 'bal jhadna': 'hair loss',
+    'बुखार': 'fever', 'bukhar': 'fever', 'bukhaar': 'fever',
+    'खांसी': 'cough', 'खाँसी': 'cough', 'khansi': 'cough', 'khaansi': 'cough',
+    'जुकाम': 'cold', 'ज़ुकाम': 'cold', 'सर्दी': 'cold', 'zukam': 'cold', 'jukam': 'cold', 'sardi': 'cold',
+    'थकान': 'fatigue', 'thakan': 'fatigue', 'thakaan': 'fatigue',
+    'कमजोरी': 'weakness', 'कमज़ोरी': 'weakness', 'kamzori': 'weakness', 'kamjori': 'weakness',
+    'तनाव': 'stress', 'tanav': 'stress', 'tanaav': 'stress',
+    'चिंता': 'anxiety', 'घबराहट': 'anxiety', 'chinta': 'anxiety', 'ghabrahat': 'anxiety',
+    'अनिद्रा': 'insomnia', 'anidra': 'insomnia', 'नींद': 'sleep', 'neend': 'sleep',
+    'कब्ज': 'constipation', 'कब्ज़': 'constipation', 'kabz': 'constipation', 'kabj': 'constipation',
+    'अपच': 'indigestion', 'बदहजमी': 'indigestion', 'apach': 'indigestion', 'badhazmi': 'indigestion',
+    'एसिडिटी': 'acidity', 'गैस': 'gas', 'जलन': 'burning', 'jalan': 'burning',
+    'खुजली': 'itching', 'khujli': 'itching', 'चक्कर': 'dizziness', 'chakkar': 'dizziness',
+    'उल्टी': 'vomiting', 'ulti': 'vomiting', 'मतली': 'nausea', 'matli': 'nausea',
+    'दस्त': 'diarrhea', 'dast': 'diarrhea', 'मुंहासे': 'acne', 'muhase': 'acne', 'muhaase': 'acne',
+    'सूजन': 'swelling', 'soojan': 'swelling', 'sujan': 'swelling',
+    'दर्द': 'pain', 'dard': 'pain', 'त्वचा': 'skin', 'twacha': 'skin',
+}
+
+# first word -> [(term words, English words)], longest term first
+TRANSLITERATION_TERMS: Dict[str, List[Tuple[tuple, List[str]]]] = {}
+for _term, _english in sorted(HINDI_SYMPTOM_TERMS.items(), key=lambda item: -len(item[0].split())):
+    _words = tuple(_term.split())
+    TRANSLITERATION_TERMS.setdefault(_words[0], []).append((_words, _english.split()))
+
+def transliterate_symptoms(words: List[str]) -> List[str]:
+    """Replace Hindi/Hinglish symptom terms (whole tokens) with their English catalog terms"""
+    if TRANSLITERATION_TERMS.keys().isdisjoint(words):
+        return words
+    
+    out = []
+    i = 0
+    while i < len(words):
+        for term, english in TRANSLITERATION_TERMS.get(words[i], ()):
+            if tuple(words[i:i + len(term)]) == term:
+                out.extend(english)
+                i += len(term)
+                break
+        else:
+            out.append(words[i])
+            i += 1
+    return out
+
+def light_stem(word: str) -> str:
     """
-    Normalize user input for better matching
-    Returns: {original, normalized, keywords}
+    Plural and -ing folding for English words (NORMALIZE_STEMMING)
+    Matching is substring based, so a stem only has to be a prefix of the catalog term
     """
+    if not word.isascii():
+        return word
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    if len(word) > 6 and word.endswith('ing'):
+        return word[:-3]
+    return word
+
+def min_token_length(word: str) -> int:
+    """Latin tokens need 3+ characters; Devanagari words are shorter ('सिर', 'पेट')"""
+    if word.isascii():
+        return 3
+    return 2 if DEVANAGARI_RE.search(word) else 3
+
+TOKENIZERS: Dict[str, object] = {}  # language -> fn(normalized text) -> keywords
+
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_cached(symptom: str, language: str) -> Tuple[str, str, tuple]:
     original = symptom.strip()
     
-    # Convert to lowercase
-    normalized = original.lower()
-    
-    # Remove punctuation but keep spaces
-    normalized = re.sub(r'[^\w\s]', ' ', normalized)
-    
-    # Remove extra spaces
-    normalized = ' '.join(normalized.split())
-    
-    # Extract keywords (words longer than 2 characters)
-    keywords = [word for word in normalized.split() if len(word) > 2]
+    # Convert to lowercase, remove punctuation but keep spaces, remove extra spaces
+    normalized = ' '.join(PUNCTUATION_RE.sub(' ', original.lower()).split())
     
-    # Remove common stop words
-    stop_words = {'the', 'and', 'have', 'with', 'for', 'from', 'that', 'this', 'are', 'was', 'been'}
-    keywords = [word for word in keywords if word not in stop_words]
+    tokenizer = TOKENIZERS.get(language) or TOKENIZERS['en']
+    return original, normalized, tuple(tokenizer(normalized))
+
+def register_tokenizer(language: str):
+    """Decorator: use fn(normalized text) -> keywords for `language`"""
+    def register(fn):
+        TOKENIZERS[language] = fn
+        _normalize_cached.cache_clear()
+        return fn
+    return register
+
+def script_aware_tokens(normalized: str, stop_words: frozenset) -> List[str]:
+    words = transliterate_symptoms(normalized.split())
+    if NORMALIZE_STEMMING:
+        words = [light_stem(word) for word in words]
+    return [word for word in words if len(word) >= min_token_length(word) and word not in stop_words]
+
+@register_tokenizer('en')
+def english_tokens(normalized: str) -> List[str]:
+    return script_aware_tokens(normalized, STOP_WORDS['en'])
+
+@register_tokenizer('hi')
+def hindi_tokens(normalized: str) -> List[str]:
+    return script_aware_tokens(normalized, STOP_WORDS['hi'])
+
+def normalize_input(symptom: str, language: str = "en") -> Dict:
+    """
+    Normalize user input for better matching
+    Memoized on the raw input and language, so repeat phrasings are free
+    Returns: {original, normalized, keywords}
+    """
+    original, normalized, keywords = _normalize_cached(symptom, language)
     
-    logger.info(f"📝 Normalized: '{original}' → '{normalized}' → {keywords}")
+    logger.info(f"📝 Normalized: '{original}' → '{normalized}' → {list(keywords)}")
     
     return {
         'original': original,
         'normalized': normalized,
-        'keywords': keywords
+        'keywords': list(keywords)
     }
 
 # ============================================
 # LAYER 1: EMERGENCY DETECTION
 # ============================================
 
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a fixed phrase list
+    Finds every phrase occurrence in a single pass over the text, with the same
+    substring semantics as `phrase in text` ('stroke' hits 'heatstroke')
+    Each hit also says whether it starts and ends on a word boundary, for callers
+    that rank whole-word hits above ones inside a longer word
+    """
+    
+    def __init__(self, phrases: List[str], normalize=None):
+        self.normalize = normalize or (lambda text: text.lower())
+        self.phrases: List[str] = []
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        
+        for phrase in phrases:
+            pattern = self.normalize(phrase)
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(len(self.phrases))
+            self.phrases.append(phrase)
+            self._lengths.append(len(pattern))
+        
+        # Breadth-first pass to build failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+    
+    def find_all(self, text: str) -> List[Tuple[int, str, bool, bool]]:
+        """Returns (start offset, phrase, starts a word, ends a word) for every hit, in text order"""
+        text = self.normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        node = 0
+        
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            ends_word = i + 1 == len(text) or not text[i + 1].isalnum()
+            for phrase_id in out[node]:
+                start = i - self._lengths[phrase_id] + 1
+                starts_word = start == 0 or not text[start - 1].isalnum()
+                hits.append((start, self.phrases[phrase_id], starts_word, ends_word))
+        
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+def normalize_phrase(text: str) -> str:
+    """Same punctuation/whitespace folding as normalize_input, so 'can't breathe' matches normalized input"""
+    return ' '.join(PUNCTUATION_RE.sub(' ', text.lower()).split())
+
+def load_emergency_keywords() -> List[str]:
+    """EMERGENCY_KEYWORDS plus optional extra phrases (one per line) from EMERGENCY_KEYWORDS_FILE"""
+    keywords = list(EMERGENCY_KEYWORDS)
+    path = os.getenv("EMERGENCY_KEYWORDS_FILE")
+    
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                keywords.extend(
+                    line.strip() for line in f
+                    if line.strip() and not line.startswith('#')
+                )
+        except OSError as e:
+            logger.error(f"Could not read emergency keywords file {path}: {e}")
+    
+    return keywords
+
+def build_emergency_matcher() -> PhraseMatcher:
+    """
+    Compile the emergency phrase list (call again to pick up config changes)
+    Plain substring matching, like the original `keyword in text` scan: a word-boundary
+    rule would stop 'sunstroke' or 'foodpoisoning' from raising the alert
+    """
+    global emergency_matcher, emergency_words
+    emergency_matcher = PhraseMatcher(load_emergency_keywords(), normalize=normalize_phrase)
+    emergency_words = frozenset(word for phrase in emergency_matcher.phrases for word in normalize_phrase(phrase).split())
+    logger.info(f"🚨 Emergency matcher compiled with {len(emergency_matcher.phrases)} phrases")
+    return emergency_matcher
+
+# Words of the emergency phrases: typo correction never rewrites these ("heart" must not become "heat")
+emergency_words: frozenset = frozenset()
+emergency_matcher: PhraseMatcher = build_emergency_matcher()
+
 def check_emergency(symptom: str) -> Optional[Dict]:
     """
     Check if symptom indicates medical emergency
     Returns emergency response or None
     """
-    symptom_lower = symptom.lower()
+    hits = emergency_matcher.find_all(symptom)
     
-    for keyword in EMERGENCY_KEYWORDS:
-        if keyword in symptom_lower:
-            logger.warning(f"🚨 EMERGENCY DETECTED: '{keyword}' in symptom")
-            return {
-                'type': 'emergency',
-                'severity': 'critical',
-                'message': 'Seek Immediate Medical Attention',
-                'action': 'Visit the nearest hospital or call emergency services immediately. This symptom requires urgent professional medical care.',
-                'detected_keyword': keyword,
-                'disclaimer': 'This is an automated alert. Always prioritize professional medical evaluation for serious symptoms.'
-            }
+    if hits:
+        detected = list(dict.fromkeys(phrase for _, phrase, _, _ in hits))
+        logger.warning(f"🚨 EMERGENCY DETECTED: {detected} in symptom")
+        return {
+            'type': 'emergency',
+            'severity': 'critical',
+            'message': 'Seek Immediate Medical Attention',
+            'action': 'Visit the nearest hospital or call emergency services immediately. This symptom requires urgent professional medical care.',
+            'detected_keyword': detected[0],
+            'detected_keywords': detected,
+            'disclaimer': 'This is an automated alert. Always prioritize professional medical evaluation for serious symptoms.'
+        }
     
     return None
 
+def query_emergency(normalized: Dict) -> Optional[Dict]:
+    """
+    check_emergency for a normalized (possibly typo-corrected) query: the text as typed
+    is checked first, and the corrected text too when correct_keywords respelled anything
+    """
+    emergency = check_emergency(normalized.get('uncorrected', normalized['normalized']))
+    if emergency is None and normalized.get('corrections'):
+        emergency = check_emergency(normalized['normalized'])
+    return emergency
+
 # ============================================
 # LAYER 2: RANKED SYMPTOM MATCHING
 # ============================================
@@ -186,11 +805,26 @@ def calculate_match_score(symptom_keywords: List[str], remedy_symptoms: List[str
         'total_possible': len(remedy_symptoms)
     }
 
-def rank_remedies(keywords: List[str], remedies: List[dict]) -> List[dict]:
+RANKING_ENGINE = os.getenv("RANKING_ENGINE", "index").lower()  # 'index' or 'numpy'
+RANKING_TOP_K = 3
+SYMPTOM_KEYWORD_CACHE_SIZE = int(os.getenv("SYMPTOM_KEYWORD_CACHE_SIZE", "10000"))
+
+def rank_remedies(
+    keywords: List[str],
+    remedies: List[dict],
+    index: Optional['SymptomIndex'] = None,
+    matrix: Optional['SymptomMatrix'] = None
+) -> List[dict]:
     """
     Rank all remedies by relevance to symptoms
+    If an index (or matrix) built from `remedies` is given, only candidate remedies are scored
     Returns top matches with scores
     """
+    if matrix is not None:
+        return matrix.rank(keywords)
+    if index is not None:
+        return rank_remedies_indexed(keywords, index)
+    
     ranked = []
     
     for remedy in remedies:
@@ -209,7 +843,476 @@ def rank_remedies(keywords: List[str], remedies: List[dict]) -> List[dict]:
     
     logger.info(f"🎯 Ranked {len(ranked)} remedies, top score: {ranked[0]['match_score'] if ranked else 0}")
     
-    return ranked[:3]  # Return top 3
+    return ranked[:RANKING_TOP_K]  # Return top 3
+
+class SymptomIndex:
+    """
+    Inverted index over remedy symptoms
+    Keeps calculate_match_score semantics (keyword in symptom or symptom in keyword)
+    but only touches remedies that share a symptom with the query
+    """
+    NGRAM = 3
+    
+    def __init__(self):
+        self.remedies: Dict[str, dict] = {}          # remedy key -> remedy
+        self.symptoms: Dict[str, tuple] = {}         # remedy key -> lowercased symptoms
+        self.order: Dict[str, int] = {}              # remedy key -> catalog position
+        self.postings: Dict[str, Dict[str, int]] = {}  # symptom -> {remedy key: first position}
+        self.ngrams: Dict[str, set] = {}             # n-gram -> symptoms containing it
+        self.lengths: Counter = Counter()            # symptom length -> indexed symptoms that long
+        self.max_length = 0
+        self._keyword_cache = LRUCache(SYMPTOM_KEYWORD_CACHE_SIZE)  # keyword -> matching symptoms
+    
+    @staticmethod
+    def remedy_key(remedy: dict, position: int) -> str:
+        return str(remedy.get('id') or f'#{position}')
+    
+    def _grams(self, text: str) -> set:
+        return {text[i:i + self.NGRAM] for i in range(len(text) - self.NGRAM + 1)}
+    
+    def _add(self, key: str, symptoms: tuple):
+        self.symptoms[key] = symptoms
+        for position, symptom in enumerate(symptoms):
+            postings = self.postings.get(symptom)
+            if postings is None:
+                postings = self.postings[symptom] = {}
+                self.lengths[len(symptom)] += 1
+                for gram in self._grams(symptom):
+                    self.ngrams.setdefault(gram, set()).add(symptom)
+            postings.setdefault(key, position)
+    
+    def _remove(self, key: str):
+        for symptom in set(self.symptoms.pop(key, ())):
+            postings = self.postings[symptom]
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[symptom]
+                self.lengths[len(symptom)] -= 1
+                if not self.lengths[len(symptom)]:
+                    del self.lengths[len(symptom)]
+                for gram in self._grams(symptom):
+                    grams = self.ngrams[gram]
+                    grams.discard(symptom)
+                    if not grams:
+                        del self.ngrams[gram]
+    
+    def update(self, remedies: List[dict]) -> int:
+        """
+        Sync the index with a new catalog, re-indexing only remedies whose symptoms changed
+        Returns the number of remedies (re)indexed or removed
+        """
+        touched = 0
+        order = {}
+        for position, remedy in enumerate(remedies):
+            key = self.remedy_key(remedy, position)
+            order[key] = position
+            symptoms = tuple(
+                symptom.lower() for symptom in (remedy.get('symptoms') or [])
+                if isinstance(symptom, str)
+            )
+            self.remedies[key] = remedy
+            if self.symptoms.get(key) != symptoms:
+                self._remove(key)
+                self._add(key, symptoms)
+                touched += 1
+        
+        for key in list(self.symptoms):
+            if key not in order:
+                self._remove(key)
+                self.remedies.pop(key, None)
+                touched += 1
+        
+        self.order = order
+        self.max_length = max(self.lengths, default=0)
+        self._keyword_cache.clear()
+        return touched
+    
+    def matching_symptoms(self, keyword: str) -> set:
+        """All indexed symptoms where keyword in symptom or symptom in keyword"""
+        cached = self._keyword_cache.get(keyword)
+        if cached is not None:
+            return cached
+        
+        matches = set()
+        
+        # symptom in keyword: look up the keyword's substrings, none longer than the
+        # longest indexed symptom (O(len * max_length), not O(len^2) for huge tokens)
+        if '' in self.postings:
+            matches.add('')
+        for start in range(len(keyword)):
+            for end in range(start + 1, min(start + self.max_length, len(keyword)) + 1):
+                if keyword[start:end] in self.postings:
+                    matches.add(keyword[start:end])
+        
+        # keyword in symptom: intersect n-gram posting sets, then verify
+        if len(keyword) > self.max_length:
+            candidates = ()
+        elif len(keyword) >= self.NGRAM:
+            candidates = None
+            for gram in self._grams(keyword):
+                grams = self.ngrams.get(gram)
+                if not grams:
+                    candidates = set()
+                    break
+                candidates = set(grams) if candidates is None else candidates & grams
+        else:
+            candidates = self.postings.keys()
+        matches.update(symptom for symptom in candidates if keyword in symptom)
+        
+        self._keyword_cache.set(keyword, matches)
+        return matches
+    
+    def match(self, keywords: List[str]) -> Dict[str, List[str]]:
+        """
+        Returns {remedy key: matched symptoms} in keyword order,
+        one entry per keyword (first matching symptom), like calculate_match_score
+        """
+        matched: Dict[str, List[str]] = {}
+        for keyword in keywords:
+            first_hit: Dict[str, int] = {}
+            for symptom in self.matching_symptoms(keyword):
+                for key, position in self.postings[symptom].items():
+                    if position < first_hit.get(key, len(self.symptoms[key])):
+                        first_hit[key] = position
+            for key, position in first_hit.items():
+                matched.setdefault(key, []).append(self.remedies[key]['symptoms'][position])
+        return matched
+
+def rank_remedies_indexed(keywords: List[str], index: SymptomIndex) -> List[dict]:
+    """Index-backed rank_remedies: same top 3 and match_score values"""
+    candidates = []
+    
+    for key, matched in index.match(keywords).items():
+        total = len(index.remedies[key].get('symptoms') or [])
+        score = round((len(matched) / total) * 100, 2) if total else 0
+        if score > 0:
+            candidates.append((score, index.order[key], key, matched))
+    
+    # Highest score first, catalog order on ties (same as the stable sort in rank_remedies)
+    candidates.sort(key=lambda item: (-item[0], item[1]))
+    
+    ranked = []
+    for score, _, key, matched in candidates[:RANKING_TOP_K]:
+        remedy_with_score = index.remedies[key].copy()
+        remedy_with_score['match_score'] = score
+        remedy_with_score['matched_symptoms'] = list(set(matched))
+        remedy_with_score['match_count'] = len(matched)
+        ranked.append(remedy_with_score)
+    
+    logger.info(f"🎯 Ranked {len(candidates)} remedies, top score: {ranked[0]['match_score'] if ranked else 0}")
+    
+    return ranked
+
+class SymptomMatrix:
+    """
+    Vectorized ranking over a SymptomIndex (numpy)
+    The catalog is compiled into a sparse symptom-term x remedy matrix (CSR:
+    one sorted array of remedy rows per term). A batch of queries is scored as one
+    sparse (query x term) @ (term x remedy) product: the row sets of every keyword are
+    stacked as (query, remedy) cells and counted in a single np.unique, so arrays are
+    sized by the candidates, never by the catalog. The top k of each query come from
+    argpartition; only the winners are turned back into remedy dicts
+    """
+    
+    def __init__(self, index: SymptomIndex):
+        self.index = index
+        self.keys = sorted(index.order, key=index.order.get)  # row -> remedy key, catalog order
+        row_of = {key: row for row, key in enumerate(self.keys)}
+        
+        self.totals = np.array(
+            [len(index.remedies[key].get('symptoms') or []) for key in self.keys], dtype=np.float64
+        )
+        
+        self.terms: Dict[str, int] = {}
+        indptr = [0]
+        indices = []
+        for symptom, postings in index.postings.items():
+            self.terms[symptom] = len(self.terms)
+            indices.extend(sorted(row_of[key] for key in postings))
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        
+        self._keyword_rows = LRUCache(SYMPTOM_KEYWORD_CACHE_SIZE)  # keyword -> remedy rows
+    
+    def keyword_rows(self, keyword: str) -> 'np.ndarray':
+        """Remedy rows with at least one symptom matching keyword (cached)"""
+        rows = self._keyword_rows.get(keyword)
+        if rows is not None:
+            return rows
+        
+        spans = []
+        for symptom in self.index.matching_symptoms(keyword):
+            term = self.terms.get(symptom)
+            if term is not None:
+                spans.append(self.indices[self.indptr[term]:self.indptr[term + 1]])
+        
+        if not spans:
+            rows = np.empty(0, dtype=np.int64)
+        elif len(spans) == 1:
+            rows = spans[0]
+        else:
+            rows = np.unique(np.concatenate(spans))
+        
+        self._keyword_rows.set(keyword, rows)
+        return rows
+    
+    def product(self, keyword_lists: List[List[str]]) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """
+        Sparse query x remedy match counts for a batch of queries
+        Returns (query ids, remedy rows, counts) for every non-zero cell, sorted by query then row
+        A keyword listed twice counts twice, as in calculate_match_score
+        """
+        width = len(self.keys)
+        cells = [
+            self.keyword_rows(keyword) + query * width
+            for query, keywords in enumerate(keyword_lists)
+            for keyword in keywords
+        ]
+        if not width or not cells:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        
+        cells, counts = np.unique(np.concatenate(cells), return_counts=True)
+        queries, rows = np.divmod(cells, width)
+        return queries, rows, counts
+    
+    def top_rows(self, rows: 'np.ndarray', scores: 'np.ndarray', k: int) -> 'np.ndarray':
+        """
+        Positions of the k best candidates, highest score first, catalog order on ties
+        argpartition finds the k-th best score; everything tied with it is kept so ties resolve exactly
+        """
+        if len(rows) > k:
+            threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+            keep = np.flatnonzero(scores >= threshold)
+        else:
+            keep = np.arange(len(rows))
+        order = np.lexsort((rows[keep], -scores[keep]))
+        return keep[order[:k]]
+    
+    def rank(self, keywords: List[str], k: int = RANKING_TOP_K) -> List[dict]:
+        """Same top k and match_score values as rank_remedies_indexed"""
+        return self.rank_many([keywords], k)[0]
+    
+    def rank_many(self, keyword_lists: List[List[str]], k: int = RANKING_TOP_K) -> List[List[dict]]:
+        """Rank a batch of queries with one sparse product; results in input order"""
+        queries, rows, counts = self.product(keyword_lists)
+        scores = np.round(counts / self.totals[rows] * 100, 2)
+        bounds = np.searchsorted(queries, np.arange(len(keyword_lists) + 1))
+        
+        results = []
+        for query, keywords in enumerate(keyword_lists):
+            lo, hi = bounds[query], bounds[query + 1]
+            query_rows, query_scores = rows[lo:hi], scores[lo:hi]
+            
+            ranked = []
+            for position in self.top_rows(query_rows, query_scores, k):
+                key = self.keys[query_rows[position]]
+                matched = self.matched_symptoms(key, keywords)
+                remedy_with_score = self.index.remedies[key].copy()
+                remedy_with_score['match_score'] = float(query_scores[position])
+                remedy_with_score['matched_symptoms'] = list(set(matched))
+                remedy_with_score['match_count'] = int(counts[lo + position])
+                ranked.append(remedy_with_score)
+            
+            logger.info(f"🎯 Ranked {hi - lo} remedies, top score: {ranked[0]['match_score'] if ranked else 0}")
+            results.append(ranked)
+        
+        return results
+    
+    def matched_symptoms(self, key: str, keywords: List[str]) -> List[str]:
+        """First matching symptom of the remedy per keyword, as in SymptomIndex.match"""
+        symptoms = self.index.symptoms[key]
+        original = self.index.remedies[key]['symptoms']
+        matched = []
+        for keyword in keywords:
+            hits = self.index.matching_symptoms(keyword)
+            for position, symptom in enumerate(symptoms):
+                if symptom in hits:
+                    matched.append(original[position])
+                    break
+        return matched
+
+def build_symptom_matrix(index: SymptomIndex) -> Optional[SymptomMatrix]:
+    """Compile the matrix engine when RANKING_ENGINE=numpy and numpy is installed"""
+    if RANKING_ENGINE != "numpy":
+        return None
+    if np is None:
+        logger.warning("⚠️  RANKING_ENGINE=numpy but numpy is not installed, using the symptom index")
+        return None
+    return SymptomMatrix(index)
+
+# ============================================
+# LAYER 2a: TYPO-TOLERANT KEYWORDS
+# ============================================
+
+FUZZY_MAX_EDIT_DISTANCE = int(os.getenv("FUZZY_MAX_EDIT_DISTANCE", "2"))  # 0 disables correction
+FUZZY_MIN_WORD_LENGTH = int(os.getenv("FUZZY_MIN_WORD_LENGTH", "5"))
+FUZZY_PREFIX_LENGTH = 7
+FUZZY_CACHE_SIZE = int(os.getenv("FUZZY_CACHE_SIZE", "100000"))  # memoized corrections per catalog version
+
+fuzzy_stats = {'queries_corrected': 0, 'keywords_corrected': 0, 'rescued_ai_calls': 0, 'still_ai': 0}
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (a transposition counts as one edit), computed
+    only inside the diagonal band of width `limit`; returns limit + 1 once it is exceeded
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    
+    # Common prefix and suffix never cost anything
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= limit else limit + 1
+    
+    beyond = limit + 1
+    previous2 = None
+    previous = [j if j <= limit else beyond for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [i if i <= limit else beyond] + [beyond] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return beyond
+        previous2, previous = previous, current
+    return min(previous[-1], beyond)
+
+class SymptomSpeller:
+    """
+    SymSpell-style correction over the symptom vocabulary
+    Every vocabulary word is filed under each string reachable by deleting up to
+    max_distance characters from its first FUZZY_PREFIX_LENGTH characters. A typo
+    generates its own deletes and looks them up, so candidates come from a handful of
+    dict hits instead of a vocabulary scan; only those are checked with edit_distance
+    """
+    
+    def __init__(self, words: Dict[str, int], max_distance: int = FUZZY_MAX_EDIT_DISTANCE):
+        self.words = words  # word -> how many symptoms use it (tie-break)
+        self.max_distance = max_distance
+        self.deletes: Dict[str, List[str]] = {}
+        self._cache = LRUCache(FUZZY_CACHE_SIZE)  # word -> correction (None: no close word)
+        for word in words:
+            for variant in self._variants(word[:FUZZY_PREFIX_LENGTH], max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+    
+    @staticmethod
+    def _variants(word: str, distance: int) -> set:
+        """word plus every string with up to `distance` characters deleted"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {item[:i] + item[i + 1:] for item in frontier if len(item) > 1 for i in range(len(item))}
+            variants |= frontier
+        return variants
+    
+    def allowed_distance(self, word: str) -> int:
+        """Short words get fewer edits: one typo in a 5-letter word is already a lot"""
+        if len(word) < FUZZY_MIN_WORD_LENGTH:
+            return 0
+        return min(self.max_distance, 1 if len(word) < 8 else 2)
+    
+    def correct(self, word: str) -> Optional[str]:
+        """Closest vocabulary word (fewest edits, then most used, then alphabetical), or None"""
+        cached = self._cache.get(word, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        limit = self.allowed_distance(word)
+        best = None
+        if limit:
+            candidates = set()
+            for variant in self._variants(word[:FUZZY_PREFIX_LENGTH], limit):
+                candidates.update(self.deletes.get(variant, ()))
+            scored = []
+            for candidate in candidates:
+                distance = edit_distance(word, candidate, limit)
+                if distance <= limit:
+                    scored.append((distance, -self.words[candidate], candidate))
+            if scored:
+                best = min(scored)[2]
+        
+        self._cache.set(word, best)
+        return best
+
+def build_symptom_speller(index: SymptomIndex) -> Optional[SymptomSpeller]:
+    """Vocabulary: every word of the catalog symptoms and of the fallback table terms"""
+    if FUZZY_MAX_EDIT_DISTANCE <= 0:
+        return None
+    words = Counter()
+    for symptom, remedies in index.postings.items():
+        for word in normalize_phrase(symptom).split():
+            if len(word) >= 3:
+                words[word] += len(remedies)
+    for terms in fallback_matcher.terms:
+        for term in terms:
+            words.update(word for word in term.split() if len(word) >= 3)
+    return SymptomSpeller(dict(words))
+
+def correct_keywords(normalized: Dict, catalog: Optional[Dict] = None) -> Dict:
+    """
+    Replace keywords that match nothing in the catalog or fallback table with their
+    closest vocabulary word, so "hedache" ranks like "headache"
+    Known keywords and words of emergency phrases are never touched. Returns `normalized`
+    itself when nothing changed, otherwise a copy with corrected keywords and text, the
+    text as typed ('uncorrected', for the emergency check) and a corrections map
+    """
+    catalog = catalog or get_remedy_catalog()
+    speller = catalog.get('speller')
+    if speller is None or not normalized['keywords']:
+        return normalized
+    
+    index = catalog['index']
+    corrections = {}
+    any_known = False
+    for keyword in normalized['keywords']:
+        if keyword in speller.words or index.matching_symptoms(keyword):
+            any_known = True
+            continue
+        if keyword in emergency_words:
+            continue
+        fixed = speller.correct(keyword)
+        if fixed and fixed != keyword:
+            corrections[keyword] = fixed
+    
+    if not corrections:
+        return normalized
+    
+    fuzzy_stats['queries_corrected'] += 1
+    fuzzy_stats['keywords_corrected'] += len(corrections)
+    logger.info(f"🔤 Corrected keywords: {corrections}")
+    return {
+        **normalized,
+        'normalized': ' '.join(corrections.get(word, word) for word in normalized['normalized'].split()),
+        'uncorrected': normalized['normalized'],
+        'keywords': list(dict.fromkeys(corrections.get(keyword, keyword) for keyword in normalized['keywords'])),
+        'corrections': corrections,
+        # No keyword matched before correction: ranking alone would have found nothing
+        'corrected_only': not any_known
+    }
+
+def record_fuzzy_outcome(normalized: Dict, symptom: str, answered: bool):
+    """
+    Count corrected queries that got a dataset/fallback answer but would otherwise
+    have gone to the AI (nothing ranked and the raw text misses the fallback table)
+    """
+    if not normalized.get('corrections'):
+        return
+    if not answered:
+        fuzzy_stats['still_ai'] += 1
+    elif normalized.get('corrected_only') and fallback_matcher.best(symptom) is None:
+        fuzzy_stats['rescued_ai_calls'] += 1
 
 # ============================================
 # LAYER 3: DOSHA-AWARE ADJUSTMENT
@@ -238,16 +1341,44 @@ def get_user_dosha(user_id: str) -> Optional[Dict]:
     
     return None
 
-def adjust_by_dosha(user_id: Optional[str], remedies: List[dict], keywords: List[str]) -> List[dict]:
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+PROFILE_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+
+# user_id -> dosha profile (None cached too, for a shorter time)
+profile_cache = LRUCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
+
+async def get_cached_user_dosha(user_id: str) -> Optional[Dict]:
+    """get_user_dosha through the per-user profile cache"""
+    dosha_profile = profile_cache.get(user_id, _MISSING)
+    if dosha_profile is not _MISSING:
+        return dosha_profile
+    
+    dosha_profile = await run_db(get_user_dosha, user_id)
+    profile_cache.set(
+        user_id,
+        dosha_profile,
+        ttl=None if dosha_profile else PROFILE_CACHE_NEGATIVE_TTL_SECONDS
+    )
+    return dosha_profile
+
+def adjust_by_dosha(
+    user_id: Optional[str],
+    remedies: List[dict],
+    keywords: List[str],
+    dosha_profile: Optional[Dict] = None
+) -> List[dict]:
     """
     Adjust remedy ranking based on user's dosha
     Boost remedies that balance the user's dominant dosha
+    Pass dosha_profile if it has already been fetched to skip the lookup
     """
     if not user_id:
         logger.info("⚖️  No user_id provided, skipping dosha adjustment")
         return remedies
     
-    dosha_profile = get_user_dosha(user_id)
+    if dosha_profile is None:
+        dosha_profile = get_user_dosha(user_id)
     
     if not dosha_profile:
         logger.info("⚖️  No dosha profile found, skipping adjustment")
@@ -279,6 +1410,9 @@ class QueryRequest(BaseModel):
     symptom: str
     language: str = "en"  # 'en' or 'hi'
 
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest]
+
 class RemedyResponse(BaseModel):
     success: bool
     remedy_id: Optional[str]
@@ -296,6 +1430,9 @@ class RemedyResponse(BaseModel):
     match_score: Optional[float] = None
     matched_symptoms: Optional[List[str]] = None
     dosha_adjusted: Optional[bool] = False
+    
+    # Pre-encoded JSON of the static fields (success..category), when built from a catalog projection
+    _body_prefix: Optional[bytes] = PrivateAttr(default=None)
 
 class EmergencyResponse(BaseModel):
     type: str = "emergency"
@@ -303,6 +1440,7 @@ class EmergencyResponse(BaseModel):
     message: str
     action: str
     detected_keyword: str
+    detected_keywords: List[str] = []
     disclaimer: str
 
 class DoshaQuizAnswer(BaseModel):
@@ -335,84 +1473,583 @@ class HistoryItem(BaseModel):
 # AUTHENTICATION HELPER
 # ============================================
 
-def verify_token(authorization: str = Header(None)) -> str:
-    """Verify Supabase JWT token from FlutterFlow"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    try:
-        # Remove 'Bearer ' prefix
-        token = authorization.replace("Bearer ", "")
-        
-        # Verify token with Supabase
-        user = supabase.auth.get_user(token)
-        return user.user.id
-    except Exception as e:
-        logger.error(f"Auth error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")  # legacy HS256 projects
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or f"{(os.getenv('SUPABASE_URL') or '').rstrip('/')}/auth/v1/.well-known/jwks.json"
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
 
-# ============================================
-# ENHANCED SEARCH ENGINE WITH RANKING
-# ============================================
+# Accept X-User-ID from callers without a token. On by default while the web client still
+# identifies users that way; set to false once every client sends its Supabase access token
+AUTH_TRUST_USER_HEADER = os.getenv("AUTH_TRUST_USER_HEADER", "true").lower() == "true"
 
-def search_remedies_ranked(keywords: List[str], language: str = "en") -> List[dict]:
-    """
-    Search and rank remedies by relevance
-    Returns: List of ranked remedies with scores
-    """
-    try:
-        # Get all remedies from database
-        response = supabase.table('remedies').select('*').execute()
-        
-        if not response.data:
-            logger.warning("No remedies found in database")
-            return []
-        
+ALLOWED_JWT_ALGORITHMS = {'HS256', 'RS256', 'ES256'}
+
+# kid -> public key, replaced wholesale by refresh_jwks()
+jwks_keys: Dict[str, object] = {}
+_jwks_refresh_task: Optional[asyncio.Task] = None
+
+# sha256(token) -> user id, each entry expiring no later than the token itself
+token_cache = LRUCache(TOKEN_CACHE_SIZE)
+auth_stats = {'local': 0, 'remote': 0, 'cached': 0, 'rejected': 0}
+
+class UnknownSigningKey(Exception):
+    """Token signed with a key we do not hold locally"""
+
+def refresh_jwks() -> int:
+    """Download the project's JWKS and swap in the new signing keys"""
+    global jwks_keys
+    
+    response = httpx.get(SUPABASE_JWKS_URL, timeout=5)
+    response.raise_for_status()
+    
+    keys = {}
+    for jwk in response.json().get('keys', []):
+        try:
+            keys[jwk['kid']] = jwt.PyJWK(jwk).key
+        except Exception as e:
+            logger.warning(f"Skipping unusable JWK {jwk.get('kid')}: {e}")
+    
+    jwks_keys = keys
+    logger.info(f"🔑 Loaded {len(keys)} JWT signing keys")
+    return len(keys)
+
+async def rotate_jwks_periodically():
+    """Background task: load the signing keys now, then every JWKS_REFRESH_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_jwks)
+        except Exception as e:
+            logger.warning(f"JWKS refresh failed, unknown keys will be verified remotely: {e}")
+        if JWKS_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(JWKS_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def start_jwks_rotation():
+    global _jwks_refresh_task
+    _jwks_refresh_task = asyncio.create_task(rotate_jwks_periodically())
+
+@app.on_event("shutdown")
+async def stop_jwks_rotation():
+    if _jwks_refresh_task:
+        _jwks_refresh_task.cancel()
+
+def verify_jwt_locally(token: str) -> Dict:
+    """
+    Check signature, expiry and audience without a network call
+    Raises UnknownSigningKey if the key is not held locally, jwt.InvalidTokenError if the token is bad
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get('alg')
+    
+    if algorithm not in ALLOWED_JWT_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"Unsupported algorithm {algorithm}")
+    
+    if algorithm == 'HS256':
+        if not SUPABASE_JWT_SECRET:
+            raise UnknownSigningKey('HS256')
+        key = SUPABASE_JWT_SECRET
+    else:
+        key = jwks_keys.get(header.get('kid'))
+        if key is None:
+            raise UnknownSigningKey(header.get('kid'))
+    
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={'require': ['exp', 'sub']}
+    )
+
+async def verify_token(authorization: str = Header(None)) -> str:
+    """Verify Supabase JWT token from FlutterFlow"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authorization header")
+    
+    # Remove 'Bearer ' prefix
+    token = authorization.replace("Bearer ", "")
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    user_id = token_cache.get(token_hash)
+    if user_id:
+        auth_stats['cached'] += 1
+        return user_id
+    
+    try:
+        claims = verify_jwt_locally(token)
+        user_id = claims['sub']
+        expires_at = claims['exp']
+        auth_stats['local'] += 1
+    except UnknownSigningKey as e:
+        # Key not held locally (rotation in progress or no local key configured): ask the auth server
+        try:
+            logger.info(f"🔑 Unknown signing key {e}, verifying token remotely")
+            user = await run_db(supabase.auth.get_user, token)
+            user_id = user.user.id
+            expires_at = jwt.decode(token, options={'verify_signature': False}).get('exp', 0)
+            auth_stats['remote'] += 1
+        except Exception as e:
+            auth_stats['rejected'] += 1
+            logger.error(f"Auth error: {e}")
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+    except jwt.InvalidTokenError as e:
+        auth_stats['rejected'] += 1
+        logger.error(f"Auth error: {e}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    
+    ttl = min(TOKEN_CACHE_MAX_TTL_SECONDS, expires_at - time.time())
+    if ttl > 0:
+        token_cache.set(token_hash, user_id, ttl=ttl)
+    
+    return user_id
+
+async def current_user(
+    authorization: Optional[str] = Header(None),
+    x_user_id: Optional[str] = Header(None, alias="X-User-ID")
+) -> Optional[str]:
+    """
+    The caller's user id from a verified Bearer token (401 if the token is bad)
+    Without a token, X-User-ID when AUTH_TRUST_USER_HEADER is on; otherwise anonymous (None)
+    """
+    if authorization:
+        return await verify_token(authorization)
+    if AUTH_TRUST_USER_HEADER and x_user_id:
+        return x_user_id
+    return None
+
+async def require_user(user_id: Optional[str] = Depends(current_user)) -> str:
+    """current_user for endpoints that only make sense signed in"""
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Missing authorization header")
+    return user_id
+
+# ============================================
+# REMEDY CATALOG CACHE
+# ============================================
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+CATALOG_RETRY_BASE_SECONDS = float(os.getenv("CATALOG_RETRY_BASE_SECONDS", "1"))
+CATALOG_RETRY_MAX_SECONDS = float(os.getenv("CATALOG_RETRY_MAX_SECONDS", "60"))
+# How long a query that arrives before the first snapshot waits for it
+CATALOG_FIRST_LOAD_WAIT_SECONDS = float(os.getenv("CATALOG_FIRST_LOAD_WAIT_SECONDS", "2"))
+# /api/remedies/sync re-sends rows stamped this long before the client's version, covering commit lag
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "60"))
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+# Current snapshot. Replaced wholesale on refresh so readers never see a half-updated catalog.
+# The next snapshot is built in a worker thread on the standby index, then the two indexes trade places.
+symptom_indexes = (SymptomIndex(), SymptomIndex())
+
+remedy_catalog: Dict = {
+    'remedies': [],
+    'version': None,
+    'stamp': None,
+    'loaded_at': None,
+    'index': symptom_indexes[0],
+    'matrix': None,
+    'ids': frozenset(),
+    'updated': []
+}
+
+_catalog_refresh_task: Optional[asyncio.Task] = None
+# Serializes builds: only one may touch the standby index at a time
+_catalog_install_lock = asyncio.Lock()
+
+# Background load while no catalog has been installed yet: at most one in flight, with backoff between failures
+_catalog_load_task: Optional[asyncio.Task] = None
+_catalog_load_failures = 0
+_catalog_retry_at = 0.0
+
+def catalog_fingerprint(remedies: List[dict]) -> str:
+    """
+    Content hash used as the catalog version when the database has no change tracking
+    (remedies.updated_at / remedy_tombstones missing). Hashes every row, so only call it off the loop
+    """
+    payload = json.dumps(remedies, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def timestamp_micros(value) -> Optional[int]:
+    """Postgres timestamptz as returned by PostgREST -> microseconds since the epoch (None if unparsable)"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+def micros_to_timestamp(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+def catalog_version(stamp: Tuple[int, int, int]) -> str:
+    """'<newest change, epoch microseconds>-<row count>': orders by time and doubles as the sync cursor"""
+    count, updated, deleted = stamp
+    return f"{max(updated, deleted)}-{count}"
+
+def parse_catalog_version(version: Optional[str]) -> Optional[int]:
+    """Timestamp part of a catalog_version(), None for fingerprint versions and garbage"""
+    head, sep, count = (version or '').partition('-')
+    if not sep or not head.isdigit() or not count.isdigit():
+        return None
+    return int(head)
+
+def fetch_catalog_stamp() -> Optional[Tuple[int, int, int]]:
+    """
+    Cheap change probe (network I/O): (row count, newest remedies.updated_at, newest tombstone)
+    None when the change-tracking columns are missing
+    """
+    try:
+        newest = supabase.table('remedies').select('updated_at', count='exact') \
+            .order('updated_at', desc=True, nullsfirst=False).limit(1).execute()
+        tombstone = supabase.table('remedy_tombstones').select('deleted_at') \
+            .order('deleted_at', desc=True).limit(1).execute()
+    except APIError as e:
+        logger.warning(f"Catalog change tracking unavailable, falling back to fingerprints: {e}")
+        return None
+    
+    updated = timestamp_micros(newest.data[0].get('updated_at')) if newest.data else 0
+    if updated is None:
+        return None
+    deleted = timestamp_micros(tombstone.data[0].get('deleted_at')) if tombstone.data else 0
+    return (newest.count or 0, updated, deleted or 0)
+
+def fetch_tombstones_since(micros: int) -> Optional[List[str]]:
+    """Ids of remedies deleted after `micros` (network I/O), None without a tombstone table"""
+    try:
+        response = supabase.table('remedy_tombstones').select('remedy_id') \
+            .gt('deleted_at', micros_to_timestamp(micros)).execute()
+    except APIError as e:
+        logger.warning(f"Remedy tombstones unavailable: {e}")
+        return None
+    return [str(row['remedy_id']) for row in response.data or []]
+
+def fetch_remedies() -> List[dict]:
+    """Read the full remedies table (network I/O)"""
+    response = supabase.table('remedies').select('*').execute()
+    return response.data or []
+
+def standby_symptom_index() -> SymptomIndex:
+    """The index the live snapshot is not using"""
+    live = remedy_catalog['index']
+    return symptom_indexes[1] if live is symptom_indexes[0] else symptom_indexes[0]
+
+def build_catalog_snapshot(remedies: List[dict], stamp: Optional[Tuple], index: SymptomIndex,
+                           current_version: Optional[str]) -> Optional[Dict]:
+    """
+    Everything derived from a fetched remedy list, built on the standby `index`
+    Safe to run in a worker thread: touches nothing the live snapshot uses
+    Returns None when the content is unchanged (fingerprint versions only)
+    """
+    version = catalog_version(stamp) if stamp else catalog_fingerprint(remedies)
+    if version == current_version:
+        return None
+    
+    reindexed = index.update(remedies)
+    suggester = build_symptom_suggester({'remedies': remedies, 'version': version}, symptom_popularity)
+    updated = sorted(
+        (micros, position)
+        for position, remedy in enumerate(remedies)
+        if (micros := timestamp_micros(remedy.get('updated_at'))) is not None
+    )
+    logger.info(f"📚 Remedy catalog built: {len(remedies)} remedies, {reindexed} re-indexed (version {version})")
+    return {
+        'remedies': remedies,
+        'version': version,
+        'stamp': stamp,
+        'loaded_at': None,
+        'index': index,
+        'matrix': build_symptom_matrix(index),
+        'projections': build_remedy_projections(remedies),
+        'speller': build_symptom_speller(index),
+        'suggester': suggester,
+        'ids': frozenset(str(remedy['id']) for remedy in remedies if remedy.get('id') is not None),
+        # (updated_at micros, position in remedies), oldest first: the sync delta source
+        'updated': updated
+    }
+
+def swap_catalog_snapshot(snapshot: Optional[Dict], stamp: Optional[Tuple] = None) -> bool:
+    """
+    Make `snapshot` live (on the loop). None means unchanged: just mark the current one fresh
+    Returns True if the catalog version changed
+    """
+    global remedy_catalog
+    
+    if snapshot is None:
+        remedy_catalog['loaded_at'] = time.time()
+        remedy_catalog['stamp'] = stamp or remedy_catalog.get('stamp')
+        return False
+    
+    snapshot['loaded_at'] = time.time()
+    remedy_catalog = snapshot
+    response_cache.clear()
+    return True
+
+def install_remedy_catalog(remedies: List[dict], stamp: Optional[Tuple] = None) -> bool:
+    """
+    Build and swap in a snapshot synchronously (tests and benchmarks)
+    Returns True if the catalog version changed
+    """
+    snapshot = build_catalog_snapshot(remedies, stamp, standby_symptom_index(), remedy_catalog['version'])
+    return swap_catalog_snapshot(snapshot, stamp)
+
+async def reload_remedy_catalog() -> bool:
+    """
+    Probe the version; only if it moved, fetch the rows and build the next snapshot in a
+    worker thread, then swap it in on the loop. Returns True if the catalog version changed
+    """
+    async with _catalog_install_lock:
+        stamp = await run_db(fetch_catalog_stamp)
+        if stamp is not None and stamp == remedy_catalog.get('stamp'):
+            remedy_catalog['loaded_at'] = time.time()
+            return False
+        
+        remedies = await run_db(fetch_remedies)
+        snapshot = await asyncio.to_thread(
+            build_catalog_snapshot, remedies, stamp, standby_symptom_index(), remedy_catalog['version']
+        )
+        return swap_catalog_snapshot(snapshot, stamp)
+
+async def load_catalog_with_backoff() -> bool:
+    """
+    One reload attempt; a failure pushes the next attempt out exponentially
+    (CATALOG_RETRY_BASE_SECONDS doubling up to CATALOG_RETRY_MAX_SECONDS)
+    """
+    global _catalog_load_failures, _catalog_retry_at
+    
+    try:
+        changed = await reload_remedy_catalog()
+    except Exception as e:
+        _catalog_load_failures += 1
+        delay = min(CATALOG_RETRY_MAX_SECONDS, CATALOG_RETRY_BASE_SECONDS * 2 ** (_catalog_load_failures - 1))
+        _catalog_retry_at = time.time() + delay
+        logger.error(f"Catalog load error (attempt {_catalog_load_failures}, next in {delay:.0f}s): {e}")
+        return False
+    
+    _catalog_load_failures = 0
+    _catalog_retry_at = 0.0
+    return changed
+
+def schedule_catalog_load() -> Optional[asyncio.Task]:
+    """
+    Start a background catalog load unless one is already running or the backoff
+    has not expired yet. Never blocks: callers keep serving the current (possibly empty) snapshot
+    """
+    global _catalog_load_task
+    
+    if _catalog_load_task is not None and not _catalog_load_task.done():
+        return _catalog_load_task
+    if time.time() < _catalog_retry_at:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    
+    _catalog_load_task = loop.create_task(load_catalog_with_backoff())
+    return _catalog_load_task
+
+def get_remedy_catalog() -> Dict:
+    """
+    Return the current catalog snapshot
+    Until the first load succeeds this is the empty catalog, and a background load is scheduled
+    """
+    if remedy_catalog['loaded_at'] is None:
+        schedule_catalog_load()
+    return remedy_catalog
+
+def require_remedy_catalog() -> Dict:
+    """The current catalog, or 503 (with Retry-After) for endpoints that would otherwise list nothing"""
+    catalog = get_remedy_catalog()
+    if catalog['loaded_at'] is None:
+        retry_after = max(1, int(_catalog_retry_at - time.time() + 0.999))
+        raise HTTPException(
+            status_code=503,
+            detail="Remedy catalog is loading, please retry",
+            headers={"Retry-After": str(retry_after)}
+        )
+    return catalog
+
+async def wait_for_remedy_catalog() -> Dict:
+    """
+    The current catalog, giving a first load up to CATALOG_FIRST_LOAD_WAIT_SECONDS to land
+    Still the empty catalog if it does not (database down, slow build); callers check loaded_at
+    """
+    catalog = get_remedy_catalog()
+    task = _catalog_load_task
+    if catalog['loaded_at'] is None and task is not None and not task.done():
+        try:
+            # Shielded: a waiter timing out must not cancel the load for everyone else
+            await asyncio.wait_for(asyncio.shield(task), CATALOG_FIRST_LOAD_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    return remedy_catalog
+
+async def refresh_catalog_periodically():
+    """Background task: reload the catalog every CATALOG_REFRESH_SECONDS"""
+    while True:
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+        if remedy_catalog['loaded_at'] is None:
+            # Still empty: the backed-off loader owns retries
+            schedule_catalog_load()
+            continue
+        try:
+            await reload_remedy_catalog()
+        except Exception as e:
+            logger.error(f"Catalog refresh error: {e}")
+
+@app.on_event("startup")
+async def start_remedy_catalog():
+    """Warm the catalog before serving traffic and start the refresher"""
+    global _catalog_refresh_task
+    
+    task = schedule_catalog_load()
+    if task is not None:
+        await task
+    
+    if CATALOG_REFRESH_SECONDS > 0:
+        _catalog_refresh_task = asyncio.create_task(refresh_catalog_periodically())
+
+@app.on_event("shutdown")
+async def stop_remedy_catalog():
+    if _catalog_refresh_task:
+        _catalog_refresh_task.cancel()
+    if _catalog_load_task:
+        _catalog_load_task.cancel()
+
+def verify_admin_key(admin_key: Optional[str]):
+    """Guard for operational endpoints (requires ADMIN_API_KEY to be set)"""
+    if not ADMIN_API_KEY or admin_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+# ============================================
+# ENHANCED SEARCH ENGINE WITH RANKING
+# ============================================
+
+def project_remedy(remedy: dict, language: str = "en") -> dict:
+    """
+    The static part of a ranked remedy in the requested language
+    Missing or empty Hindi columns fall back to the English text
+    """
+    if language == "hi":
+        return {
+            'id': remedy['id'],
+            'name': remedy.get('name_hi') or remedy['name'],
+            'herb': remedy.get('herb_hi') or remedy['herb'],
+            'herb_scientific': remedy.get('herb_scientific'),
+            'dosage': remedy.get('dosage_hi') or remedy['dosage'],
+            'yoga': remedy.get('yoga_hi') or remedy['yoga'],
+            'diet': remedy.get('diet_hi') or remedy['diet'],
+            'dosha': remedy.get('dosha_hi') or remedy['dosha'],
+            'warning': remedy.get('warning_hi') or remedy['warning'],
+            'explanation': remedy.get('explanation_hi') or remedy['explanation'],
+            'category': remedy.get('category'),
+            'source': 'dataset'
+        }
+    return {
+        'id': remedy['id'],
+        'name': remedy['name'],
+        'herb': remedy['herb'],
+        'herb_scientific': remedy.get('herb_scientific'),
+        'dosage': remedy['dosage'],
+        'yoga': remedy['yoga'],
+        'diet': remedy['diet'],
+        'dosha': remedy['dosha'],
+        'warning': remedy['warning'],
+        'explanation': remedy['explanation'],
+        'category': remedy.get('category'),
+        'source': 'dataset'
+    }
+
+def remedy_response_fields(remedy: dict) -> dict:
+    """RemedyResponse fields that do not depend on the request, in model order"""
+    return {
+        'success': True,
+        'remedy_id': remedy['id'],
+        'remedy_name': remedy['name'],
+        'herb': remedy['herb'],
+        'herb_scientific': remedy.get('herb_scientific'),
+        'dosage': remedy['dosage'],
+        'yoga': remedy['yoga'],
+        'diet': remedy['diet'],
+        'dosha': remedy['dosha'],
+        'warning': remedy['warning'],
+        'explanation': remedy['explanation'],
+        'source': remedy['source'],
+        'category': remedy.get('category')
+    }
+
+def build_remedy_projections(remedies: List[dict]) -> Dict[str, Dict[str, dict]]:
+    """
+    Per-language projections of every catalog remedy, built once per catalog version
+    Each is validated against RemedyResponse here, once, and carries body_prefix: its
+    static response fields already JSON-encoded (an object missing its closing brace),
+    so responses only encode the per-request tail
+    Rows that do not validate are left out and projected (and validated) per request
+    """
+    projections = {}
+    rejected = set()
+    for language in ('en', 'hi'):
+        by_id = {}
+        for remedy in remedies:
+            if remedy.get('id') is None:
+                continue
+            try:
+                projection = project_remedy(remedy, language)
+                RemedyResponse(**remedy_response_fields(projection))
+            except (KeyError, ValidationError):
+                rejected.add(str(remedy['id']))
+                continue
+            projection['body_prefix'] = encode_json(remedy_response_fields(projection))[:-1] + b','
+            by_id[remedy['id']] = projection
+        projections[language] = by_id
+    if rejected:
+        logger.warning(f"⚠️ {len(rejected)} catalog remedies have missing or invalid fields: {sorted(rejected)[:10]}")
+    return projections
+
+def format_ranked_remedy(remedy: dict, language: str = "en", projections: Optional[Dict] = None) -> dict:
+    """Shape a ranked catalog row for the response in the requested language"""
+    projection = None
+    if projections is not None:
+        projection = projections['hi' if language == "hi" else 'en'].get(remedy['id'])
+    if projection is None:
+        projection = project_remedy(remedy, language)
+    return {
+        **projection,
+        'match_score': remedy['match_score'],
+        'matched_symptoms': remedy['matched_symptoms']
+    }
+
+def search_remedies_ranked(keywords: List[str], language: str = "en", catalog: Optional[dict] = None) -> List[dict]:
+    """
+    Search and rank remedies by relevance
+    Returns: List of ranked remedies with scores
+    """
+    try:
+        # Read from the in-memory catalog snapshot
+        if catalog is None:
+            catalog = get_remedy_catalog()
+        
+        if not catalog['remedies']:
+            logger.warning("No remedies found in catalog")
+            return []
+        
         # Rank remedies by keyword match
-        ranked_remedies = rank_remedies(keywords, response.data)
+        ranked_remedies = rank_remedies(keywords, catalog['remedies'], catalog['index'], catalog.get('matrix'))
         
         if not ranked_remedies:
             logger.info("❌ No matches found in ranking")
             return []
         
         # Format remedies for response
-        formatted_remedies = []
-        for remedy in ranked_remedies:
-            if language == "hi":
-                formatted = {
-                    'id': remedy['id'],
-                    'name': remedy.get('name_hi', remedy['name']),
-                    'herb': remedy.get('herb_hi', remedy['herb']),
-                    'herb_scientific': remedy.get('herb_scientific'),
-                    'dosage': remedy.get('dosage_hi', remedy['dosage']),
-                    'yoga': remedy.get('yoga_hi', remedy['yoga']),
-                    'diet': remedy.get('diet_hi', remedy['diet']),
-                    'dosha': remedy.get('dosha_hi', remedy['dosha']),
-                    'warning': remedy.get('warning_hi', remedy['warning']),
-                    'explanation': remedy.get('explanation_hi', remedy['explanation']),
-                    'category': remedy.get('category'),
-                    'source': 'dataset',
-                    'match_score': remedy['match_score'],
-                    'matched_symptoms': remedy['matched_symptoms']
-                }
-            else:
-                formatted = {
-                    'id': remedy['id'],
-                    'name': remedy['name'],
-                    'herb': remedy['herb'],
-                    'herb_scientific': remedy.get('herb_scientific'),
-                    'dosage': remedy['dosage'],
-                    'yoga': remedy['yoga'],
-                    'diet': remedy['diet'],
-                    'dosha': remedy['dosha'],
-                    'warning': remedy['warning'],
-                    'explanation': remedy['explanation'],
-                    'category': remedy.get('category'),
-                    'source': 'dataset',
-                    'match_score': remedy['match_score'],
-                    'matched_symptoms': remedy['matched_symptoms']
-                }
-            formatted_remedies.append(formatted)
+        projections = catalog.get('projections')
+        formatted_remedies = [format_ranked_remedy(remedy, language, projections) for remedy in ranked_remedies]
         
         logger.info(f"✅ Found {len(formatted_remedies)} ranked matches")
         return formatted_remedies
@@ -421,6 +2058,37 @@ def search_remedies_ranked(keywords: List[str], language: str = "en") -> List[di
         logger.error(f"Database search error: {e}")
         return []
 
+def search_remedies_ranked_batch(queries: List[Tuple[List[str], str]]) -> List[List[dict]]:
+    """
+    Rank many (keywords, language) queries against one catalog snapshot
+    Identical keyword sets are ranked once; every query still gets its own
+    formatted dicts, since dosha adjustment rescores them in place
+    """
+    catalog = get_remedy_catalog()
+    if not catalog['remedies']:
+        logger.warning("No remedies found in catalog")
+        return [[] for _ in queries]
+    
+    distinct = list(dict.fromkeys(tuple(keywords) for keywords, _ in queries))
+    try:
+        if catalog.get('matrix') is not None:
+            ranked = catalog['matrix'].rank_many([list(signature) for signature in distinct])
+        else:
+            ranked = [rank_remedies(list(signature), catalog['remedies'], catalog['index']) for signature in distinct]
+        ranked_by_keywords = dict(zip(distinct, ranked))
+        
+        projections = catalog.get('projections')
+        results = [
+            [format_ranked_remedy(remedy, language, projections) for remedy in ranked_by_keywords[tuple(keywords)]]
+            for keywords, language in queries
+        ]
+    except Exception as e:
+        logger.error(f"Database search error: {e}")
+        return [[] for _ in queries]
+    
+    logger.info(f"✅ Ranked {len(queries)} queries ({len(ranked_by_keywords)} distinct keyword sets)")
+    return results
+
 # ============================================
 # FALLBACK REMEDY DATABASE (for demo/testing)
 # ============================================
@@ -512,49 +2180,286 @@ FALLBACK_REMEDIES = {
     }
 }
 
+FALLBACK_REQUIRED_FIELDS = ('name', 'herb', 'dosage', 'yoga', 'diet', 'dosha', 'warning', 'explanation', 'symptoms')
+
+def load_fallback_remedies() -> Dict[str, dict]:
+    """
+    FALLBACK_REMEDIES plus optional entries from FALLBACK_REMEDIES_FILE
+    The file is a JSON object in the same {key: remedy} shape; its entries override built-in keys
+    """
+    table = dict(FALLBACK_REMEDIES)
+    path = os.getenv("FALLBACK_REMEDIES_FILE")
+    
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                extra = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read fallback remedies file {path}: {e}")
+            return table
+        if not isinstance(extra, dict):
+            logger.error(f"Fallback remedies file {path} must hold a JSON object of remedies by key")
+            return table
+        
+        for key, remedy in extra.items():
+            missing = [field for field in FALLBACK_REQUIRED_FIELDS if not remedy.get(field)]
+            if missing or not isinstance(remedy['symptoms'], list):
+                logger.error(f"Skipping fallback remedy '{key}': missing {', '.join(missing) or 'symptoms list'}")
+                continue
+            table[key] = remedy
+    
+    return table
+
+class FallbackMatcher:
+    """
+    The fallback table compiled into one PhraseMatcher over every entry key and symptom
+    An entry scores like calculate_match_score: the share of its terms found in the text.
+    Terms found at the start of a word count first, so 'gas' inside 'vegas' only decides
+    when nothing better matched ('headaches' still counts for 'headache'). Ties go to the
+    higher configured match_score, then to table order
+    """
+    
+    def __init__(self, table: Dict[str, dict]):
+        self.entries: List[dict] = []
+        self.terms: List[Dict[str, str]] = []       # per entry: normalized term -> symptom as written
+        self.owners: Dict[str, List[int]] = {}      # normalized term -> entries using it
+        
+        for key, remedy in table.items():
+            position = len(self.entries)
+            terms = {}
+            for term in [key, *remedy['symptoms']]:
+                normalized = normalize_phrase(term)
+                if normalized and normalized not in terms:
+                    terms[normalized] = term
+                    self.owners.setdefault(normalized, []).append(position)
+            self.entries.append(remedy)
+            self.terms.append(terms)
+        
+        self.matcher = PhraseMatcher(list(self.owners), normalize=normalize_phrase)
+    
+    def best(self, symptom: str) -> Optional[dict]:
+        found: Dict[int, set] = {}
+        anchored: Dict[int, set] = {}
+        for _, term, starts_word, _ in self.matcher.find_all(symptom):
+            for position in self.owners[term]:
+                found.setdefault(position, set()).add(term)
+                if starts_word:
+                    anchored.setdefault(position, set()).add(term)
+        
+        if not found:
+            return None
+        
+        def rank(position: int) -> tuple:
+            size = len(self.terms[position])
+            return (
+                -len(anchored.get(position, ())) / size,
+                -len(found[position]) / size,
+                -self.entries[position].get('match_score', 0),
+                position
+            )
+        
+        best = min(found, key=rank)
+        remedy = self.entries[best]
+        matched = [written for term, written in self.terms[best].items() if term in found[best]]
+        return {
+            **remedy,
+            'match_score': remedy.get('match_score', round(len(matched) / len(self.terms[best]) * 100, 2)),
+            'matched_symptoms': matched
+        }
+
+def build_fallback_matcher() -> FallbackMatcher:
+    """Compile the fallback table (call again to pick up config changes)"""
+    global fallback_matcher
+    table = load_fallback_remedies()
+    fallback_matcher = FallbackMatcher(table)
+    logger.info(f"🩹 Fallback matcher compiled: {len(table)} remedies, {len(fallback_matcher.owners)} terms")
+    return fallback_matcher
+
+fallback_matcher: FallbackMatcher = build_fallback_matcher()
+
 def get_fallback_remedy(symptom: str) -> Optional[dict]:
     """
     Get remedy from fallback database for common symptoms
+    Best-scoring entry, with the terms that matched in matched_symptoms
+    """
+    return fallback_matcher.best(symptom)
+
+# ============================================
+# SYMPTOM AUTOCOMPLETE
+# ============================================
+
+SUGGEST_TOP_K = int(os.getenv("SUGGEST_TOP_K", "8"))
+SUGGEST_HISTORY_ROWS = int(os.getenv("SUGGEST_HISTORY_ROWS", "5000"))
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "600"))
+SUGGEST_MAX_QUERY_LENGTH = 64
+
+class SymptomSuggester:
+    """
+    Typeahead index over known symptom strings (sorted-array prefix index)
+    Every word start of every term is a key, so "pain" also finds "joint pain".
+    Terms are ranked once by weight; prefixes of up to SHORT_PREFIX characters keep
+    a precomputed top-k, longer ones bisect the sorted keys and take the k best
+    ranks in that (small) range
     """
-    symptom_lower = symptom.lower()
+    SHORT_PREFIX = 3
     
-    # Direct keyword match
-    for key, remedy in FALLBACK_REMEDIES.items():
-        if key in symptom_lower:
-            return remedy
-        # Check symptom list
-        for sym in remedy['symptoms']:
-            if sym in symptom_lower:
-                return remedy
+    def __init__(self, weighted: Dict[str, Tuple[float, str, str]], k: int = SUGGEST_TOP_K, version=None):
+        # weighted: normalized term -> (weight, text shown, source)
+        self.k = k
+        self.version = version
+        ordered = sorted(weighted.items(), key=lambda item: (-item[1][0], len(item[0]), item[0]))
+        self.suggestions = [{'text': text, 'source': source} for _, (_, text, source) in ordered]
+        
+        keys = []
+        self.short: Dict[str, List[int]] = {}
+        for rank, (term, _) in enumerate(ordered):
+            starts = [0] + [i + 1 for i, char in enumerate(term) if char == ' ']
+            for start in starts:
+                key = term[start:]
+                keys.append((key, rank))
+                for length in range(1, min(self.SHORT_PREFIX, len(key)) + 1):
+                    top = self.short.setdefault(key[:length], [])
+                    if len(top) < k and (not top or top[-1] != rank):
+                        top.append(rank)
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.ranks = [rank for _, rank in keys]
     
-    return None
+    def __len__(self) -> int:
+        return len(self.suggestions)
+    
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[dict]:
+        limit = min(limit or self.k, self.k)
+        if len(prefix) <= self.SHORT_PREFIX:
+            ranks = self.short.get(prefix, [])[:limit]
+        else:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+            ranks = heapq.nsmallest(limit, set(self.ranks[lo:hi]))
+        return [self.suggestions[rank] for rank in ranks]
+
+# Recent query_history, summarized: dataset hits per remedy and matched keyword counts
+symptom_popularity: Dict[str, Counter] = {'remedies': Counter(), 'keywords': Counter()}
+
+def fetch_symptom_popularity() -> Dict[str, Counter]:
+    """Read the most recent SUGGEST_HISTORY_ROWS history rows (network I/O)"""
+    response = supabase.table('query_history')\
+        .select('remedy_id, matched_keywords')\
+        .order('created_at', desc=True)\
+        .limit(SUGGEST_HISTORY_ROWS)\
+        .execute()
+    remedies, keywords = Counter(), Counter()
+    for row in response.data or []:
+        if row.get('remedy_id'):
+            remedies[str(row['remedy_id'])] += 1
+        keywords.update(row.get('matched_keywords') or [])
+    return {'remedies': remedies, 'keywords': keywords}
+
+def build_symptom_suggester(catalog: Dict, popularity: Dict[str, Counter]) -> SymptomSuggester:
+    """
+    Catalog symptoms (English and any symptoms_hi), fallback table terms and the
+    Hindi/Hinglish symptom vocabulary, weighted by how often history hit them
+    """
+    weighted: Dict[str, Tuple[float, str, str]] = {}
+    keyword_hits = popularity['keywords']
+    
+    def add(text: str, source: str, weight: float):
+        term = normalize_phrase(text)
+        if not term:
+            return
+        current = weighted.get(term)
+        if current is None:
+            weight += sum(keyword_hits.get(word, 0) for word in term.split())
+            weighted[term] = (weight, text.strip(), source)
+        else:
+            # Dataset wins over fallback for the label; popularity adds up
+            weighted[term] = (current[0] + weight, current[1], current[2] if current[2] == 'dataset' else source)
+    
+    for remedy in catalog['remedies']:
+        hits = popularity['remedies'].get(str(remedy.get('id')), 0)
+        for symptom in [*(remedy.get('symptoms') or []), *(remedy.get('symptoms_hi') or [])]:
+            add(symptom, 'dataset', 1.0 + hits)
+    
+    for terms in fallback_matcher.terms:
+        for written in terms.values():
+            add(written, 'fallback', 0.5)
+    
+    # Hindi and romanized terms rank with the English symptom they normalize to
+    for hindi, english in HINDI_SYMPTOM_TERMS.items():
+        target = weighted.get(english)
+        add(hindi, target[2] if target else 'fallback', target[0] if target else 0.5)
+    
+    return SymptomSuggester(weighted, version=catalog['version'])
+
+# Fallback-table and Hindi terms only, served until the first catalog is installed
+EMPTY_CATALOG_SUGGESTER = build_symptom_suggester({'remedies': [], 'version': None}, symptom_popularity)
+
+def get_symptom_suggester() -> SymptomSuggester:
+    """
+    The current catalog's suggester. Built with the snapshot (in its worker thread)
+    and re-weighted by refresh_symptom_popularity, never on the request path
+    """
+    return get_remedy_catalog().get('suggester') or EMPTY_CATALOG_SUGGESTER
+
+async def refresh_symptom_popularity():
+    """Re-read history popularity and rebuild the current catalog's suggester with it, off the loop"""
+    global symptom_popularity
+    symptom_popularity = await run_db(fetch_symptom_popularity)
+    catalog = remedy_catalog
+    suggester = await asyncio.to_thread(build_symptom_suggester, catalog, symptom_popularity)
+    # A catalog swapped in meanwhile brought its own suggester
+    if remedy_catalog is catalog:
+        catalog['suggester'] = suggester
+    logger.info(f"🔤 Symptom suggester rebuilt: {len(suggester)} terms, "
+                f"{sum(symptom_popularity['remedies'].values())} dataset hits weighted")
+
+async def refresh_popularity_periodically():
+    """Background task: re-weight suggestions every SUGGEST_REFRESH_SECONDS"""
+    while True:
+        try:
+            await refresh_symptom_popularity()
+        except Exception as e:
+            logger.error(f"Suggestion popularity refresh error: {e}")
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+
+_popularity_refresh_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_popularity_refresh():
+    global _popularity_refresh_task
+    if SUGGEST_REFRESH_SECONDS > 0:
+        _popularity_refresh_task = asyncio.create_task(refresh_popularity_periodically())
+
+@app.on_event("shutdown")
+async def stop_popularity_refresh():
+    if _popularity_refresh_task:
+        _popularity_refresh_task.cancel()
 
 # ============================================
 # AI FALLBACK
 # ============================================
 
-def ai_fallback(symptom: str, language: str = "en") -> dict:
-    """Use Claude AI for unknown symptoms"""
-    
-    if not anthropic_client:
-        return {
-            'name': 'AI Service Unavailable',
-            'herb': 'Consult Ayurvedic practitioner',
-            'herb_scientific': '',
-            'dosage': 'N/A',
-            'yoga': 'General yoga practice',
-            'diet': 'Balanced Ayurvedic diet',
-            'dosha': 'Professional assessment needed',
-            'warning': 'API key not configured. Please consult qualified Ayurvedic practitioner.',
-            'explanation': 'AI service requires API key configuration.',
-            'category': 'general',
-            'source': 'error'
-        }
+AI_MODEL = "claude-sonnet-4-20250514"
+AI_MAX_TOKENS = 1500
+
+# Response line keys -> remedy fields, in the order the prompt asks for them
+AI_FIELDS = {
+    'remedy_name': 'name',
+    'herb': 'herb',
+    'herb_scientific': 'herb_scientific',
+    'dosage': 'dosage',
+    'yoga': 'yoga',
+    'diet': 'diet',
+    'dosha': 'dosha',
+    'warning': 'warning',
+    'explanation': 'explanation',
+    'category': 'category'
+}
+
+def build_ai_prompt(symptom: str, language: str) -> str:
+    lang_instruction = "Respond in Hindi (Devanagari script)" if language == "hi" else "Respond in English"
     
-    try:
-        lang_instruction = "Respond in Hindi (Devanagari script)" if language == "hi" else "Respond in English"
-        
-        prompt = f"""You are an expert Ayurvedic wellness assistant. A user reports: "{symptom}"
+    return f"""You are an expert Ayurvedic wellness assistant. A user reports: "{symptom}"
 
 {lang_instruction}
 
@@ -573,11 +2478,276 @@ CATEGORY: [One of: respiratory, digestive, mental, sleep, musculoskeletal, derma
 
 Keep each field concise (1-2 sentences). Base recommendations on classical Ayurveda."""
 
-        message = anthropic_client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
+def parse_ai_line(line: str) -> Optional[Tuple[str, str]]:
+    """'HERB: Tulsi' -> ('herb', 'Tulsi')"""
+    if ':' not in line:
+        return None
+    key, value = line.split(':', 1)
+    return key.strip().lower().replace(' ', '_'), value.strip()
+
+class AIFieldParser:
+    """
+    Incremental parser for streamed AI text
+    feed() returns the (key, value) pairs of every line completed by the chunk
+    """
+    
+    def __init__(self):
+        self._buffer = ''
+    
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        return [parsed for parsed in map(parse_ai_line, lines) if parsed]
+    
+    def close(self) -> List[Tuple[str, str]]:
+        line, self._buffer = self._buffer, ''
+        parsed = parse_ai_line(line)
+        return [parsed] if parsed else []
+
+def ai_result_from_fields(parsed: Dict[str, str]) -> dict:
+    """Build the remedy dict from parsed response lines, with defaults for missing fields"""
+    return {
+        'name': parsed.get('remedy_name', 'AI-Suggested Ayurvedic Remedy'),
+        'herb': parsed.get('herb', 'Consult Ayurvedic practitioner'),
+        'herb_scientific': parsed.get('herb_scientific', ''),
+        'dosage': parsed.get('dosage', 'As directed by qualified practitioner'),
+        'yoga': parsed.get('yoga', 'General yoga practice'),
+        'diet': parsed.get('diet', 'Balanced Sattvic diet'),
+        'dosha': parsed.get('dosha', 'Assessment needed'),
+        'warning': parsed.get('warning', 'Always consult qualified Ayurvedic practitioner before starting any remedy'),
+        'explanation': parsed.get('explanation', 'AI-generated recommendation based on Ayurvedic principles'),
+        'category': parsed.get('category', 'general'),
+        'source': 'ai'
+    }
+
+def ai_unavailable_result(
+    warning: str = 'API key not configured. Please consult qualified Ayurvedic practitioner.',
+    explanation: str = 'AI service requires API key configuration.'
+) -> dict:
+    """Response used when the AI service cannot be called"""
+    return {
+        'name': 'AI Service Unavailable',
+        'herb': 'Consult Ayurvedic practitioner',
+        'herb_scientific': '',
+        'dosage': 'N/A',
+        'yoga': 'General yoga practice',
+        'diet': 'Balanced Ayurvedic diet',
+        'dosha': 'Professional assessment needed',
+        'warning': warning,
+        'explanation': explanation,
+        'category': 'general',
+        'source': 'error'
+    }
+
+def ai_circuit_open_result() -> dict:
+    return ai_unavailable_result(
+        warning='AI service is temporarily unavailable. Please consult qualified Ayurvedic practitioner.',
+        explanation='AI service is recovering from upstream errors. Please try again shortly.'
+    )
+
+# ============================================
+# AI RESILIENCE: DEADLINE, CONCURRENCY, RETRIES, CIRCUIT BREAKER
+# ============================================
+
+AI_DEADLINE_SECONDS = float(os.getenv("AI_DEADLINE_SECONDS", "30"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "4"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+ai_call_stats = {'calls': 0, 'retries': 0, 'failures': 0, 'deadline_exceeded': 0}
+
+class CircuitBreaker:
+    """
+    closed -> open when the failure rate over the last `window` calls reaches
+    `failure_rate` (after at least `min_calls`); open -> half_open after
+    `reset_seconds`; one trial call in half_open closes or re-opens it
+    """
+    
+    def __init__(self, name: str, failure_rate: float, window: int, min_calls: int, reset_seconds: float):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.transitions: Counter = Counter()
+        self.short_circuits = 0
+    
+    def _transition(self, new_state: str):
+        self.transitions[f"{self.state}->{new_state}"] += 1
+        logger.warning(f"⚡ Circuit '{self.name}': {self.state} -> {new_state}")
+        self.state = new_state
+        if new_state == 'open':
+            self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._trial_in_flight = False
+    
+    def allow_request(self) -> bool:
+        if self.state == 'open':
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                self.short_circuits += 1
+                return False
+            self._transition('half_open')
+        
+        if self.state == 'half_open':
+            if self._trial_in_flight:
+                self.short_circuits += 1
+                return False
+            self._trial_in_flight = True
+        
+        return True
+    
+    def record_success(self):
+        if self.state == 'half_open':
+            self._transition('closed')
+            return
+        self._outcomes.append(True)
+    
+    def record_failure(self):
+        if self.state == 'half_open':
+            self._transition('open')
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._transition('open')
+    
+    def release_trial(self):
+        """Give the half-open trial slot back without a verdict (the caller went away mid-call)"""
+        if self.state == 'half_open':
+            self._trial_in_flight = False
+    
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'recent_failure_rate': round(self._outcomes.count(False) / len(self._outcomes), 3) if self._outcomes else 0.0,
+            'short_circuits': self.short_circuits,
+            'transitions': dict(self.transitions)
+        }
+
+ai_circuit = CircuitBreaker(
+    'anthropic',
+    failure_rate=float(os.getenv("AI_BREAKER_FAILURE_RATE", "0.5")),
+    window=int(os.getenv("AI_BREAKER_WINDOW", "20")),
+    min_calls=int(os.getenv("AI_BREAKER_MIN_CALLS", "5")),
+    reset_seconds=float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+)
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.RateLimitError, anthropic.InternalServerError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+async def iterate_until(chunks, deadline: float):
+    """
+    Re-yield an async iterator, raising TimeoutError once the loop-time deadline passes
+    Only the wait for each chunk is bounded, so it is safe inside a streaming generator
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            ai_call_stats['deadline_exceeded'] += 1
+            raise asyncio.TimeoutError()
+        try:
+            chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            ai_call_stats['deadline_exceeded'] += 1
+            raise
+        yield chunk
+
+async def pump_ai_stream(prompt: str, deadline: float, chunks: asyncio.Queue):
+    """
+    Drain one upstream stream into chunks, ending with None or the exception that stopped it
+    The ai_semaphore slot is held only until the upstream finishes, never while a slow
+    client reads; the slot wait, the stream open and every chunk share the deadline
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        try:
+            await asyncio.wait_for(ai_semaphore.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            ai_call_stats['deadline_exceeded'] += 1
+            raise
+        try:
+            with external_call(anthropic_call_seconds, 'anthropic', 'messages.stream'):
+                async with AsyncExitStack() as stack:
+                    manager = anthropic_client.messages.stream(
+                        model=AI_MODEL,
+                        max_tokens=AI_MAX_TOKENS,
+                        messages=[{"role": "user", "content": prompt}]
+                    )
+                    try:
+                        stream = await asyncio.wait_for(stack.enter_async_context(manager), deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        ai_call_stats['deadline_exceeded'] += 1
+                        raise
+                    async for text in iterate_until(stream.text_stream, deadline):
+                        chunks.put_nowait(text)
+        finally:
+            ai_semaphore.release()
+    except Exception as e:
+        chunks.put_nowait(e)
+    else:
+        chunks.put_nowait(None)
+
+async def call_anthropic(make_call):
+    """
+    Run an Anthropic call under the concurrency cap with jittered retries,
+    all within AI_DEADLINE_SECONDS (queueing for the semaphore included)
+    """
+    async def attempt_with_retries():
+        async with ai_semaphore:
+            for attempt in range(AI_MAX_RETRIES + 1):
+                try:
+                    with external_call(anthropic_call_seconds, 'anthropic', 'messages.create'):
+                        return await make_call()
+                except Exception as e:
+                    if attempt == AI_MAX_RETRIES or not is_retryable(e):
+                        raise
+                    # Full jitter: sleep a random amount up to the capped exponential backoff
+                    delay = random.uniform(0, min(AI_RETRY_MAX_DELAY, AI_RETRY_BASE_DELAY * 2 ** attempt))
+                    ai_call_stats['retries'] += 1
+                    logger.warning(f"AI call failed ({e}), retry {attempt + 1} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+    
+    ai_call_stats['calls'] += 1
+    try:
+        return await asyncio.wait_for(attempt_with_retries(), AI_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        ai_call_stats['deadline_exceeded'] += 1
+        raise
+
+async def ai_fallback(symptom: str, language: str = "en") -> dict:
+    """Use Claude AI for unknown symptoms"""
+    
+    if not anthropic_client:
+        return ai_unavailable_result()
+    
+    if not ai_circuit.allow_request():
+        logger.warning("⚡ AI circuit open, skipping upstream call")
+        return ai_circuit_open_result()
+    
+    # allow_request() only lets a half-open breaker through for its single trial call
+    holds_trial = ai_circuit.state == 'half_open'
+    settled = False
+    try:
+        message = await call_anthropic(lambda: anthropic_client.messages.create(
+            model=AI_MODEL,
+            max_tokens=AI_MAX_TOKENS,
+            messages=[{"role": "user", "content": build_ai_prompt(symptom, language)}]
+        ))
+        ai_circuit.record_success()
+        settled = True
         
         response_text = message.content[0].text
         logger.info(f"AI response received: {len(response_text)} chars")
@@ -585,46 +2755,426 @@ Keep each field concise (1-2 sentences). Base recommendations on classical Ayurv
         # Parse AI response
         parsed = {}
         for line in response_text.strip().split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                key_clean = key.strip().lower().replace(' ', '_')
-                parsed[key_clean] = value.strip()
+            field = parse_ai_line(line)
+            if field:
+                parsed[field[0]] = field[1]
         
-        return {
-            'name': parsed.get('remedy_name', 'AI-Suggested Ayurvedic Remedy'),
-            'herb': parsed.get('herb', 'Consult Ayurvedic practitioner'),
-            'herb_scientific': parsed.get('herb_scientific', ''),
-            'dosage': parsed.get('dosage', 'As directed by qualified practitioner'),
-            'yoga': parsed.get('yoga', 'General yoga practice'),
-            'diet': parsed.get('diet', 'Balanced Sattvic diet'),
-            'dosha': parsed.get('dosha', 'Assessment needed'),
-            'warning': parsed.get('warning', 'Always consult qualified Ayurvedic practitioner before starting any remedy'),
-            'explanation': parsed.get('explanation', 'AI-generated recommendation based on Ayurvedic principles'),
-            'category': parsed.get('category', 'general'),
-            'source': 'ai'
-        }
+        return ai_result_from_fields(parsed)
         
+    except Exception as e:
+        ai_call_stats['failures'] += 1
+        if not settled:
+            ai_circuit.record_failure()
+            settled = True
+        logger.error(f"AI error: {e!r}")
+        return ai_error_result()
+    finally:
+        # Cancelled mid-call (client gone, deadline): no verdict, but the trial slot must be given back
+        if holds_trial and not settled:
+            ai_circuit.release_trial()
+
+def ai_error_result() -> dict:
+    """Response used when the AI call fails"""
+    return {
+        'name': 'AI Error',
+        'herb': 'Service temporarily unavailable',
+        'herb_scientific': '',
+        'dosage': 'N/A',
+        'yoga': 'N/A',
+        'diet': 'N/A',
+        'dosha': 'N/A',
+        'warning': f'AI service error. Please consult Ayurvedic practitioner.',
+        'explanation': 'Unable to generate recommendation at this time.',
+        'category': 'error',
+        'source': 'error'
+    }
+
+# ============================================
+# AI RESPONSE CACHE
+# ============================================
+
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "2000"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+AI_CACHE_SQLITE_PATH = os.getenv("AI_CACHE_SQLITE_PATH")
+AI_CACHE_PRUNE_SECONDS = float(os.getenv("AI_CACHE_PRUNE_SECONDS", "3600"))
+
+class AIResponseCache:
+    """
+    Cache of parsed ai_fallback results keyed by normalized symptom + language
+    In-memory LRU/TTL tier, backed by an optional SQLite file that survives restarts
+    SQLite reads and writes run on a dedicated single-thread executor, never on the event loop;
+    rows older than the TTL are pruned on write, at most every AI_CACHE_PRUNE_SECONDS
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, sqlite_path: Optional[str] = None):
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize, ttl)
+        self.stats = {'persistent_hits': 0, 'stores': 0, 'pruned': 0}
+        self._db = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        
+        if sqlite_path:
+            try:
+                self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS ai_cache ('
+                    'key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)'
+                )
+                self._db.execute('CREATE INDEX IF NOT EXISTS idx_ai_cache_created_at ON ai_cache(created_at)')
+                self._db.commit()
+                self._prune()
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-cache")
+                logger.info(f"💾 AI cache persistent tier: {sqlite_path}")
+            except sqlite3.Error as e:
+                logger.error(f"AI cache SQLite init failed: {e}")
+                self._db = None
+    
+    @staticmethod
+    def make_key(normalized: Dict, language: str) -> Optional[str]:
+        terms = ' '.join(normalized['keywords']) or normalized['normalized']
+        return f"{language}:{terms}" if terms else None
+    
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+    
+    async def get(self, key: str) -> Optional[dict]:
+        value = self.memory.get(key)
+        if value is not None:
+            return dict(value)
+        
+        if self._db is None:
+            return None
+        
+        value = await self._run(self._read, key)
+        if value is None:
+            return None
+        
+        self.memory.set(key, value)
+        self.stats['persistent_hits'] += 1
+        return dict(value)
+    
+    async def set(self, key: str, value: dict):
+        """Only successfully parsed AI answers are cached"""
+        if value.get('source') != 'ai':
+            return
+        
+        self.memory.set(key, dict(value))
+        self.stats['stores'] += 1
+        
+        if self._db is not None:
+            await self._run(self._write, key, json.dumps(value, ensure_ascii=False))
+    
+    def _read(self, key: str) -> Optional[dict]:
+        """SQLite lookup (blocking, on the cache executor)"""
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT payload, created_at FROM ai_cache WHERE key = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"AI cache read error: {e}")
+            return None
+        
+        if not row or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return json.loads(row[0])
+    
+    def _write(self, key: str, payload: str):
+        """SQLite upsert plus the periodic TTL prune (blocking, on the cache executor)"""
+        try:
+            with self._lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO ai_cache (key, payload, created_at) VALUES (?, ?, ?)',
+                    (key, payload, time.time())
+                )
+                self._db.commit()
+            if time.time() - self._pruned_at >= AI_CACHE_PRUNE_SECONDS:
+                self._prune()
+        except sqlite3.Error as e:
+            logger.error(f"AI cache write error: {e}")
+    
+    def _prune(self):
+        """Delete rows past the TTL (blocking)"""
+        self._pruned_at = time.time()
+        if not self.ttl:
+            return
+        with self._lock:
+            deleted = self._db.execute(
+                'DELETE FROM ai_cache WHERE created_at < ?', (self._pruned_at - self.ttl,)
+            ).rowcount
+            self._db.commit()
+        if deleted:
+            self.stats['pruned'] += deleted
+            logger.info(f"🧹 Pruned {deleted} expired AI cache rows")
+    
+    def snapshot_stats(self) -> Dict:
+        return {**self.memory.snapshot_stats(), **self.stats, 'persistent': self._db is not None}
+
+ai_cache = AIResponseCache(AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS, AI_CACHE_SQLITE_PATH)
+
+AI_SINGLEFLIGHT_TIMEOUT = float(os.getenv("AI_SINGLEFLIGHT_TIMEOUT", "60"))
+
+class LeaderAbandoned(Exception):
+    """The streaming request leading a shared call went away before it finished"""
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight call
+    Every waiter receives the leader's result or exception
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'leaders': 0, 'followers': 0, 'timeouts': 0}
+    
+    def in_flight(self) -> int:
+        return len(self._inflight)
+    
+    def is_running(self, key: str) -> bool:
+        return key in self._inflight
+    
+    def claim(self, key: str) -> asyncio.Future:
+        """
+        Lead `key` from the caller's own task instead of a detached fn (the streaming path)
+        Callers check is_running() first and must settle() the returned future
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats['leaders'] += 1
+        return future
+    
+    def settle(self, key: str, future: asyncio.Future, result=None):
+        """Hand a claimed call's result to its waiters; None means the leader gave up (LeaderAbandoned)"""
+        if not future.done():
+            if result is None:
+                future.set_exception(LeaderAbandoned(key))
+                future.exception()
+            else:
+                future.set_result(result)
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+    
+    async def do(self, key: str, fn, timeout: Optional[float] = None):
+        future = self._inflight.get(key)
+        
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self.stats['leaders'] += 1
+            # Run detached so one waiter timing out never cancels the shared call
+            asyncio.create_task(self._lead(key, future, fn))
+        else:
+            self.stats['followers'] += 1
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+    
+    async def _lead(self, key: str, future: asyncio.Future, fn):
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved in case every waiter already timed out
+        else:
+            future.set_result(result)
+        finally:
+            self._inflight.pop(key, None)
+
+ai_singleflight = SingleFlight()
+
+async def get_ai_remedy(symptom: str, language: str, normalized: Dict) -> dict:
+    """
+    ai_fallback behind the response cache
+    Concurrent misses for the same key share a single upstream call
+    """
+    key = ai_cache.make_key(normalized, language)
+    
+    if key:
+        cached = await ai_cache.get(key)
+        if cached:
+            logger.info(f"💾 AI cache hit for '{key}'")
+            return cached
+    
+    async def call_ai() -> dict:
+        result = await ai_fallback(symptom, language)
+        if key:
+            await ai_cache.set(key, result)
+        return result
+    
+    try:
+        if not key:
+            return await call_ai()
+        try:
+            return dict(await ai_singleflight.do(key, call_ai, AI_SINGLEFLIGHT_TIMEOUT))
+        except LeaderAbandoned:
+            # We joined a stream whose client disconnected mid-answer: ask again, leading if nobody else is
+            logger.info(f"Streaming leader for '{key}' went away, retrying")
+            return dict(await ai_singleflight.do(key, call_ai, AI_SINGLEFLIGHT_TIMEOUT))
+    except asyncio.TimeoutError:
+        logger.error(f"AI call for '{key}' timed out after {AI_SINGLEFLIGHT_TIMEOUT}s")
+        return ai_error_result()
     except Exception as e:
         logger.error(f"AI error: {e}")
-        return {
-            'name': 'AI Error',
-            'herb': 'Service temporarily unavailable',
-            'herb_scientific': '',
-            'dosage': 'N/A',
-            'yoga': 'N/A',
-            'diet': 'N/A',
-            'dosha': 'N/A',
-            'warning': f'AI service error. Please consult Ayurvedic practitioner.',
-            'explanation': 'Unable to generate recommendation at this time.',
-            'category': 'error',
-            'source': 'error'
-        }
+        return ai_error_result()
 
 # ============================================
 # ENHANCED HISTORY LOGGING
 # ============================================
 
-def save_query_history(
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "50"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1.0"))
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "5000"))
+HISTORY_ENQUEUE_TIMEOUT = float(os.getenv("HISTORY_ENQUEUE_TIMEOUT", "0.05"))
+HISTORY_SHUTDOWN_TIMEOUT = float(os.getenv("HISTORY_SHUTDOWN_TIMEOUT", "10"))
+
+def insert_history_rows(rows: List[dict]):
+    """Multi-row insert into query_history (blocking)"""
+    supabase.table('query_history').insert(rows).execute()
+
+def is_uuid(value: Optional[str]) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+class HistoryWriter:
+    """
+    Background query_history pipeline
+    Handlers enqueue rows; one worker writes them as multi-row inserts,
+    flushing when batch_size rows are waiting or flush_seconds have passed
+    Rows submitted together share an insert unless the database rejects it:
+    a batch is then bisected so one bad row never drops other users' history
+    """
+    
+    def __init__(self, batch_size: int, flush_seconds: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+    
+    async def submit(self, row: dict):
+        """Queue a row without waiting for the database"""
+        await self.submit_many([row])
+    
+    async def submit_many(self, rows: List[dict]):
+        """
+        Queue rows as one unit: they are written together in a single insert
+        When the queue is full, wait up to HISTORY_ENQUEUE_TIMEOUT (backpressure), then drop
+        """
+        if not rows:
+            return
+        
+        if not self.running:
+            # Not started (or already stopped): write inline
+            await self._write(rows)
+            return
+        
+        try:
+            self.queue.put_nowait(rows)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(rows), HISTORY_ENQUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats['dropped'] += len(rows)
+                logger.warning(f"History queue full, dropping {len(rows)} rows")
+                return
+        self.stats['queued'] += len(rows)
+    
+    async def _write(self, rows: List[dict]):
+        """
+        Insert rows in one statement. A PostgREST rejection (constraint, type or FK error)
+        fails the whole statement, so the batch is split in half and retried until only
+        the offending rows are left; transport errors fail the batch as it is, since
+        splitting would only multiply calls to an unreachable database
+        """
+        try:
+            await run_db(insert_history_rows, rows)
+        except APIError as e:
+            if len(rows) > 1:
+                middle = len(rows) // 2
+                await self._write(rows[:middle])
+                await self._write(rows[middle:])
+                return
+            self.stats['failed'] += 1
+            logger.error(f"History row rejected for user {rows[0].get('user_id')}: {e}")
+            return
+        except Exception as e:
+            self.stats['failed'] += len(rows)
+            logger.error(f"History save error: {e}")
+            return
+        
+        self.stats['written'] += len(rows)
+        self.stats['batches'] += 1
+        logger.info(f"✅ {len(rows)} queries saved to history")
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            rows = await self.queue.get()
+            if rows is None:
+                return
+            
+            batch = list(rows)
+            deadline = loop.time() + self.flush_seconds
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    rows = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if rows is None:
+                    stop = True
+                    break
+                batch.extend(rows)
+            
+            await self._write(batch)
+            if stop:
+                return
+    
+    async def stop(self):
+        """Flush everything queued so far, then stop the worker"""
+        if not self.running:
+            return
+        
+        # The sentinel queues behind every row submitted before shutdown
+        await self.queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, HISTORY_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error(f"History writer did not drain in time, {self.queue.qsize()} rows lost")
+
+history_writer = HistoryWriter(HISTORY_BATCH_SIZE, HISTORY_FLUSH_SECONDS, HISTORY_QUEUE_SIZE)
+
+@app.on_event("startup")
+async def start_history_writer():
+    history_writer.start()
+
+@app.on_event("shutdown")
+async def stop_history_writer():
+    await history_writer.stop()
+
+async def save_query_history(
     user_id: str, 
     symptom: str, 
     language: str,
@@ -635,26 +3185,296 @@ def save_query_history(
     dosha_used: Optional[str] = None,
     ranking_score: Optional[float] = None,
     ai_refinement_used: bool = False,
-    response_time_ms: Optional[float] = None
+    response_time_ms: Optional[float] = None,
+    collect: Optional[List[dict]] = None
 ):
-    """Save comprehensive query data to history"""
-    try:
-        supabase.table('query_history').insert({
-            'user_id': user_id,
-            'symptom': symptom,
-            'language': language,
-            'remedy_id': remedy_id,
-            'remedy_name': remedy_name,
-            'source': source,
-            'matched_keywords': matched_keywords,
-            'dosha_used': dosha_used,
-            'ranking_score': ranking_score,
-            'ai_refinement_used': ai_refinement_used,
-            'response_time_ms': response_time_ms
-        }).execute()
-        logger.info(f"✅ Enhanced query saved to history for user {user_id}")
-    except Exception as e:
-        logger.error(f"History save error: {e}")
+    """
+    Queue comprehensive query data for the background history writer
+    With collect, the row is appended there instead so the caller can submit a batch
+    """
+    # query_history.user_id is a uuid column; anything else would only be rejected by the insert
+    if not is_uuid(user_id):
+        logger.warning(f"Not saving history for malformed user id {str(user_id)[:64]!r}")
+        return
+    
+    row = {
+        'user_id': user_id,
+        'symptom': symptom,
+        'language': language,
+        'remedy_id': remedy_id,
+        'remedy_name': remedy_name,
+        'source': source,
+        'matched_keywords': matched_keywords,
+        'dosha_used': dosha_used,
+        'ranking_score': ranking_score,
+        'ai_refinement_used': ai_refinement_used,
+        'response_time_ms': response_time_ms
+    }
+    
+    if collect is not None:
+        collect.append(row)
+    else:
+        await history_writer.submit(row)
+
+# ============================================
+# QUERY PIPELINE
+# ============================================
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_AI_CONCURRENCY = int(os.getenv("BATCH_AI_CONCURRENCY", "4"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "0"))  # 0 = until the catalog changes
+
+# Final dataset answers. The catalog version is part of the key, and the cache is
+# cleared whenever a new catalog is installed.
+response_cache = LRUCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS or None)
+
+def response_cache_key(keywords: List[str], language: str, dosha_profile: Optional[Dict]) -> Optional[tuple]:
+    """
+    Ranked dataset answers depend only on these inputs
+    Fallback answers are not cached: that table matches the raw symptom text, not the keywords
+    """
+    if not keywords:
+        return None
+    dosha = dosha_profile['primary'].lower() if dosha_profile else None
+    return (tuple(keywords), language, dosha, get_remedy_catalog()['version'])
+
+def encode_json(data) -> bytes:
+    """Compact UTF-8 JSON, the same bytes FastAPI's JSONResponse would send"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+def pipeline_json_response(response) -> Response:
+    """
+    Encode a pipeline answer without FastAPI's jsonable_encoder pass
+    Dataset answers splice their per-request fields onto the pre-encoded catalog projection
+    """
+    prefix = getattr(response, '_body_prefix', None)
+    if prefix:
+        body = prefix + encode_json({
+            'match_score': response.match_score,
+            'matched_symptoms': response.matched_symptoms,
+            'dosha_adjusted': response.dosha_adjusted
+        })[1:]
+    else:
+        body = encode_json(response.model_dump())
+    return Response(content=body, media_type="application/json")
+
+def validate_query(query: QueryRequest):
+    if not query.symptom or len(query.symptom.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Please provide a valid symptom description (min 2 characters)")
+
+async def answer_from_dataset(
+    query: QueryRequest,
+    user_id: Optional[str],
+    normalized: Dict,
+    start_time: float,
+    ranked_remedies: Optional[List[dict]] = None,
+    dosha_profile=_MISSING,
+    history: Optional[List[dict]] = None,
+    emergency=_MISSING
+):
+    """
+    Layers 1-4 and 6 of the pipeline
+    Returns an EmergencyResponse or RemedyResponse, or None when the query needs the AI layer
+    Batch callers pass precomputed emergency, ranked_remedies and dosha_profile, and a history list to collect rows
+    """
+    keywords = normalized['keywords']
+    
+    # LAYER 1: Emergency Detection (on the text as typed, before any typo correction)
+    if emergency is _MISSING:
+        with layer_span('emergency'):
+            emergency = query_emergency(normalized)
+    if emergency:
+        logger.warning(f"🚨 Emergency detected, returning immediate response")
+        return EmergencyResponse(**emergency)
+    
+    # The dosha profile is resolved up front: it is part of the response cache key
+    if dosha_profile is _MISSING:
+        with layer_span('dosha'):
+            dosha_profile = await get_cached_user_dosha(user_id) if user_id else None
+    
+    # Whole dataset answers are cached per (keywords, language, dosha, catalog version)
+    cache_key = None
+    if ranked_remedies is None:
+        cache_key = response_cache_key(keywords, query.language, dosha_profile)
+        cached = response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            logger.info(f"💾 Response cache hit: {cached.remedy_name}")
+            if user_id:
+                with layer_span('history'):
+                    await save_query_history(
+                        user_id=user_id,
+                        symptom=query.symptom,
+                        language=query.language,
+                        remedy_id=cached.remedy_id,
+                        remedy_name=cached.remedy_name,
+                        source='dataset',
+                        matched_keywords=keywords,
+                        dosha_used=dosha_profile['primary'] if dosha_profile else None,
+                        ranking_score=cached.match_score,
+                        ai_refinement_used=False,
+                        response_time_ms=(time.time() - start_time) * 1000,
+                        collect=history
+                    )
+            record_fuzzy_outcome(normalized, query.symptom, answered=True)
+            return cached
+    
+    # LAYER 2: Ranked Symptom Matching
+    if ranked_remedies is None:
+        with layer_span('ranking'):
+            ranked_remedies = search_remedies_ranked(keywords, query.language)
+    
+    # If no database matches, try fallback remedies
+    if not ranked_remedies:
+        logger.info("No database matches, trying fallback remedies")
+        with layer_span('fallback'):
+            # Corrected text when keywords were respelled, so the table sees "headache" too
+            fallback_remedy = get_fallback_remedy(
+                normalized['normalized'] if normalized.get('corrections') else query.symptom
+            )
+        
+        if fallback_remedy:
+            logger.info(f"Found fallback remedy: {fallback_remedy['name']}")
+            
+            # Calculate response time
+            response_time_ms = (time.time() - start_time) * 1000
+            
+            # Save to history if user is authenticated
+            if user_id:
+                with layer_span('history'):
+                    await save_query_history(
+                        user_id=user_id,
+                        symptom=query.symptom,
+                        language=query.language,
+                        remedy_id=None,
+                        remedy_name=fallback_remedy['name'],
+                        source='fallback',
+                        matched_keywords=keywords,
+                        dosha_used=None,
+                        ranking_score=fallback_remedy['match_score'],
+                        ai_refinement_used=False,
+                        response_time_ms=response_time_ms,
+                        collect=history
+                    )
+            
+            record_fuzzy_outcome(normalized, query.symptom, answered=True)
+            return RemedyResponse(
+                success=True,
+                remedy_id=None,
+                remedy_name=fallback_remedy['name'],
+                herb=fallback_remedy['herb'],
+                herb_scientific=fallback_remedy.get('herb_scientific'),
+                dosage=fallback_remedy['dosage'],
+                yoga=fallback_remedy['yoga'],
+                diet=fallback_remedy['diet'],
+                dosha=fallback_remedy['dosha'],
+                warning=fallback_remedy['warning'],
+                explanation=fallback_remedy['explanation'],
+                source='dataset',
+                category=fallback_remedy.get('category'),
+                match_score=fallback_remedy['match_score'],
+                matched_symptoms=fallback_remedy['matched_symptoms'][:3]
+            )
+        
+        record_fuzzy_outcome(normalized, query.symptom, answered=False)
+        return None
+    
+    # LAYER 3: Dosha-Aware Adjustment (one cached profile lookup per request)
+    if user_id and dosha_profile:
+        with layer_span('dosha'):
+            ranked_remedies = adjust_by_dosha(user_id, ranked_remedies, keywords, dosha_profile)
+    
+    # Get top remedy
+    top_remedy = ranked_remedies[0]
+    
+    # Calculate response time
+    response_time_ms = (time.time() - start_time) * 1000
+    
+    # LAYER 6: Enhanced Logging
+    if user_id:
+        with layer_span('history'):
+            await save_query_history(
+                user_id=user_id,
+                symptom=query.symptom,
+                language=query.language,
+                remedy_id=top_remedy['id'],
+                remedy_name=top_remedy['name'],
+                source='dataset',
+                matched_keywords=keywords,
+                dosha_used=dosha_profile['primary'] if dosha_profile else None,
+                ranking_score=top_remedy['match_score'],
+                ai_refinement_used=False,
+                response_time_ms=response_time_ms,
+                collect=history
+            )
+    
+    logger.info(f"✅ Returning remedy: {top_remedy['name']} (score: {top_remedy['match_score']})")
+    
+    # Rows with a body_prefix were validated by build_remedy_projections; the rest are validated here
+    body_prefix = top_remedy.get('body_prefix')
+    build = RemedyResponse.model_construct if body_prefix else RemedyResponse
+    response = build(
+        **remedy_response_fields(top_remedy),
+        match_score=top_remedy['match_score'],
+        matched_symptoms=top_remedy['matched_symptoms'],
+        dosha_adjusted=top_remedy.get('dosha_adjusted', False)
+    )
+    response._body_prefix = body_prefix
+    if cache_key:
+        response_cache.set(cache_key, response)
+    
+    record_fuzzy_outcome(normalized, query.symptom, answered=True)
+    return response
+
+async def finish_ai_answer(
+    query: QueryRequest,
+    user_id: Optional[str],
+    keywords: List[str],
+    ai_result: dict,
+    start_time: float,
+    history: Optional[List[dict]] = None
+) -> RemedyResponse:
+    """Layer 6 for AI answers: log to history and build the response"""
+    # Calculate response time
+    response_time_ms = (time.time() - start_time) * 1000
+    
+    # Save to history if user is authenticated
+    if user_id and ai_result['source'] != 'error':
+        with layer_span('history'):
+            await save_query_history(
+                user_id=user_id,
+                symptom=query.symptom,
+                language=query.language,
+                remedy_id=None,
+                remedy_name=ai_result['name'],
+                source=ai_result['source'],
+                matched_keywords=keywords,
+                dosha_used=None,
+                ranking_score=None,
+                ai_refinement_used=True,
+                response_time_ms=response_time_ms,
+                collect=history
+            )
+    
+    return RemedyResponse(
+        success=ai_result['source'] != 'error',
+        remedy_id=None,
+        remedy_name=ai_result['name'],
+        herb=ai_result['herb'],
+        herb_scientific=ai_result.get('herb_scientific'),
+        dosage=ai_result['dosage'],
+        yoga=ai_result['yoga'],
+        diet=ai_result['diet'],
+        dosha=ai_result['dosha'],
+        warning=ai_result['warning'],
+        explanation=ai_result['explanation'],
+        source=ai_result['source'],
+        category=ai_result.get('category'),
+        match_score=None,
+        matched_symptoms=None
+    )
 
 # ============================================
 # API ENDPOINTS
@@ -685,7 +3505,7 @@ async def root():
 @app.post("/api/dosha/assess", response_model=DoshaAssessmentResponse)
 async def assess_dosha(
     quiz_data: DoshaQuizRequest,
-    user_id: str = Header(..., alias="X-User-ID")
+    user_id: str = Depends(require_user)
 ):
     """
     Calculate user's dosha from quiz answers
@@ -771,13 +3591,16 @@ async def assess_dosha(
         
         # Save to user profile
         try:
-            supabase.table('profiles').update({
-                'dosha_primary': primary_dosha,
-                'dosha_secondary': secondary_dosha,
-                'dosha_assessment_date': 'now()',
-                'dosha_quiz_answers': [answer.dict() for answer in quiz_data.answers]
-            }).eq('id', user_id).execute()
+            await run_db(
+                supabase.table('profiles').update({
+                    'dosha_primary': primary_dosha,
+                    'dosha_secondary': secondary_dosha,
+                    'dosha_assessment_date': 'now()',
+                    'dosha_quiz_answers': [answer.dict() for answer in quiz_data.answers]
+                }).eq('id', user_id).execute
+            )
             
+            profile_cache.invalidate(user_id)
             logger.info(f"✅ Dosha assessment saved: {primary_dosha} for user {user_id}")
         except Exception as e:
             logger.error(f"Failed to save dosha to profile: {e}")
@@ -797,9 +3620,9 @@ async def assess_dosha(
         raise HTTPException(status_code=500, detail="Failed to assess dosha")
 
 @app.get("/api/dosha/profile")
-async def get_dosha_profile(user_id: str = Header(..., alias="X-User-ID")):
+async def get_dosha_profile(user_id: str = Depends(require_user)):
     """Get user's current dosha profile"""
-    dosha_profile = get_user_dosha(user_id)
+    dosha_profile = await get_cached_user_dosha(user_id)
     
     if not dosha_profile:
         raise HTTPException(status_code=404, detail="No dosha assessment found. Please take the quiz first.")
@@ -807,7 +3630,7 @@ async def get_dosha_profile(user_id: str = Header(..., alias="X-User-ID")):
     return dosha_profile
 
 @app.post("/api/ask")
-async def ask_remedy(query: QueryRequest, user_id: str = Header(None, alias="X-User-ID")):
+async def ask_remedy(query: QueryRequest, user_id: Optional[str] = Depends(current_user)):
     """
     Main query endpoint with 6-layer intelligence pipeline
     1. Input Normalization
@@ -820,201 +3643,521 @@ async def ask_remedy(query: QueryRequest, user_id: str = Header(None, alias="X-U
     start_time = time.time()
     
     # Validate input
-    if not query.symptom or len(query.symptom.strip()) < 2:
-        raise HTTPException(status_code=400, detail="Please provide a valid symptom description (min 2 characters)")
+    validate_query(query)
     
     logger.info(f"🔍 Query received: '{query.symptom}' (language: {query.language})")
     
     # LAYER 0: Input Normalization
-    normalized = normalize_input(query.symptom)
-    keywords = normalized['keywords']
+    with layer_span('normalize'):
+        normalized = normalize_input(query.symptom, query.language)
+    with layer_span('fuzzy'):
+        normalized = correct_keywords(normalized)
     
-    # LAYER 1: Emergency Detection
-    emergency = check_emergency(normalized['normalized'])
-    if emergency:
-        logger.warning(f"🚨 Emergency detected, returning immediate response")
-        return EmergencyResponse(**emergency)
+    # LAYERS 1-4: Emergency, ranked matching, fallback table, dosha adjustment
+    await wait_for_remedy_catalog()
+    response = await answer_from_dataset(query, user_id, normalized, start_time)
+    if response is not None:
+        return pipeline_json_response(response)
     
-    # LAYER 2: Ranked Symptom Matching
-    ranked_remedies = search_remedies_ranked(keywords, query.language)
+    # Without a catalog the dataset may well have the answer: never pay for an AI call instead
+    require_remedy_catalog()
     
-    # If no database matches, try fallback remedies
-    if not ranked_remedies:
-        logger.info("No database matches, trying fallback remedies")
-        fallback_remedy = get_fallback_remedy(query.symptom)
-        
-        if fallback_remedy:
-            logger.info(f"Found fallback remedy: {fallback_remedy['name']}")
-            
-            # Calculate response time
-            response_time_ms = (time.time() - start_time) * 1000
+    # LAYER 5: AI Refinement
+    logger.info("No fallback remedy, using AI")
+    with layer_span('ai'):
+        ai_result = await get_ai_remedy(query.symptom, query.language, normalized)
+    
+    return pipeline_json_response(
+        await finish_ai_answer(query, user_id, normalized['keywords'], ai_result, start_time)
+    )
+
+def ndjson_event(event: str, **payload) -> str:
+    return json.dumps({'event': event, **payload}, ensure_ascii=False) + '\n'
+
+async def stream_ai_answer(query: QueryRequest, user_id: Optional[str], normalized: Dict, start_time: float):
+    """
+    Stream the AI answer as NDJSON: one 'field' event per completed response line,
+    then a final 'remedy' event carrying the full RemedyResponse
+    Shares ai_singleflight with /api/ask: a stream that finds the same question already
+    in flight waits for that answer and sends only the final event
+    """
+    key = ai_cache.make_key(normalized, query.language)
+    ai_result = await ai_cache.get(key) if key else None
+    
+    if ai_result:
+        logger.info(f"💾 AI cache hit for '{key}'")
+    elif not anthropic_client:
+        ai_result = ai_unavailable_result()
+    elif key and ai_singleflight.is_running(key):
+        logger.info(f"🔗 Joining in-flight AI call for '{key}'")
+        ai_result = await get_ai_remedy(query.symptom, query.language, normalized)
+    elif not ai_circuit.allow_request():
+        logger.warning("⚡ AI circuit open, skipping upstream stream")
+        ai_result = ai_circuit_open_result()
+    else:
+        parsed = {}
+        parser = AIFieldParser()
+        ai_call_stats['calls'] += 1
+        # allow_request() only lets a half-open breaker through for its single trial call
+        holds_trial = ai_circuit.state == 'half_open'
+        settled = False
+        flight = ai_singleflight.claim(key) if key else None
+        # Fields may already be on the wire, so a stream is never retried
+        deadline = asyncio.get_running_loop().time() + AI_DEADLINE_SECONDS
+        chunks: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(
+            pump_ai_stream(build_ai_prompt(query.symptom, query.language), deadline, chunks)
+        )
+        try:
+            while (text := await chunks.get()) is not None:
+                if isinstance(text, Exception):
+                    raise text
+                for field, value in parser.feed(text):
+                    parsed[field] = value
+                    if field in AI_FIELDS:
+                        yield ndjson_event('field', field=AI_FIELDS[field], value=value)
             
-            # Save to history if user is authenticated
-            if user_id:
-                save_query_history(
-                    user_id=user_id,
-                    symptom=query.symptom,
-                    language=query.language,
-                    remedy_id=None,
-                    remedy_name=fallback_remedy['name'],
-                    source='fallback',
-                    matched_keywords=keywords,
-                    dosha_used=None,
-                    ranking_score=fallback_remedy['match_score'],
-                    ai_refinement_used=False,
-                    response_time_ms=response_time_ms
-                )
+            for field, value in parser.close():
+                parsed[field] = value
+                if field in AI_FIELDS:
+                    yield ndjson_event('field', field=AI_FIELDS[field], value=value)
             
-            return RemedyResponse(
-                success=True,
-                remedy_id=None,
-                remedy_name=fallback_remedy['name'],
-                herb=fallback_remedy['herb'],
-                herb_scientific=fallback_remedy['herb_scientific'],
-                dosage=fallback_remedy['dosage'],
-                yoga=fallback_remedy['yoga'],
-                diet=fallback_remedy['diet'],
-                dosha=fallback_remedy['dosha'],
-                warning=fallback_remedy['warning'],
-                explanation=fallback_remedy['explanation'],
-                source='dataset',
-                category=fallback_remedy['category'],
-                match_score=fallback_remedy['match_score'],
-                matched_symptoms=fallback_remedy['symptoms'][:3]
-            )
-        
-        # If no fallback, use AI
-        logger.info("No fallback remedy, using AI")
-        ai_result = ai_fallback(query.symptom, query.language)
-        
-        # Calculate response time
-        response_time_ms = (time.time() - start_time) * 1000
+            ai_circuit.record_success()
+            settled = True
+            ai_result = ai_result_from_fields(parsed)
+            if key:
+                await ai_cache.set(key, ai_result)
+        except Exception as e:
+            ai_call_stats['failures'] += 1
+            ai_circuit.record_failure()
+            settled = True
+            logger.error(f"AI stream error: {e!r}")
+            ai_result = ai_error_result()
+        finally:
+            # Client disconnected mid-stream (GeneratorExit / CancelledError): the upstream
+            # call has no outcome, but a held trial slot must not stay taken forever
+            pump.cancel()
+            if holds_trial and not settled:
+                ai_circuit.release_trial()
+            if flight is not None:
+                ai_singleflight.settle(key, flight, ai_result if settled else None)
+    
+    response = await finish_ai_answer(query, user_id, normalized['keywords'], ai_result, start_time)
+    yield ndjson_event('remedy', data=response.model_dump())
+
+@app.post("/api/ask/stream")
+async def ask_remedy_stream(query: QueryRequest, user_id: Optional[str] = Depends(current_user)):
+    """
+    Streaming variant of /api/ask (NDJSON)
+    Dataset, fallback and emergency answers arrive as a single event;
+    AI answers stream each field as soon as its line is complete
+    """
+    start_time = time.time()
+    
+    validate_query(query)
+    
+    logger.info(f"🔍 Streaming query received: '{query.symptom}' (language: {query.language})")
+    
+    with layer_span('normalize'):
+        normalized = normalize_input(query.symptom, query.language)
+    with layer_span('fuzzy'):
+        normalized = correct_keywords(normalized)
+    await wait_for_remedy_catalog()
+    response = await answer_from_dataset(query, user_id, normalized, start_time)
+    
+    if response is not None:
+        event = 'emergency' if isinstance(response, EmergencyResponse) else 'remedy'
         
-        # Save to history if user is authenticated
-        if user_id and ai_result['source'] != 'error':
-            save_query_history(
-                user_id=user_id,
-                symptom=query.symptom,
-                language=query.language,
-                remedy_id=None,
-                remedy_name=ai_result['name'],
-                source=ai_result['source'],
-                matched_keywords=keywords,
-                dosha_used=None,
-                ranking_score=None,
-                ai_refinement_used=True,
-                response_time_ms=response_time_ms
-            )
+        async def single_event():
+            yield ndjson_event(event, data=response.model_dump())
         
-        return RemedyResponse(
-            success=ai_result['source'] != 'error',
-            remedy_id=None,
-            remedy_name=ai_result['name'],
-            herb=ai_result['herb'],
-            herb_scientific=ai_result.get('herb_scientific'),
-            dosage=ai_result['dosage'],
-            yoga=ai_result['yoga'],
-            diet=ai_result['diet'],
-            dosha=ai_result['dosha'],
-            warning=ai_result['warning'],
-            explanation=ai_result['explanation'],
-            source=ai_result['source'],
-            category=ai_result.get('category'),
-            match_score=None,
-            matched_symptoms=None
+        return StreamingResponse(single_event(), media_type="application/x-ndjson")
+    
+    require_remedy_catalog()
+    return StreamingResponse(
+        stream_ai_answer(query, user_id, normalized, start_time),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/api/ask/batch")
+async def ask_remedy_batch(batch: BatchQueryRequest, user_id: Optional[str] = Depends(current_user)):
+    """
+    Answer many symptoms in one request
+    All items share one catalog snapshot, one dosha lookup and one history insert;
+    AI fallbacks run concurrently (at most BATCH_AI_CONCURRENCY at a time)
+    Results come back in input order, each either {index, ok: true, data} or {index, ok: false, error}
+    """
+    start_time = time.time()
+    
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one query")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} queries")
+    
+    logger.info(f"🔍 Batch of {len(batch.items)} queries received")
+    
+    results: List[Optional[dict]] = [None] * len(batch.items)
+    history: List[dict] = []
+    
+    def item_error(index: int, error: str):
+        results[index] = {'index': index, 'ok': False, 'error': error}
+    
+    def item_answer(index: int, response):
+        results[index] = {'index': index, 'ok': True, 'data': response.model_dump()}
+    
+    # LAYER 0: Input Normalization
+    normalized_items: Dict[int, Dict] = {}
+    for index, query in enumerate(batch.items):
+        try:
+            validate_query(query)
+        except HTTPException as e:
+            item_error(index, e.detail)
+            continue
+        with layer_span('normalize'):
+            normalized = normalize_input(query.symptom, query.language)
+        with layer_span('fuzzy'):
+            normalized_items[index] = correct_keywords(normalized)
+    
+    # LAYER 1 once per item; answer_from_dataset reuses the result
+    with layer_span('emergency'):
+        emergencies = {index: query_emergency(normalized) for index, normalized in normalized_items.items()}
+    
+    # LAYER 2 for every non-emergency item against one catalog snapshot
+    catalog_loaded = (await wait_for_remedy_catalog())['loaded_at'] is not None
+    to_rank = [index for index, emergency in emergencies.items() if not emergency]
+    with layer_span('ranking'):
+        ranked = search_remedies_ranked_batch(
+            [(normalized_items[index]['keywords'], batch.items[index].language) for index in to_rank]
         )
+    ranked_by_index = dict(zip(to_rank, ranked))
     
-    # LAYER 3: Dosha-Aware Adjustment
+    # LAYER 3: one profile lookup for the whole batch
     dosha_profile = None
-    if user_id:
-        ranked_remedies = adjust_by_dosha(user_id, ranked_remedies, keywords)
-        dosha_profile = get_user_dosha(user_id)
+    if user_id and any(ranked):
+        with layer_span('dosha'):
+            dosha_profile = await get_cached_user_dosha(user_id)
     
-    # Get top remedy
-    top_remedy = ranked_remedies[0]
+    needs_ai = []
+    for index, normalized in normalized_items.items():
+        try:
+            response = await answer_from_dataset(
+                batch.items[index], user_id, normalized, start_time,
+                ranked_remedies=ranked_by_index.get(index),
+                dosha_profile=dosha_profile,
+                history=history,
+                emergency=emergencies[index]
+            )
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            item_error(index, "Failed to answer this query")
+            continue
+        
+        if response is None and not catalog_loaded:
+            item_error(index, "Remedy catalog is loading, please retry")
+        elif response is None:
+            needs_ai.append(index)
+        else:
+            item_answer(index, response)
     
-    # Calculate response time
-    response_time_ms = (time.time() - start_time) * 1000
+    # LAYER 5: AI Refinement, concurrently under a per-batch cap
+    ai_limit = asyncio.Semaphore(BATCH_AI_CONCURRENCY)
     
-    # LAYER 6: Enhanced Logging
-    if user_id:
-        save_query_history(
-            user_id=user_id,
-            symptom=query.symptom,
-            language=query.language,
-            remedy_id=top_remedy['id'],
-            remedy_name=top_remedy['name'],
-            source='dataset',
-            matched_keywords=keywords,
-            dosha_used=dosha_profile['primary'] if dosha_profile else None,
-            ranking_score=top_remedy['match_score'],
-            ai_refinement_used=False,
-            response_time_ms=response_time_ms
-        )
+    async def answer_with_ai(index: int):
+        query = batch.items[index]
+        normalized = normalized_items[index]
+        try:
+            async with ai_limit:
+                ai_result = await get_ai_remedy(query.symptom, query.language, normalized)
+            response = await finish_ai_answer(query, user_id, normalized['keywords'], ai_result, start_time, history=history)
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            item_error(index, "Failed to answer this query")
+            return
+        item_answer(index, response)
     
-    logger.info(f"✅ Returning remedy: {top_remedy['name']} (score: {top_remedy['match_score']})")
+    if needs_ai:
+        logger.info(f"Batch: {len(needs_ai)} queries need AI")
+        with layer_span('ai'):
+            await asyncio.gather(*(answer_with_ai(index) for index in needs_ai))
     
-    return RemedyResponse(
-        success=True,
-        remedy_id=top_remedy['id'],
-        remedy_name=top_remedy['name'],
-        herb=top_remedy['herb'],
-        herb_scientific=top_remedy.get('herb_scientific'),
-        dosage=top_remedy['dosage'],
-        yoga=top_remedy['yoga'],
-        diet=top_remedy['diet'],
-        dosha=top_remedy['dosha'],
-        warning=top_remedy['warning'],
-        explanation=top_remedy['explanation'],
-        source='dataset',
-        category=top_remedy.get('category'),
-        match_score=top_remedy['match_score'],
-        matched_symptoms=top_remedy['matched_symptoms'],
-        dosha_adjusted=top_remedy.get('dosha_adjusted', False)
-    )
+    # LAYER 6: every history row of the batch in one insert
+    with layer_span('history'):
+        await history_writer.submit_many(history)
+    
+    return {'count': len(results), 'results': results}
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "100"))
+HISTORY_COLUMNS = 'id, symptom, remedy_name, source, language, created_at, match_score:ranking_score, dosha_used'
+
+def encode_history_cursor(row: dict) -> str:
+    """Opaque keyset cursor: the (created_at, id) of the last row on a page"""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_history_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    (created_at, id) back out of a cursor, re-serialized from a parsed timestamp and UUID
+    The values go into a PostgREST filter string, so nothing else may pass through
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        moment = datetime.fromisoformat(created_at)
+        if moment.tzinfo is None:
+            raise ValueError("cursor timestamp has no time zone")
+        return moment.isoformat(), str(uuid.UUID(row_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
 
 @app.get("/api/history", response_model=List[HistoryItem])
-async def get_history(user_id: str = Header(..., alias="X-User-ID"), limit: int = 20):
-    """Get user's query history (requires authentication)"""
+async def get_history(
+    response: Response,
+    user_id: str = Depends(require_user),
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    """
+    Get user's query history (requires authentication), newest first
+    Pages by keyset on (created_at, id); when more rows exist the
+    X-Next-Cursor header carries the cursor for the next page
+    """
+    limit = max(1, min(limit, HISTORY_PAGE_MAX))
+    after = decode_history_cursor(cursor) if cursor else None
+    
     try:
-        response = supabase.table('query_history')\
-            .select('id, symptom, remedy_name, source, language, created_at')\
-            .eq('user_id', user_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
-            .execute()
+        query = supabase.table('query_history')\
+            .select(HISTORY_COLUMNS)\
+            .eq('user_id', user_id)
+        if after:
+            created_at, row_id = after
+            # Rows strictly older than the cursor row; id breaks created_at ties
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+            )
+        # One extra row tells us whether there is a next page
+        query = query.order('created_at', desc=True)\
+            .order('id', desc=True)\
+            .limit(limit + 1)
+        result = await run_db(query.execute)
         
-        return [HistoryItem(**item) for item in response.data]
+        rows = result.data[:limit]
+        if len(result.data) > limit:
+            response.headers['X-Next-Cursor'] = encode_history_cursor(rows[-1])
+        return [HistoryItem(**item) for item in rows]
     except Exception as e:
         logger.error(f"History retrieval error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve history")
 
+REMEDIES_MAX_AGE_SECONDS = int(os.getenv("REMEDIES_MAX_AGE_SECONDS", "300"))
+REMEDIES_STALE_WHILE_REVALIDATE_SECONDS = int(os.getenv("REMEDIES_STALE_WHILE_REVALIDATE_SECONDS", "86400"))
+CATALOG_BODY_CACHE_SIZE = int(os.getenv("CATALOG_BODY_CACHE_SIZE", "64"))
+
+# Encoded catalog pages per (catalog version, language, filter); compressed variants are added on first use
+catalog_body_cache = LRUCache(CATALOG_BODY_CACHE_SIZE)
+
+def catalog_etag(version: str, *parts) -> str:
+    """Strong validator for a catalog page: the catalog version plus whatever selects the page"""
+    selector = hashlib.sha256(repr(parts).encode()).hexdigest()[:12]
+    return f"{version}-{selector}"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison; any content-coding variant of `etag` matches"""
+    if not if_none_match:
+        return False
+    variants = {etag, f"{etag}-gzip", f"{etag}-br"}
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') in variants:
+            return True
+    return False
+
+def cached_catalog_response(request: Request, entry: dict) -> Response:
+    """
+    Serve a catalog_body_cache entry ({'etag', 'identity', ...}) with validators
+    304 when the client already has it, otherwise the identity body or a compressed
+    variant (each content-coding gets its own strong ETag)
+    """
+    encoding = None
+    if len(entry['identity']) >= COMPRESS_MIN_BYTES:
+        encoding = accepted_encoding(request.headers.get('accept-encoding', ''))
+    
+    headers = {
+        'ETag': f'"{entry["etag"]}-{encoding}"' if encoding else f'"{entry["etag"]}"',
+        'Cache-Control': f"public, max-age={REMEDIES_MAX_AGE_SECONDS}, "
+                         f"stale-while-revalidate={REMEDIES_STALE_WHILE_REVALIDATE_SECONDS}",
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('if-none-match'), entry['etag']):
+        return Response(status_code=304, headers=headers)
+    
+    body = entry['identity']
+    if encoding:
+        if encoding not in entry:
+            entry[encoding] = compress_body(body, encoding)
+        body = entry[encoding]
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/api/remedies")
-async def list_remedies(category: Optional[str] = None, language: str = "en"):
-    """List all remedies (optional category filter)"""
+async def list_remedies(request: Request, category: Optional[str] = None, language: str = "en"):
+    """List all remedies (optional category filter), with ETag/304 and compression"""
+    catalog = require_remedy_catalog()
     try:
-        query = supabase.table('remedies')
+        language = 'hi' if language == "hi" else 'en'
+        key = ('list', catalog['version'], language, category)
         
-        if language == "hi":
-            query = query.select('id, name_hi, category, herb_hi, dosha_hi')
-        else:
-            query = query.select('id, name, category, herb, dosha')
-        
-        if category:
-            query = query.eq('category', category)
-        
-        response = query.execute()
-        return {"remedies": response.data, "count": len(response.data)}
+        entry = catalog_body_cache.get(key)
+        if entry is None:
+            if language == "hi":
+                fields = ('id', 'name_hi', 'category', 'herb_hi', 'dosha_hi')
+            else:
+                fields = ('id', 'name', 'category', 'herb', 'dosha')
+            
+            # Hindi columns left NULL fall back to the English text, as in /api/ask
+            data = [
+                {field: remedy.get(field) or remedy.get(field.removesuffix('_hi')) for field in fields}
+                for remedy in catalog['remedies']
+                if not category or remedy.get('category') == category
+            ]
+            entry = {
+                'etag': catalog_etag(catalog['version'], 'list', language, category),
+                'identity': encode_json({"remedies": data, "count": len(data)})
+            }
+            catalog_body_cache.set(key, entry)
     except Exception as e:
         logger.error(f"Remedies list error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve remedies")
+    
+    return cached_catalog_response(request, entry)
+
+SYNC_FIELDS = (
+    'id', 'name', 'herb', 'herb_scientific', 'dosage', 'yoga', 'diet',
+    'dosha', 'warning', 'explanation', 'category', 'symptoms'
+)
+
+@app.get("/api/remedies/sync")
+async def sync_remedies(request: Request, since: Optional[str] = None, language: str = "en"):
+    """
+    Catalog delta for clients that keep a local copy and rank offline
+    Returns the remedies whose updated_at is newer than catalog version `since` (less
+    SYNC_OVERLAP_SECONDS) and the ids tombstoned since then, or the whole catalog
+    (full=true) when `since` is missing or unusable. Rows are arrays in `fields`
+    order, localized to `language`; clients apply upserts before deletes
+    """
+    catalog = require_remedy_catalog()
+    try:
+        version = catalog['version']
+        language = 'hi' if language == "hi" else 'en'
+        
+        since_micros = parse_catalog_version(since)
+        current_micros = parse_catalog_version(version)
+        full_key = ('sync', version, language, None)
+        key = full_key
+        # Set once a version is known to have no tombstone table, so no delta is ever attempted again
+        tombstones_key = ('sync-tombstones', version)
+        if (since_micros is not None and current_micros is not None and since_micros <= current_micros
+                and catalog_body_cache.get(tombstones_key, True)):
+            cutoff = since_micros - int(SYNC_OVERLAP_SECONDS * 1_000_000)
+            key = ('sync', version, language, since)
+        
+        entry = catalog_body_cache.get(key)
+        deleted = None
+        if entry is None and key is not full_key:
+            deleted = await run_db(fetch_tombstones_since, cutoff)
+            if deleted is None:
+                # No tombstone table: unknown deletions, so only a full copy is correct
+                catalog_body_cache.set(tombstones_key, False)
+                key = full_key
+                entry = catalog_body_cache.get(key)
+        
+        if entry is None:
+            incremental = key is not full_key
+            base = since if incremental else None
+            projections = (catalog.get('projections') or {}).get(language, {})
+            remedies = catalog['remedies']
+            
+            def row(remedy: dict) -> list:
+                projection = projections.get(remedy['id']) or project_remedy(remedy, language)
+                return [projection[field] for field in SYNC_FIELDS[:-1]] + [remedy.get('symptoms') or []]
+            
+            if incremental:
+                updated = catalog['updated']
+                first = bisect.bisect_right(updated, (cutoff, len(remedies)))
+                upserts = [row(remedies[position]) for _, position in updated[first:]
+                           if remedies[position].get('id') is not None]
+                deletes = sorted(set(deleted) - catalog['ids'])
+            else:
+                upserts = [row(remedy) for remedy in remedies if remedy.get('id') is not None]
+                deletes = []
+            
+            entry = {
+                'etag': catalog_etag(version, 'sync', language, base),
+                'identity': encode_json({
+                    "version": version,
+                    "since": base,
+                    "full": not incremental,
+                    "fields": SYNC_FIELDS,
+                    "upserts": upserts,
+                    "deletes": deletes
+                })
+            }
+            catalog_body_cache.set(key, entry)
+    except Exception as e:
+        logger.error(f"Remedies sync error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to sync remedies")
+    
+    return cached_catalog_response(request, entry)
+
+@app.get("/api/symptoms/suggest")
+async def suggest_symptoms(q: str = "", limit: int = SUGGEST_TOP_K):
+    """
+    Typeahead for the symptom box: known symptom strings that start with q
+    (or have a word starting with it), most popular first
+    Picking one steers the query onto a dataset or fallback answer instead of the AI
+    """
+    prefix = normalize_phrase(q[:SUGGEST_MAX_QUERY_LENGTH])
+    if not prefix:
+        return {"query": q, "suggestions": []}
+    return {"query": q, "suggestions": get_symptom_suggester().suggest(prefix, max(1, limit))}
+
+@app.post("/api/admin/catalog/reload")
+async def reload_catalog(admin_key: str = Header(None, alias="X-Admin-Key")):
+    """Force an immediate catalog reload (admin only)"""
+    verify_admin_key(admin_key)
+    
+    try:
+        changed = await reload_remedy_catalog()
+    except Exception as e:
+        logger.error(f"Catalog reload error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to reload catalog")
+    
+    return {
+        "success": True,
+        "changed": changed,
+        "version": remedy_catalog['version'],
+        "count": len(remedy_catalog['remedies'])
+    }
+
+def cache_stats() -> Dict[str, dict]:
+    return {
+        "ai_response": ai_cache.snapshot_stats(),
+        "dataset_response": response_cache.snapshot_stats(),
+        "catalog_pages": catalog_body_cache.snapshot_stats(),
+        "dosha_profile": profile_cache.snapshot_stats(),
+        "verified_tokens": token_cache.snapshot_stats()
+    }
 
 @app.get("/api/health")
 async def health_check():
     """Detailed system health check"""
     try:
         # Test database connection
-        db_test = supabase.table('remedies').select('id').limit(1).execute()
+        db_test = await run_db(supabase.table('remedies').select('id').limit(1).execute)
         db_status = "connected" if db_test.data else "empty"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -1024,69 +4167,215 @@ async def health_check():
         "database": db_status,
         "ai_service": "enabled" if anthropic_client else "disabled",
         "remedies_count": len(db_test.data) if db_test.data else 0,
+        "catalog": {
+            "version": remedy_catalog['version'],
+            "size": len(remedy_catalog['remedies']),
+            "loaded_at": remedy_catalog['loaded_at']
+        },
+        "caches": cache_stats(),
+        "auth": {**auth_stats, "signing_keys": len(jwks_keys)},
+        "ai_calls": ai_call_stats,
+        "fuzzy_matching": fuzzy_stats,
+        "ai_circuit": ai_circuit.snapshot(),
+        "ai_singleflight": {**ai_singleflight.stats, "in_flight": ai_singleflight.in_flight()},
+        "history_writer": {
+            **history_writer.stats,
+            "pending": history_writer.queue.qsize() if history_writer.queue else 0
+        },
         "supported_languages": ["en", "hi"]
     }
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: latency histograms plus cache, in-flight and queue gauges"""
+    caches = cache_stats()
+    lines = []
+    for histogram in (http_request_seconds, pipeline_layer_seconds, supabase_call_seconds, anthropic_call_seconds):
+        lines += histogram.render()
+    
+    lines += metric_lines('ayush_cache_hits_total', 'Cache hits', 'counter',
+                          [({'cache': name}, stats['hits']) for name, stats in caches.items()])
+    lines += metric_lines('ayush_cache_misses_total', 'Cache misses', 'counter',
+                          [({'cache': name}, stats['misses']) for name, stats in caches.items()])
+    lines += metric_lines('ayush_cache_hit_ratio', 'Cache hit ratio since start', 'gauge',
+                          [({'cache': name}, stats['hit_ratio']) for name, stats in caches.items()])
+    lines += metric_lines('ayush_cache_entries', 'Entries currently cached', 'gauge',
+                          [({'cache': name}, stats['size']) for name, stats in caches.items()])
+    lines += metric_lines('ayush_in_flight', 'Requests and upstream calls currently running', 'gauge',
+                          [({'kind': kind}, in_flight[kind]) for kind in ('http', 'supabase', 'anthropic')])
+    lines += metric_lines('ayush_ai_singleflight_in_flight', 'Distinct AI keys with a call in flight', 'gauge',
+                          [({}, ai_singleflight.in_flight())])
+    lines += metric_lines('ayush_ai_circuit_state', 'AI circuit breaker state (1 = current)', 'gauge',
+                          [({'state': state}, int(ai_circuit.state == state)) for state in ('closed', 'open', 'half_open')])
+    lines += metric_lines('ayush_history_queue_pending', 'History submissions waiting for the writer', 'gauge',
+                          [({}, history_writer.queue.qsize() if history_writer.queue else 0)])
+    lines += metric_lines('ayush_history_rows_total', 'History rows by outcome', 'counter',
+                          [({'outcome': outcome}, history_writer.stats[outcome]) for outcome in ('written', 'dropped', 'failed')])
+    lines += metric_lines('ayush_fuzzy_total', 'Typo correction: queries and keywords corrected, AI calls avoided', 'counter',
+                          [({'event': event}, count) for event, count in fuzzy_stats.items()])
+    lines += metric_lines('ayush_catalog_remedies', 'Remedies in the current catalog snapshot', 'gauge',
+                          [({}, len(remedy_catalog['remedies']))])
+    
+    return PlainTextResponse('\n'.join(lines) + '\n', media_type="text/plain; version=0.0.4")
+
+@app.post("/api/admin/profile")
+async def profile_event_loop(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    admin_key: str = Header(None, alias="X-Admin-Key")
+):
+    """
+    Sample the event loop thread for `seconds` and return collapsed stacks
+    (one 'frame;frame;frame count' line per stack, busiest first)
+    Opt-in: needs PROFILER_ENABLED=true as well as the admin key
+    """
+    verify_admin_key(admin_key)
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    
+    seconds = min(max(seconds, 0.1), PROFILER_MAX_SECONDS)
+    interval = max(interval_ms, 1) / 1000
+    loop_thread = threading.get_ident()
+    
+    logger.info(f"🔬 Profiling event loop for {seconds}s")
+    try:
+        stacks = await asyncio.get_running_loop().run_in_executor(
+            None, sampling_profiler.sample, loop_thread, seconds, interval
+        )
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    body = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return PlainTextResponse(body + '\n')
+
 # ============================================
 # SAVED REMEDIES ENDPOINTS
 # ============================================
 
+SAVED_BULK_MAX_ITEMS = int(os.getenv("SAVED_BULK_MAX_ITEMS", "100"))
+
 class SaveRemedyRequest(BaseModel):
     remedy_id: str
     remedy_name: str
     notes: Optional[str] = None
 
+class BulkSaveRequest(BaseModel):
+    save: List[SaveRemedyRequest] = []
+    unsave: List[str] = []
+
+class RemedyIdsRequest(BaseModel):
+    remedy_ids: List[str]
+
+def saved_row(user_id: str, request: SaveRemedyRequest) -> dict:
+    return {
+        'user_id': user_id,
+        'remedy_id': request.remedy_id,
+        'remedy_name': request.remedy_name,
+        'notes': request.notes
+    }
+
+def insert_saved_rows(rows: List[dict]):
+    """
+    INSERT ... ON CONFLICT (user_id, remedy_id) DO NOTHING, as a query builder
+    Only rows that were actually inserted come back in .data
+    """
+    return supabase.table('saved_remedies')\
+        .upsert(rows, on_conflict='user_id,remedy_id', ignore_duplicates=True)
+
 @app.post("/api/remedies/save")
 async def save_remedy(
     request: SaveRemedyRequest,
-    user_id: str = Header(..., alias="X-User-ID")
+    user_id: str = Depends(require_user)
 ):
-    """Save a remedy to user's collection"""
+    """Save a remedy to user's collection (idempotent)"""
     try:
-        # Check if already saved
-        existing = supabase.table('saved_remedies')\
-            .select('id')\
-            .eq('user_id', user_id)\
-            .eq('remedy_id', request.remedy_id)\
-            .execute()
+        result = await run_db(insert_saved_rows([saved_row(user_id, request)]).execute)
         
-        if existing.data:
+        if not result.data:
             return {
                 "success": False,
                 "message": "Remedy already saved",
                 "already_saved": True
             }
         
-        # Save remedy
-        result = supabase.table('saved_remedies').insert({
-            'user_id': user_id,
-            'remedy_id': request.remedy_id,
-            'remedy_name': request.remedy_name,
-            'notes': request.notes
-        }).execute()
-        
         logger.info(f"✅ Remedy saved: {request.remedy_name} for user {user_id}")
         
         return {
             "success": True,
             "message": "Remedy saved successfully",
-            "saved_id": result.data[0]['id'] if result.data else None
+            "saved_id": result.data[0]['id']
         }
         
     except Exception as e:
         logger.error(f"Save remedy error: {e}")
         raise HTTPException(status_code=500, detail="Failed to save remedy")
 
+@app.post("/api/remedies/saved/bulk")
+async def bulk_save_remedies(
+    request: BulkSaveRequest,
+    user_id: str = Depends(require_user)
+):
+    """
+    Save and/or remove many remedies in one call
+    Saves are one upsert and removals one delete, run concurrently
+    """
+    # Last entry wins when a remedy is listed twice
+    to_save = {item.remedy_id: item for item in request.save}
+    to_unsave = list(dict.fromkeys(request.unsave))
+    
+    if not to_save and not to_unsave:
+        raise HTTPException(status_code=400, detail="Nothing to save or remove")
+    if len(to_save) + len(to_unsave) > SAVED_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Bulk requests are limited to {SAVED_BULK_MAX_ITEMS} remedies")
+    if to_save.keys() & set(to_unsave):
+        raise HTTPException(status_code=400, detail="A remedy cannot be saved and removed in the same request")
+    
+    async def save_all():
+        if not to_save:
+            return []
+        rows = [saved_row(user_id, item) for item in to_save.values()]
+        return (await run_db(insert_saved_rows(rows).execute)).data
+    
+    async def unsave_all():
+        if not to_unsave:
+            return []
+        query = supabase.table('saved_remedies')\
+            .delete()\
+            .eq('user_id', user_id)\
+            .in_('remedy_id', to_unsave)
+        return (await run_db(query.execute)).data
+    
+    try:
+        inserted, deleted = await asyncio.gather(save_all(), unsave_all())
+    except Exception as e:
+        logger.error(f"Bulk save error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update saved remedies")
+    
+    saved_ids = [row['remedy_id'] for row in inserted]
+    newly_saved = set(saved_ids)
+    removed_ids = [row['remedy_id'] for row in deleted]
+    logger.info(f"✅ Bulk saved {len(saved_ids)}, removed {len(removed_ids)} remedies for user {user_id}")
+    
+    return {
+        "success": True,
+        "saved": saved_ids,
+        "already_saved": [remedy_id for remedy_id in to_save if remedy_id not in newly_saved],
+        "removed": removed_ids
+    }
+
 @app.get("/api/remedies/saved")
-async def get_saved_remedies(user_id: str = Header(..., alias="X-User-ID")):
+async def get_saved_remedies(user_id: str = Depends(require_user)):
     """Get user's saved remedies"""
     try:
         # Get saved remedies with full remedy details
-        saved = supabase.table('saved_remedies')\
-            .select('*, remedies(*)')\
-            .eq('user_id', user_id)\
-            .order('saved_at', desc=True)\
-            .execute()
+        saved = await run_db(
+            supabase.table('saved_remedies')
+            .select('*, remedies(*)')
+            .eq('user_id', user_id)
+            .order('saved_at', desc=True)
+            .execute
+        )
         
         return {
             "success": True,
@@ -1101,15 +4390,17 @@ async def get_saved_remedies(user_id: str = Header(..., alias="X-User-ID")):
 @app.delete("/api/remedies/saved/{remedy_id}")
 async def unsave_remedy(
     remedy_id: str,
-    user_id: str = Header(..., alias="X-User-ID")
+    user_id: str = Depends(require_user)
 ):
     """Remove remedy from saved collection"""
     try:
-        result = supabase.table('saved_remedies')\
-            .delete()\
-            .eq('user_id', user_id)\
-            .eq('remedy_id', remedy_id)\
-            .execute()
+        result = await run_db(
+            supabase.table('saved_remedies')
+            .delete()
+            .eq('user_id', user_id)
+            .eq('remedy_id', remedy_id)
+            .execute
+        )
         
         logger.info(f"✅ Remedy unsaved: {remedy_id} for user {user_id}")
         
@@ -1125,15 +4416,18 @@ async def unsave_remedy(
 @app.get("/api/remedies/is-saved/{remedy_id}")
 async def check_if_saved(
     remedy_id: str,
-    user_id: str = Header(..., alias="X-User-ID")
+    user_id: str = Depends(require_user)
 ):
     """Check if a remedy is saved by user"""
     try:
-        result = supabase.table('saved_remedies')\
-            .select('id')\
-            .eq('user_id', user_id)\
-            .eq('remedy_id', remedy_id)\
-            .execute()
+        result = await run_db(
+            supabase.table('saved_remedies')
+            .select('id')
+            .eq('user_id', user_id)
+            .eq('remedy_id', remedy_id)
+            .limit(1)
+            .execute
+        )
         
         return {
             "is_saved": len(result.data) > 0
@@ -1143,6 +4437,38 @@ async def check_if_saved(
         logger.error(f"Check saved error: {e}")
         return {"is_saved": False}
 
+@app.post("/api/remedies/is-saved")
+async def check_if_saved_many(
+    request: RemedyIdsRequest,
+    user_id: str = Depends(require_user)
+):
+    """Batch form of is-saved for list screens: {remedy_id: bool} in one query"""
+    remedy_ids = list(dict.fromkeys(request.remedy_ids))
+    if len(remedy_ids) > SAVED_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Limited to {SAVED_BULK_MAX_ITEMS} remedies per request")
+    if not remedy_ids:
+        return {"saved": {}}
+    
+    try:
+        result = await run_db(
+            supabase.table('saved_remedies')
+            .select('remedy_id')
+            .eq('user_id', user_id)
+            .in_('remedy_id', remedy_ids)
+            .execute
+        )
+        saved = {row['remedy_id'] for row in result.data}
+    except Exception as e:
+        logger.error(f"Check saved error: {e}")
+        saved = set()
+    
+    return {"saved": {remedy_id: remedy_id in saved for remedy_id in remedy_ids}}
+
+# Registered last so background writers can flush through the executor first
+@app.on_event("shutdown")
+async def stop_db_executor():
+    db_executor.shutdown(wait=False)
+
 # ============================================
 # RUN SERVER
 # ============================================
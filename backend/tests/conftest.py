@@ -0,0 +1,33 @@
+"""
+Shared setup for the test suite: main is imported against the in-process fakes
+from benchmarks/fakes.py, so no Supabase project or API key is needed
+"""
+import os
+import sys
+import logging
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test.service.key")
+os.environ.pop("ANTHROPIC_API_KEY", None)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+import main  # noqa: E402
+from fakes import install_fakes, synthetic_remedies  # noqa: E402
+
+@pytest.fixture
+def fakes(monkeypatch):
+    """
+    A small synthetic catalog on fake Supabase/Anthropic clients, with a fresh
+    circuit breaker and empty response caches. Returns (FakeSupabase, FakeAsyncAnthropic)
+    """
+    monkeypatch.setattr(main, 'ai_circuit', main.CircuitBreaker(
+        'test', failure_rate=0.5, window=20, min_calls=5, reset_seconds=30
+    ))
+    main.ai_cache.memory.clear()
+    main.response_cache.clear()
+    return install_fakes(main, synthetic_remedies(200))
@@ -0,0 +1,58 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import main
+
+ANSWER = {'name': 'Tulsi Tea', 'herb': 'Tulsi', 'source': 'ai'}
+
+def test_persistent_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "ai_cache.sqlite")
+    
+    async def scenario():
+        await main.AIResponseCache(10, 3600, path).set("en:wobble", ANSWER)
+        restarted = main.AIResponseCache(10, 3600, path)
+        return await restarted.get("en:wobble"), restarted.stats['persistent_hits']
+    
+    assert asyncio.run(scenario()) == (ANSWER, 1)
+
+def test_sqlite_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = main.AIResponseCache(10, 3600, str(tmp_path / "ai_cache.sqlite"))
+    threads = []
+    read, write = cache._read, cache._write
+    monkeypatch.setattr(cache, '_read', lambda *args: threads.append(threading.current_thread()) or read(*args))
+    monkeypatch.setattr(cache, '_write', lambda *args: threads.append(threading.current_thread()) or write(*args))
+    
+    async def scenario():
+        await cache.set("en:wobble", ANSWER)
+        cache.memory.clear()
+        return await cache.get("en:wobble")
+    
+    assert asyncio.run(scenario()) == ANSWER
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+def test_expired_rows_are_pruned(tmp_path, monkeypatch):
+    path = str(tmp_path / "ai_cache.sqlite")
+    cache = main.AIResponseCache(10, 60, path)
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            'INSERT INTO ai_cache (key, payload, created_at) VALUES (?, ?, ?)',
+            [(f"en:old {i}", '{}', time.time() - 3600) for i in range(50)]
+        )
+    
+    monkeypatch.setattr(main, 'AI_CACHE_PRUNE_SECONDS', 0)
+    asyncio.run(cache.set("en:fresh", ANSWER))
+    
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT key FROM ai_cache').fetchall() == [("en:fresh",)]
+    assert cache.stats['pruned'] == 50
+    
+
+def test_startup_prunes_expired_rows(tmp_path):
+    path = str(tmp_path / "ai_cache.sqlite")
+    main.AIResponseCache(10, 60, path)
+    with sqlite3.connect(path) as db:
+        db.execute('INSERT INTO ai_cache (key, payload, created_at) VALUES (?, ?, ?)', ("en:old", '{}', 0))
+    
+    assert main.AIResponseCache(10, 60, path).stats['pruned'] == 1
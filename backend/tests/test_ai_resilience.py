@@ -0,0 +1,193 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+import main
+from fakes import FakeAsyncAnthropic
+
+def open_breaker() -> main.CircuitBreaker:
+    """A breaker that has just tripped and is due for its half-open trial"""
+    breaker = main.CircuitBreaker('test', failure_rate=0.5, window=4, min_calls=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    return breaker
+
+def ai_stream(symptom: str):
+    query = main.QueryRequest(symptom=symptom)
+    return main.stream_ai_answer(query, None, main.normalize_input(symptom), time.time())
+
+@pytest.mark.parametrize("disconnect", ["aclose", "cancel"])
+def test_abandoned_trial_stream_releases_the_breaker(fakes, monkeypatch, disconnect):
+    breaker = open_breaker()
+    monkeypatch.setattr(main, 'ai_circuit', breaker)
+    monkeypatch.setattr(main, 'anthropic_client', FakeAsyncAnthropic(latency=0.5, chunks=20))
+
+    async def scenario():
+        stream = ai_stream(f"zzqx wobble {disconnect}")
+        first = await stream.__anext__()
+        assert json.loads(first)['event'] == 'field'
+        assert breaker.state == 'half_open'
+        assert not breaker.allow_request()  # the stream holds the trial slot
+        
+        if disconnect == "aclose":
+            await stream.aclose()
+        else:
+            task = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+    
+    asyncio.run(scenario())
+    
+    # No verdict was recorded, but the next call gets to run the trial
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()
+
+def test_completed_trial_stream_closes_the_breaker(fakes, monkeypatch):
+    breaker = open_breaker()
+    monkeypatch.setattr(main, 'ai_circuit', breaker)
+    monkeypatch.setattr(main, 'anthropic_client', FakeAsyncAnthropic())
+
+    async def consume():
+        return [json.loads(event) async for event in ai_stream("zzqx wobble complete")]
+    
+    events = asyncio.run(consume())
+    assert events[-1]['event'] == 'remedy'
+    assert events[-1]['data']['source'] == 'ai'
+    assert breaker.state == 'closed'
+
+def test_concurrent_misses_share_one_upstream_call(fakes, monkeypatch):
+    ai = FakeAsyncAnthropic(latency=0.2)
+    monkeypatch.setattr(main, 'anthropic_client', ai)
+    normalized = main.normalize_input("zzqx wobble since morning")
+    
+    async def scenario():
+        return await asyncio.gather(*(
+            main.get_ai_remedy("zzqx wobble since morning", "en", normalized) for _ in range(25)
+        ))
+    
+    results = asyncio.run(scenario())
+    assert len(ai.calls) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]['name'] == "Synthetic Herbal Support"
+    assert main.ai_singleflight.in_flight() == 0
+
+def test_different_questions_are_not_coalesced(fakes, monkeypatch):
+    ai = FakeAsyncAnthropic(latency=0.1)
+    monkeypatch.setattr(main, 'anthropic_client', ai)
+    symptoms = ["zzqx wobble", "zzqx flutter", "zzqx tingle"]
+    
+    async def scenario():
+        return await asyncio.gather(*(
+            main.get_ai_remedy(symptom, "en", main.normalize_input(symptom))
+            for symptom in symptoms * 5
+        ))
+    
+    asyncio.run(scenario())
+    assert len(ai.calls) == len(symptoms)
+
+async def drain(stream) -> list:
+    return [json.loads(line) async for line in stream]
+
+def test_concurrent_streams_share_one_upstream_call(fakes, monkeypatch):
+    ai = FakeAsyncAnthropic(latency=0.2, chunks=10)
+    monkeypatch.setattr(main, 'anthropic_client', ai)
+    symptom = "zzqx wobble shared"
+    
+    async def scenario():
+        streams = [drain(ai_stream(symptom)) for _ in range(10)]
+        asked = main.get_ai_remedy(symptom, "en", main.normalize_input(symptom))
+        return await asyncio.gather(*streams), await asked
+    
+    streams, asked = asyncio.run(scenario())
+    assert len(ai.calls) == 1
+    leader, *followers = streams
+    assert [event['event'] for event in leader].count('field') > 0
+    for events in followers:
+        assert [event['event'] for event in events] == ['remedy']
+    answers = {json.dumps(events[-1]['data'], sort_keys=True) for events in streams}
+    assert len(answers) == 1
+    assert asked['name'] == leader[-1]['data']['remedy_name']
+    
+    # The finished stream filled the cache
+    assert asyncio.run(main.ai_cache.get(main.ai_cache.make_key(main.normalize_input(symptom), "en")))
+
+def test_followers_retry_when_the_streaming_leader_goes_away(fakes, monkeypatch):
+    ai = FakeAsyncAnthropic(latency=0.3, chunks=10)
+    monkeypatch.setattr(main, 'anthropic_client', ai)
+    symptom = "zzqx wobble abandoned"
+    
+    async def scenario():
+        stream = ai_stream(symptom)
+        await stream.__anext__()  # leading, first field on the wire
+        follower = asyncio.ensure_future(drain(ai_stream(symptom)))
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+        return await follower
+    
+    events = asyncio.run(scenario())
+    assert [event['event'] for event in events] == ['remedy']
+    assert events[0]['data']['remedy_name'] == "Synthetic Herbal Support"
+    assert len(ai.calls) == 2
+    assert main.ai_singleflight.in_flight() == 0
+
+@pytest.mark.parametrize("interruption", ["cancel", "deadline"])
+def test_interrupted_trial_call_releases_the_breaker(fakes, monkeypatch, interruption):
+    breaker = open_breaker()
+    monkeypatch.setattr(main, 'ai_circuit', breaker)
+    monkeypatch.setattr(main, 'anthropic_client', FakeAsyncAnthropic(latency=0.5))
+    
+    async def scenario():
+        call = asyncio.ensure_future(main.ai_fallback("zzqx wobble trial"))
+        await asyncio.sleep(0.05)
+        assert breaker.state == 'half_open' and not breaker.allow_request()
+        if interruption == "cancel":
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+        else:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(call, 0.05)
+    
+    asyncio.run(scenario())
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()  # the next call gets the trial
+
+def test_stalled_stream_client_does_not_hold_an_ai_slot(fakes, monkeypatch):
+    monkeypatch.setattr(main, 'ai_semaphore', asyncio.Semaphore(1))
+    monkeypatch.setattr(main, 'anthropic_client', FakeAsyncAnthropic(latency=0.05, chunks=5))
+
+    async def scenario():
+        stalled = ai_stream("zzqx wobble stalled")
+        await stalled.__anext__()
+        # The client stops reading; once the upstream finishes the slot is free again
+        await asyncio.sleep(0.2)
+        assert not main.ai_semaphore.locked()
+        
+        events = [json.loads(event) async for event in ai_stream("zzqx wobble next")]
+        assert events[-1]['data']['source'] == 'ai'
+        await stalled.aclose()
+    
+    asyncio.run(scenario())
+
+def test_stream_slot_wait_is_bounded_by_the_deadline(fakes, monkeypatch):
+    monkeypatch.setattr(main, 'ai_semaphore', asyncio.Semaphore(1))
+    monkeypatch.setattr(main, 'AI_DEADLINE_SECONDS', 0.05)
+    monkeypatch.setattr(main, 'anthropic_client', FakeAsyncAnthropic())
+    exceeded = main.ai_call_stats['deadline_exceeded']
+
+    async def scenario():
+        await main.ai_semaphore.acquire()
+        try:
+            return [json.loads(event) async for event in ai_stream("zzqx wobble queued")]
+        finally:
+            main.ai_semaphore.release()
+    
+    events = asyncio.run(scenario())
+    assert [event['event'] for event in events] == ['remedy']
+    assert events[-1]['data']['remedy_name'] == 'AI Error'
+    assert main.ai_call_stats['deadline_exceeded'] == exceeded + 1
+    assert main.anthropic_client.calls == []
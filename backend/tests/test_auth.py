@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+import main
+from fakes import bench_user_id
+
+USER_ID = bench_user_id(7)
+HS256_SECRET = "test-jwt-secret-with-at-least-32-bytes!"
+
+@pytest.fixture(autouse=True)
+def signing_keys(monkeypatch):
+    """HS256 secret and one RS256 key held locally; nothing cached between tests"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    monkeypatch.setattr(main, 'SUPABASE_JWT_SECRET', HS256_SECRET)
+    monkeypatch.setattr(main, 'jwks_keys', {'test-key': private_key.public_key()})
+    main.token_cache.clear()
+    yield private_key
+    main.token_cache.clear()
+
+def claims(**overrides) -> dict:
+    return {'sub': USER_ID, 'aud': 'authenticated', 'exp': int(time.time()) + 300, **overrides}
+
+def hs256_token(**overrides) -> str:
+    return jwt.encode(claims(**overrides), HS256_SECRET, algorithm='HS256')
+
+def rs256_token(private_key, **overrides) -> str:
+    return jwt.encode(claims(**overrides), private_key, algorithm='RS256', headers={'kid': 'test-key'})
+
+def verify(token: str) -> str:
+    return asyncio.run(main.verify_token(f"Bearer {token}"))
+
+def assert_rejected(token: str):
+    with pytest.raises(HTTPException) as error:
+        verify(token)
+    assert error.value.status_code == 401
+
+def test_valid_tokens(signing_keys):
+    assert verify(hs256_token()) == USER_ID
+    assert verify(rs256_token(signing_keys)) == USER_ID
+
+def test_expired_tokens(signing_keys):
+    assert_rejected(hs256_token(exp=int(time.time()) - 60))
+    assert_rejected(rs256_token(signing_keys, exp=int(time.time()) - 60))
+
+def test_wrong_audience(signing_keys):
+    assert_rejected(hs256_token(aud='anon'))
+    assert_rejected(rs256_token(signing_keys, aud='anon'))
+
+def test_bad_signatures():
+    assert_rejected(jwt.encode(claims(), "some-other-secret-of-sufficient-length", algorithm='HS256'))
+    impostor = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    assert_rejected(rs256_token(impostor))
+
+def test_unsigned_tokens_are_rejected():
+    assert_rejected(jwt.encode(claims(), None, algorithm='none'))
+
+def test_verified_tokens_are_cached_until_expiry(signing_keys):
+    token = rs256_token(signing_keys)
+    verify(token)
+    verify(token)
+    assert len(main.token_cache) == 1
+
+async def get(path: str, headers: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+@pytest.mark.parametrize("path", ["/api/history", "/api/remedies/saved", "/api/dosha/profile"])
+def test_user_endpoints_require_a_verified_token(fakes, signing_keys, monkeypatch, path):
+    monkeypatch.setattr(main, 'AUTH_TRUST_USER_HEADER', False)
+    assert asyncio.run(get(path, {})).status_code == 401
+    assert asyncio.run(get(path, {'X-User-ID': USER_ID})).status_code == 401
+    assert asyncio.run(get(path, {'Authorization': f"Bearer {hs256_token(aud='anon')}"})).status_code == 401
+    assert asyncio.run(get(path, {'Authorization': f"Bearer {rs256_token(signing_keys)}"})).status_code != 401
+
+def test_user_header_is_trusted_only_when_configured(fakes, monkeypatch):
+    monkeypatch.setattr(main, 'AUTH_TRUST_USER_HEADER', True)
+    assert asyncio.run(get("/api/history", {'X-User-ID': USER_ID})).status_code == 200
+
+def test_user_header_is_trusted_by_default_until_clients_send_tokens(fakes):
+    # The web client still identifies users by X-User-ID only
+    assert main.AUTH_TRUST_USER_HEADER is True
+    assert asyncio.run(get("/api/dosha/profile", {'X-User-ID': USER_ID})).status_code != 401
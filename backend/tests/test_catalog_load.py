@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+from fakes import synthetic_remedies
+
+class FlakyFetch:
+    """fetch_remedies stand-in that fails until `healthy` is set"""
+    
+    def __init__(self, remedies):
+        self.remedies = remedies
+        self.healthy = False
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        time.sleep(0.05)
+        if not self.healthy:
+            raise ConnectionError("database unreachable")
+        return self.remedies
+
+@pytest.fixture
+def empty_catalog(monkeypatch):
+    monkeypatch.setattr(main, 'remedy_catalog', {**main.remedy_catalog, 'remedies': [], 'version': None, 'loaded_at': None})
+    monkeypatch.setattr(main, '_catalog_load_task', None)
+    monkeypatch.setattr(main, '_catalog_load_failures', 0)
+    monkeypatch.setattr(main, '_catalog_retry_at', 0.0)
+    monkeypatch.setattr(main, 'CATALOG_RETRY_BASE_SECONDS', 0.2)
+    fetch = FlakyFetch(synthetic_remedies(50))
+    monkeypatch.setattr(main, 'fetch_remedies', fetch)
+    monkeypatch.setattr(main, 'fetch_catalog_stamp', lambda: None)
+    return fetch
+
+def test_empty_catalog_loads_in_the_background_with_backoff(empty_catalog):
+    async def scenario():
+        start = time.perf_counter()
+        for _ in range(20):
+            assert main.get_remedy_catalog()['loaded_at'] is None
+        assert time.perf_counter() - start < 0.02  # never waits for the fetch
+        
+        await main._catalog_load_task
+        assert empty_catalog.calls == 1  # one load in flight, however many callers
+        
+        # Backing off: requests do not hammer the database
+        main.get_remedy_catalog()
+        assert main._catalog_load_task.done() and empty_catalog.calls == 1
+        
+        empty_catalog.healthy = True
+        await asyncio.sleep(0.25)
+        main.get_remedy_catalog()
+        await main._catalog_load_task
+        assert empty_catalog.calls == 2
+        assert len(main.get_remedy_catalog()['remedies']) == 50
+        assert main._catalog_load_failures == 0
+    
+    asyncio.run(scenario())
+
+def test_catalog_endpoints_return_503_until_loaded(empty_catalog):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in ("/api/remedies", "/api/remedies/sync"):
+                response = await client.get(path)
+                assert response.status_code == 503
+                assert int(response.headers['retry-after']) >= 1
+    
+    asyncio.run(scenario())
+
+def ask(symptom: str):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/ask", json={'symptom': symptom})
+    
+    return asyncio.run(scenario())
+
+def test_ask_waits_briefly_for_the_first_catalog_load(fakes, empty_catalog):
+    _, ai = fakes
+    empty_catalog.healthy = True
+    symptom = empty_catalog.remedies[0]['symptoms'][0]
+    
+    response = ask(symptom)
+    assert response.status_code == 200
+    assert response.json()['source'] == 'dataset'
+    assert ai.calls == []
+
+def test_ask_skips_the_ai_while_the_catalog_is_missing(fakes, empty_catalog, monkeypatch):
+    _, ai = fakes
+    monkeypatch.setattr(main, 'CATALOG_FIRST_LOAD_WAIT_SECONDS', 0.01)
+    
+    # The fallback table and emergencies need no catalog
+    assert ask("I have a headache").json()['remedy_id'] is None
+    assert ask("chest pain").json()['type'] == 'emergency'
+    
+    response = ask("zzqx wobble")
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
+    assert ai.calls == []
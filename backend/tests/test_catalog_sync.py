@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+import main
+from fakes import FakeSupabase, synthetic_remedies
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def stamped(remedies, moment):
+    return [{**remedy, 'updated_at': moment.isoformat()} for remedy in remedies]
+
+@pytest.fixture
+def tracked_db(monkeypatch):
+    """Fake database with updated_at stamps and a tombstone table, and an empty catalog"""
+    db = FakeSupabase({'remedies': stamped(synthetic_remedies(100), START), 'remedy_tombstones': []})
+    monkeypatch.setattr(main, 'supabase', db)
+    monkeypatch.setattr(main, 'remedy_catalog', {**main.remedy_catalog, 'remedies': [], 'version': None,
+                                                 'stamp': None, 'loaded_at': None})
+    monkeypatch.setattr(main, 'SYNC_OVERLAP_SECONDS', 0)
+    main.catalog_body_cache.clear()
+    return db
+
+async def sync(since=None):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        params = {'since': since} if since else {}
+        response = await client.get("/api/remedies/sync", params=params)
+        response.raise_for_status()
+        body = response.json()
+        return body, {row[0] for row in body['upserts']}
+
+def remedy_selects(db) -> int:
+    return db.calls.count(('remedies', 'select'))
+
+def test_unchanged_catalog_is_not_refetched(tracked_db):
+    async def scenario():
+        assert await main.reload_remedy_catalog() is True
+        fetched = remedy_selects(tracked_db)
+        assert await main.reload_remedy_catalog() is False
+        assert remedy_selects(tracked_db) == fetched + 1  # the probe only
+    
+    asyncio.run(scenario())
+
+def test_snapshot_is_built_off_the_event_loop(tracked_db, monkeypatch):
+    threads = []
+    build = main.build_catalog_snapshot
+    
+    def recording_build(*args):
+        threads.append(threading.current_thread())
+        return build(*args)
+    
+    monkeypatch.setattr(main, 'build_catalog_snapshot', recording_build)
+    asyncio.run(main.reload_remedy_catalog())
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_sync_returns_rows_changed_and_deleted_since_a_version(tracked_db):
+    rows = tracked_db.tables['remedies']
+    
+    async def scenario():
+        await main.reload_remedy_catalog()
+        first, ids = await sync()
+        assert first['full'] and len(ids) == 100
+        
+        later = START + timedelta(minutes=5)
+        changed = rows[3]
+        changed.update(name="Renamed Remedy", updated_at=later.isoformat())
+        removed = rows.pop(10)
+        tracked_db.tables['remedy_tombstones'].append({'remedy_id': removed['id'], 'deleted_at': later.isoformat()})
+        added = stamped(synthetic_remedies(1, seed=99), later)[0]
+        rows.append(added)
+        
+        assert await main.reload_remedy_catalog() is True
+        delta, ids = await sync(first['version'])
+        assert not delta['full'] and delta['since'] == first['version']
+        assert ids == {changed['id'], added['id']}
+        assert delta['deletes'] == [removed['id']]
+        
+        # Already current: nothing to send
+        current, ids = await sync(delta['version'])
+        assert not current['full'] and not ids and not current['deletes']
+    
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("since", ["garbage", "0af3c9e1d2b4a6f8", "99999999999999999-5"])
+def test_unusable_versions_get_the_full_catalog(tracked_db, since):
+    async def scenario():
+        await main.reload_remedy_catalog()
+        body, ids = await sync(since)
+        assert body['full'] and body['since'] is None and len(ids) == 100
+    
+    asyncio.run(scenario())
+
+def test_sync_without_change_tracking_is_always_full(tracked_db):
+    tracked_db.tables['remedies'] = synthetic_remedies(20)  # no updated_at column
+    
+    async def scenario():
+        await main.reload_remedy_catalog()
+        version = main.remedy_catalog['version']
+        assert main.parse_catalog_version(version) is None  # content fingerprint
+        body, ids = await sync(version)
+        assert body['full'] and len(ids) == 20
+    
+    asyncio.run(scenario())
+
+def counting_tombstones(monkeypatch, result):
+    calls = []
+    
+    def fetch(micros):
+        calls.append(micros)
+        return result
+    
+    monkeypatch.setattr(main, 'fetch_tombstones_since', fetch)
+    return calls
+
+def test_repeated_delta_is_served_from_cache(tracked_db, monkeypatch):
+    calls = counting_tombstones(monkeypatch, [])
+    
+    async def scenario():
+        await main.reload_remedy_catalog()
+        version = main.remedy_catalog['version']
+        for _ in range(3):
+            body, _ = await sync(version)
+            assert not body['full']
+    
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+def test_missing_tombstone_table_is_queried_once_per_version(tracked_db, monkeypatch):
+    calls = counting_tombstones(monkeypatch, None)
+    
+    async def scenario():
+        await main.reload_remedy_catalog()
+        version = main.remedy_catalog['version']
+        earlier = main.catalog_version((100, main.timestamp_micros(START.isoformat()) - 1_000_000, 0))
+        for since in (version, version, earlier):
+            body, ids = await sync(since)
+            assert body['full'] and body['since'] is None and len(ids) == 100
+    
+    asyncio.run(scenario())
+    assert len(calls) == 1
@@ -0,0 +1,76 @@
+"""
+The compiled emergency matcher must never flag fewer inputs than the original
+check: any(keyword in text.lower() for keyword in EMERGENCY_KEYWORDS)
+"""
+import random
+import string
+
+import pytest
+
+import main
+
+def baseline_check(text: str) -> bool:
+    text = text.lower()
+    return any(keyword in text for keyword in main.EMERGENCY_KEYWORDS)
+
+def corpus(count: int = 3000, seed: int = 2) -> list:
+    rng = random.Random(seed)
+    filler = ["i", "have", "my", "since", "morning", "mild", "pain", "after", "food", "सिर", "दर्द", "bukhar"]
+    texts = []
+    for _ in range(count):
+        keyword = rng.choice(main.EMERGENCY_KEYWORDS)
+        glue_left = rng.choice(["", " ", "sun", "food", "micro", "-", "(", "'"])
+        glue_right = rng.choice(["", " ", "s", "d", "ing", "!", ".", ")"])
+        words = rng.sample(filler, rng.randint(0, 5))
+        words.insert(rng.randint(0, len(words)), f"{glue_left}{keyword}{glue_right}")
+        text = ' '.join(words)
+        if rng.random() < 0.3:
+            text = text.upper() if rng.random() < 0.5 else text.title()
+        texts.append(text)
+        texts.append(''.join(rng.choices(string.ascii_lowercase + ' ', k=rng.randint(5, 60))))
+    return texts
+
+@pytest.mark.parametrize("text", [
+    "sunstroke since noon", "my grandfather had a brainstroke", "foodpoisoning after lunch",
+    "microfracture in the foot", "HEATSTROKE", "fractured wrist", "self-poisoning",
+])
+def test_glued_and_inflected_keywords_are_flagged(text):
+    assert baseline_check(text)
+    assert main.check_emergency(text) is not None
+
+def test_never_flags_fewer_than_the_substring_scan():
+    for text in corpus():
+        if baseline_check(text):
+            assert main.check_emergency(text) is not None, text
+
+def test_never_flags_fewer_on_normalized_input():
+    # The pipeline checks normalize_input(...)['normalized'], as the original code did
+    for text in corpus(seed=3):
+        normalized = main.normalize_input(text)['normalized']
+        if baseline_check(normalized):
+            assert main.check_emergency(normalized) is not None, normalized
+
+def test_every_keyword_is_reported():
+    hit = main.check_emergency("chest pain and fainting after a fracture")
+    assert hit['detected_keywords'] == ['chest pain', 'fainting', 'fracture']
+    assert hit['detected_keyword'] == 'chest pain'
+
+def test_hits_report_word_boundaries():
+    matcher = main.PhraseMatcher(["stroke", "gas"], normalize=main.normalize_phrase)
+    assert matcher.find_all("heatstroke, gas and strokes") == [
+        (4, "stroke", False, True), (11, "gas", True, True), (19, "stroke", True, False)
+    ]
+
+def fallback_entry(name: str, symptoms: list) -> dict:
+    return {'name': name, 'symptoms': symptoms, 'match_score': 80}
+
+def test_fallback_prefers_terms_that_start_a_word():
+    matcher = main.FallbackMatcher({
+        'digestion': fallback_entry('Digestion', ['gas']),
+        'stress': fallback_entry('Stress', ['tension', 'worry', 'overwhelmed']),
+    })
+    # 'gas' only occurs inside 'vegas': a weaker hit than a whole word, despite full coverage
+    assert matcher.best("back from vegas with tension")['name'] == 'Stress'
+    assert matcher.best("back from vegas")['name'] == 'Digestion'
+    # Inflections still count as whole words
+    assert matcher.best("constant worrying about gases")['name'] == 'Digestion'
@@ -0,0 +1,10 @@
+import main
+
+def test_correction_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(main, 'FUZZY_CACHE_SIZE', 3)
+    speller = main.SymptomSpeller({'headache': 5, 'nausea': 2})
+    for typo in ("hedache", "headahce", "nausae", "nasuea", "headachy"):
+        speller.correct(typo)
+    assert len(speller._cache) == 3
+    # Evicted words are simply recomputed
+    assert speller.correct("hedache") == 'headache'
@@ -0,0 +1,34 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+def raw_cursor(*fields) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(fields)).encode()).decode().rstrip('=')
+
+def test_cursor_round_trip():
+    row = {'created_at': '2026-03-01T10:15:30.123456+00:00', 'id': '0f8fad5b-d9cb-469f-a165-70867728950e'}
+    assert main.decode_history_cursor(main.encode_history_cursor(row)) == (row['created_at'], row['id'])
+
+def test_cursor_values_are_canonicalized():
+    created_at, row_id = main.decode_history_cursor(
+        raw_cursor('2026-03-01T10:15:30.1+05:30', '0F8FAD5BD9CB469FA16570867728950E')
+    )
+    assert created_at == '2026-03-01T10:15:30.100000+05:30'
+    assert row_id == '0f8fad5b-d9cb-469f-a165-70867728950e'
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor('2026-03-01T10:15:30+00:00",user_id.neq."x', '0f8fad5b-d9cb-469f-a165-70867728950e'),
+    raw_cursor('2026-03-01T10:15:30+00:00', '0f8fad5b"),or(id.gt.0'),
+    raw_cursor('2026-03-01T10:15:30', '0f8fad5b-d9cb-469f-a165-70867728950e'),
+    raw_cursor(20260301, '0f8fad5b-d9cb-469f-a165-70867728950e'),
+    raw_cursor('2026-03-01T10:15:30+00:00'),
+    "not base64 at all!",
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        main.decode_history_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from postgrest.exceptions import APIError
+
+import main
+from fakes import bench_user_id
+
+def history_row(user_id: str, symptom: str) -> dict:
+    return {'user_id': user_id, 'symptom': symptom, 'language': 'en', 'remedy_name': 'Tulsi Tea', 'source': 'dataset'}
+
+class RejectingInsert:
+    """insert_history_rows stand-in: the whole statement fails if any row is bad, like Postgres"""
+    
+    def __init__(self, bad_symptoms=(), error: Exception = None):
+        self.bad_symptoms = set(bad_symptoms)
+        self.error = error
+        self.calls = 0
+        self.written = []
+    
+    def __call__(self, rows):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        if any(row['symptom'] in self.bad_symptoms for row in rows):
+            raise APIError({'code': '22P02', 'message': 'invalid input syntax for type uuid'})
+        self.written.extend(rows)
+
+def test_one_rejected_row_does_not_drop_the_batch(monkeypatch):
+    rows = [history_row(bench_user_id(i), f"symptom {i}") for i in range(50)]
+    insert = RejectingInsert(bad_symptoms={"symptom 7", "symptom 31"})
+    monkeypatch.setattr(main, 'insert_history_rows', insert)
+    writer = main.HistoryWriter(batch_size=50, flush_seconds=0.01, max_queue=100)
+    
+    asyncio.run(writer._write(rows))
+    
+    assert [row['symptom'] for row in insert.written] == [
+        row['symptom'] for row in rows if row['symptom'] not in insert.bad_symptoms
+    ]
+    assert writer.stats['written'] == 48
+    assert writer.stats['failed'] == 2
+    assert insert.calls < 30  # bisection, not one insert per row
+
+def test_transport_errors_fail_the_batch_without_splitting(monkeypatch):
+    insert = RejectingInsert(error=ConnectionError("connection refused"))
+    monkeypatch.setattr(main, 'insert_history_rows', insert)
+    writer = main.HistoryWriter(batch_size=50, flush_seconds=0.01, max_queue=100)
+    
+    asyncio.run(writer._write([history_row(bench_user_id(i), "headache") for i in range(20)]))
+    
+    assert insert.calls == 1
+    assert writer.stats['failed'] == 20
+
+@pytest.mark.parametrize("user_id", ["bench-user", "", None, "1; drop table query_history"])
+def test_malformed_user_ids_are_not_queued(monkeypatch, user_id):
+    insert = RejectingInsert()
+    monkeypatch.setattr(main, 'insert_history_rows', insert)
+    
+    asyncio.run(main.save_query_history(user_id, "headache", "en", None, "Tulsi Tea", "dataset"))
+    
+    assert insert.calls == 0
+
+def test_uuid_user_ids_are_saved(monkeypatch):
+    insert = RejectingInsert()
+    monkeypatch.setattr(main, 'insert_history_rows', insert)
+    
+    asyncio.run(main.save_query_history(bench_user_id(3), "headache", "en", None, "Tulsi Tea", "dataset"))
+    
+    assert [row['user_id'] for row in insert.written] == [bench_user_id(3)]
@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+
+import main
+from fakes import install_fakes, synthetic_remedies
+
+def catalog_with_gaps():
+    remedies = synthetic_remedies(20)
+    untranslated, broken = remedies[0], remedies[1]
+    for field in ('name', 'herb', 'dosage', 'yoga', 'diet', 'dosha', 'warning', 'explanation'):
+        untranslated[f"{field}_hi"] = None
+    broken['herb'] = None
+    return remedies, untranslated, broken
+
+def test_projections_validate_rows_and_fall_back_to_english():
+    remedies, untranslated, broken = catalog_with_gaps()
+    projections = main.build_remedy_projections(remedies)
+    
+    hindi = projections['hi'][untranslated['id']]
+    assert hindi['name'] == untranslated['name'] and hindi['explanation'] == untranslated['explanation']
+    assert broken['id'] not in projections['en']  # served per request, validated there
+    assert broken['id'] in projections['hi']  # herb_hi is still there
+    for by_id in projections.values():
+        for projection in by_id.values():
+            main.RemedyResponse(**main.remedy_response_fields(projection))
+
+def test_untranslated_rows_are_served_in_english(fakes):
+    remedies, untranslated, _ = catalog_with_gaps()
+    install_fakes(main, remedies)
+    main.response_cache.clear()
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            answer = await client.post("/api/ask", json={"symptom": untranslated['symptoms'][0], "language": "hi"})
+            listing = await client.get("/api/remedies", params={"language": "hi"})
+        return answer.json(), listing.json()
+    
+    answer, listing = asyncio.run(scenario())
+    assert answer['remedy_id'] == untranslated['id']
+    assert answer['remedy_name'] == untranslated['name'] and answer['herb'] == untranslated['herb']
+    row = next(row for row in listing['remedies'] if row['id'] == untranslated['id'])
+    assert row['name_hi'] == untranslated['name'] and row['herb_hi'] == untranslated['herb']
@@ -0,0 +1,124 @@
+"""
+The symptom index must rank exactly like the baseline scan (rank_remedies without
+an index): same top 3, same match_score, same matched symptoms
+"""
+import copy
+import random
+import time
+
+import pytest
+
+import main
+from fakes import synthetic_remedies
+
+def parity_catalog(size: int, seed: int = 11) -> list:
+    """
+    Synthetic remedies plus the shapes the synthetic generator never makes:
+    one-word symptoms (matched by "symptom in keyword"), mixed case, empty lists
+    """
+    rng = random.Random(seed)
+    remedies = synthetic_remedies(size, seed=seed)
+    words = sorted({word for remedy in remedies for symptom in remedy['symptoms'] for word in symptom.split()})
+    for remedy in remedies[::7]:
+        remedy['symptoms'] = remedy['symptoms'] + [rng.choice(words)]
+    for remedy in remedies[3::11]:
+        remedy['symptoms'] = [symptom.title() for symptom in remedy['symptoms']]
+    remedies[5]['symptoms'] = []
+    return remedies
+
+def random_queries(remedies: list, count: int, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    symptoms = [symptom.lower() for remedy in remedies for symptom in remedy['symptoms']]
+    words = sorted({word for symptom in symptoms for word in symptom.split()})
+    
+    def fragment() -> str:
+        word = rng.choice(words)
+        start = rng.randrange(len(word) - 2)
+        return word[start:rng.randrange(start + 3, len(word) + 1)]
+    
+    queries = []
+    for _ in range(count):
+        kind = rng.randrange(6)
+        if kind == 0:
+            keywords = rng.choice(symptoms).split()
+        elif kind == 1:
+            keywords = rng.sample(words, rng.randint(1, 4))
+        elif kind == 2:
+            keywords = [fragment() for _ in range(rng.randint(1, 3))]        # keyword in symptom
+        elif kind == 3:
+            keywords = [f"{rng.choice(words)}{rng.choice(words)}", "zz" + rng.choice(words)]  # symptom in keyword
+        elif kind == 4:
+            word = rng.choice(words)
+            keywords = [word, word, rng.choice(words)]                        # duplicates count twice
+        else:
+            keywords = [rng.choice(words), "qqqxyz", "xy"]
+        queries.append(keywords)
+    return queries
+
+def comparable(ranked: list) -> list:
+    # matched_symptoms comes from list(set(...)), so only its contents are compared
+    return [{**remedy, 'matched_symptoms': sorted(remedy['matched_symptoms'])} for remedy in ranked]
+
+@pytest.mark.parametrize("size", [60, 1500])
+def test_indexed_ranking_matches_the_scan(size):
+    remedies = parity_catalog(size)
+    index = main.SymptomIndex()
+    index.update(remedies)
+    
+    for keywords in random_queries(remedies, 400):
+        expected = main.rank_remedies(keywords, remedies)
+        assert comparable(main.rank_remedies_indexed(keywords, index)) == comparable(expected), keywords
+
+def test_incremental_update_matches_a_fresh_scan():
+    rng = random.Random(9)
+    before = parity_catalog(800)
+    index = main.SymptomIndex()
+    index.update(before)
+    
+    after = copy.deepcopy(before)
+    del after[100:150]                                           # removed
+    for remedy in after[::9]:
+        remedy['symptoms'] = rng.sample(remedy['symptoms'], len(remedy['symptoms']))  # reordered
+    for remedy in after[1::13]:
+        remedy['symptoms'] = remedy['symptoms'][:-1]             # shrunk
+    after += parity_catalog(60, seed=21)                         # added
+    rng.shuffle(after)                                           # new catalog order
+    
+    touched = index.update(after)
+    assert 0 < touched < len(after) + 50
+    
+    for keywords in random_queries(after, 300, seed=8):
+        expected = main.rank_remedies(keywords, after)
+        assert comparable(main.rank_remedies_indexed(keywords, index)) == comparable(expected), keywords
+
+def test_huge_token_is_bounded_by_the_longest_symptom():
+    remedies = parity_catalog(200)
+    index = main.SymptomIndex()
+    index.update(remedies)
+    one_word = next(symptom for remedy in remedies for symptom in remedy['symptoms'] if ' ' not in symptom)
+    keyword = 'q' * 2000 + one_word.lower() + 'q' * 2000
+    
+    start = time.perf_counter()
+    ranked = main.rank_remedies_indexed([keyword], index)
+    assert time.perf_counter() - start < 1.0
+    assert comparable(ranked) == comparable(main.rank_remedies([keyword], remedies))
+
+def test_keyword_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(main, 'SYMPTOM_KEYWORD_CACHE_SIZE', 50)
+    index = main.SymptomIndex()
+    index.update(parity_catalog(100))
+    for i in range(500):
+        index.matching_symptoms(f"keyword{i}")
+    assert len(index._keyword_cache) == 50
+
+@pytest.mark.skipif(main.np is None, reason="numpy is not installed")
+def test_matrix_ranking_matches_the_scan():
+    remedies = parity_catalog(1500)
+    index = main.SymptomIndex()
+    index.update(remedies)
+    matrix = main.SymptomMatrix(index)
+    queries = random_queries(remedies, 300, seed=4) + [[], ["qqqxyz"]]
+    
+    expected = [comparable(main.rank_remedies(keywords, remedies)) for keywords in queries]
+    assert [comparable(matrix.rank(keywords)) for keywords in queries] == expected
+    assert [comparable(ranked) for ranked in matrix.rank_many(queries)] == expected
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import httpx
+
+import main
+from fakes import install_fakes, synthetic_remedies
+
+async def suggest(q: str) -> list:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/symptoms/suggest", params={"q": q})
+        return response.json()['suggestions']
+
+def test_suggester_is_built_with_the_catalog_not_per_request(fakes, monkeypatch):
+    remedies = synthetic_remedies(50, seed=21)
+    install_fakes(main, remedies)
+    built = main.remedy_catalog['suggester']
+    assert built.version == main.remedy_catalog['version']
+    
+    def fail(*args):
+        raise AssertionError("suggester built on the request path")
+    
+    monkeypatch.setattr(main, 'build_symptom_suggester', fail)
+    symptom = remedies[0]['symptoms'][0]
+    texts = [item['text'] for item in asyncio.run(suggest(symptom))]
+    assert symptom in texts
+
+def test_popularity_refresh_rebuilds_off_the_loop(fakes, monkeypatch):
+    threads = []
+    build = main.build_symptom_suggester
+    
+    def recording_build(*args):
+        threads.append(threading.current_thread())
+        return build(*args)
+    
+    monkeypatch.setattr(main, 'build_symptom_suggester', recording_build)
+    previous = main.remedy_catalog['suggester']
+    asyncio.run(main.refresh_symptom_popularity())
+    assert threads and threading.main_thread() not in threads
+    assert main.remedy_catalog['suggester'] is not previous
+
+def test_fallback_terms_are_suggested_before_the_catalog_loads(monkeypatch):
+    monkeypatch.setattr(main, 'remedy_catalog', {**main.remedy_catalog, 'remedies': [], 'version': None,
+                                                 'loaded_at': None, 'suggester': None})
+    monkeypatch.setattr(main, 'schedule_catalog_load', lambda: None)
+    assert asyncio.run(suggest("fati"))
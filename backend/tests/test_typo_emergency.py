@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+import main
+from fakes import install_fakes, synthetic_remedies
+
+def heat_and_panic_catalog():
+    remedies = synthetic_remedies(2)
+    remedies[0]['symptoms'] = ['body heat']
+    remedies[1]['symptoms'] = ['panic attack']
+    return remedies
+
+async def post(path: str, payload: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(path, json=payload)
+
+def test_emergency_words_are_never_corrected(fakes):
+    install_fakes(main, heat_and_panic_catalog())
+    corrected = main.correct_keywords(main.normalize_input("heart attack"))
+    assert 'heart' in corrected['keywords']
+    assert main.query_emergency(corrected)['detected_keyword'] == 'heart attack'
+
+def test_emergency_is_checked_on_the_text_as_typed(fakes):
+    install_fakes(main, heat_and_panic_catalog())
+    # Even a correction that lands on an emergency word cannot hide the phrase the user typed
+    normalized = main.normalize_input("heart attack")
+    respelled = {**normalized, 'normalized': 'heat attack', 'keywords': ['heat', 'attack'],
+                 'uncorrected': normalized['normalized'], 'corrections': {'heart': 'heat'}}
+    assert main.query_emergency(respelled) is not None
+
+def test_heart_attack_gets_the_emergency_alert(fakes):
+    install_fakes(main, heat_and_panic_catalog())
+    main.response_cache.clear()
+    
+    ask = asyncio.run(post("/api/ask", {"symptom": "heart attack"}))
+    assert ask.status_code == 200 and ask.json()['type'] == 'emergency'
+    
+    batch = asyncio.run(post("/api/ask/batch", {"items": [{"symptom": "heart attack"}, {"symptom": "body heat"}]}))
+    results = batch.json()['results']
+    assert results[0]['data']['type'] == 'emergency'
+    assert results[1]['data']['source'] == 'dataset'
+
+def test_batch_checks_each_item_for_emergencies_once(fakes, monkeypatch):
+    checked = []
+    check = main.check_emergency
+    monkeypatch.setattr(main, 'check_emergency', lambda text: checked.append(text) or check(text))
+    items = [{"symptom": "heart attack"}, {"symptom": "fatigue and low energy all day"}, {"symptom": "zzqx wobble"}]
+    
+    batch = asyncio.run(post("/api/ask/batch", {"items": items}))
+    assert batch.status_code == 200
+    assert len(checked) == len(items)
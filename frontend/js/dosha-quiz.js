@@ -187,10 +187,12 @@ class DoshaQuiz {
             // Get user ID from session
             const session = localStorage.getItem('ayush.auth.session');
             let userId = 'guest-' + Date.now();
+            let accessToken = null;
             if (session) {
                 try {
                     const sessionData = JSON.parse(session);
                     userId = sessionData.user.id;
+                    accessToken = sessionData.access_token || null;
                 } catch (e) {
                     console.error('Session parse error:', e);
                 }
@@ -200,7 +202,8 @@ class DoshaQuiz {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
-                    'X-User-ID': userId
+                    'X-User-ID': userId,
+                    ...(accessToken && { 'Authorization': `Bearer ${accessToken}` })
                 },
                 body: JSON.stringify({ answers: this.answers })
             });
@@ -478,9 +478,11 @@ async function analyzeSymptoms() {
     try {
         const session = localStorage.getItem('ayush.auth.session');
         let userId = null;
+        let accessToken = null;
         if (session) {
             const sessionData = JSON.parse(session);
             userId = sessionData.user.id;
+            accessToken = sessionData.access_token || null;
         }
         
         console.log('Calling API:', CONFIG.API_URL);
@@ -490,7 +492,8 @@ async function analyzeSymptoms() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                ...(userId && { 'X-User-ID': userId })
+                ...(userId && { 'X-User-ID': userId }),
+                ...(accessToken && { 'Authorization': `Bearer ${accessToken}` })
             },
             body: JSON.stringify({
                 symptom: symptom,